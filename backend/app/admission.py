@@ -0,0 +1,271 @@
+import asyncio
+import heapq
+import itertools
+import json
+import math
+import os
+import time
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from llm import usage_scope
+from .tenants import TenantRejected, get_tenants
+
+# ✅ Endpoints behind admission control: (concurrency, queue cap, expected seconds per request)
+# Override per endpoint with DREAMFORGE_CONCURRENCY_<KEY> / DREAMFORGE_QUEUE_<KEY>,
+# e.g. DREAMFORGE_CONCURRENCY_ORCHESTRATE=8; the deadline applies to all of them.
+ADMISSION_ENDPOINTS = {
+    ("POST", "/api/orchestrate"): ("ORCHESTRATE", 4, 16, 15.0),
+    ("GET", "/api/orchestrate-stream"): ("ORCHESTRATE_STREAM", 4, 16, 15.0),
+    ("POST", "/api/vision"): ("VISION", 8, 32, 3.0),
+    ("POST", "/api/code"): ("CODE", 8, 32, 8.0),
+    ("POST", "/api/evaluate"): ("EVALUATE", 8, 32, 4.0),
+    ("POST", "/api/evaluate-stream"): ("EVALUATE_STREAM", 8, 32, 4.0),
+    ("POST", "/api/repair"): ("REPAIR", 4, 16, 10.0),
+    # Each run of a WebSocket session is admitted on its own (see sessions.py)
+    ("WS", "/api/ws/orchestrate"): ("WS_ORCHESTRATE", 4, 16, 15.0),
+}
+ADMISSION_DEADLINE = float(os.getenv("DREAMFORGE_ADMISSION_DEADLINE", "30"))
+
+# Weight of the newest request in the service-time average
+SERVICE_TIME_ALPHA = 0.2
+
+
+class Overloaded(Exception):
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Concurrency limit plus a bounded, weighted-fair queue for one endpoint.
+
+    Waiting requests are ordered by virtual finish time (start-time fair
+    queueing): each tenant's next request is tagged 1 / weight after the later
+    of its previous tag and the tag last served, so under contention every
+    tenant with waiting work gets slots in proportion to its weight, however
+    many requests it sends. With a single tenant this is a plain FIFO.
+
+    A request is shed up front (instead of timing out later) when its tenant's
+    weighted share of the queue is full or its estimated wait is already past
+    the deadline; the estimate is the number of requests ahead of it divided by
+    the concurrency, times an EWMA of how long requests take. Shares are split
+    between the tenants that are queueing, so a lone tenant may use the whole
+    queue, while a tenant still under its configured share is never shed just
+    because others filled the queue.
+    """
+
+    def __init__(self, name, concurrency, max_queue, deadline, service_time):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max(0, max_queue)
+        self.deadline = deadline
+        self.service_time = service_time
+        self.in_flight = 0
+        self._waiters = []  # heap of (virtual finish tag, sequence, future, tenant name)
+        self._sequence = itertools.count()
+        self.virtual_time = 0.0  # tag of the request served last
+        self._last_tag = {}  # tenant name -> tag of its newest queued request
+        self._weights = {}  # tenant name -> weight, for tenants seen queueing
+        self.stats = {"admitted": 0, "queued": 0, "shed_queue_full": 0, "shed_deadline": 0, "shed_timeout": 0}
+
+    def _next_tag(self, tenant):
+        last = self._last_tag.get(tenant.name, 0.0) if tenant is not None else 0.0
+        weight = tenant.weight if tenant is not None else 1.0
+        return max(self.virtual_time, last) + 1.0 / weight
+
+    def estimated_wait(self, position=None, tenant=None):
+        """
+        Seconds until a request starts, queued at `position` (default: where a
+        new request of `tenant` would go).
+        """
+        if self.in_flight < self.concurrency and not self._waiters:
+            return 0.0
+        if position is None:
+            tag = self._next_tag(tenant)
+            position = sum(1 for waiter in self._waiters if waiter[0] <= tag)
+        return (position // self.concurrency + 1) * self.service_time
+
+    def _queue_full_for(self, tenant, share):
+        """Whether `tenant` (holding `share` of the configured weight) may not queue another request."""
+        if tenant is None:
+            return len(self._waiters) >= self.max_queue
+        queued = {}
+        for waiter in self._waiters:
+            queued[waiter[3]] = queued.get(waiter[3], 0) + 1
+        own = queued.get(tenant.name, 0)
+        # Weighted share among the tenants queueing right now (the caller included)
+        active_weight = sum(self._weights.get(name, 1.0) for name in queued if name != tenant.name) + tenant.weight
+        if own >= max(1, math.ceil(self.max_queue * tenant.weight / active_weight)):
+            return True
+        return len(self._waiters) >= self.max_queue and own >= math.ceil(self.max_queue * share)
+
+    def _shed(self, kind, reason, wait):
+        self.stats[kind] += 1
+        raise Overloaded(reason, max(1, math.ceil(wait)))
+
+    async def acquire(self, tenant=None, share=1.0):
+        """
+        Waits for a slot. `tenant` (with a `name` and `weight`) selects the fair
+        queue; `share` is its fraction of the total weight, which caps how much
+        of the queue it may hold so one tenant cannot fill it for everyone.
+        """
+        if self.in_flight < self.concurrency and not self._waiters:
+            self.in_flight += 1
+            self.stats["admitted"] += 1
+            return
+
+        wait = self.estimated_wait(tenant=tenant)
+        if self._queue_full_for(tenant, share):
+            owner = f" for tenant {tenant.name}" if tenant is not None else ""
+            self._shed("shed_queue_full", f"{self.name} queue is full{owner}", wait)
+        if wait > self.deadline:
+            self._shed("shed_deadline", f"{self.name} estimated wait {wait:.0f}s exceeds {self.deadline:.0f}s", wait)
+
+        waiter = asyncio.get_running_loop().create_future()
+        tag = self._next_tag(tenant)
+        tenant_name = tenant.name if tenant is not None else None
+        self._last_tag[tenant_name] = tag
+        if tenant is not None:
+            self._weights[tenant_name] = tenant.weight
+        entry = (tag, next(self._sequence), waiter, tenant_name)
+        heapq.heappush(self._waiters, entry)
+        self.stats["queued"] += 1
+        try:
+            await asyncio.wait_for(waiter, timeout=self.deadline)
+        except asyncio.TimeoutError:
+            self._shed("shed_timeout", f"{self.name} waited longer than {self.deadline:.0f}s", self.estimated_wait())
+        except asyncio.CancelledError:
+            # The slot may have been handed over just as we were cancelled; pass it on
+            if waiter.done() and not waiter.cancelled():
+                self.release(None)
+            raise
+        finally:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+        self.stats["admitted"] += 1
+
+    def release(self, duration):
+        if duration is not None:
+            self.service_time += SERVICE_TIME_ALPHA * (duration - self.service_time)
+        # Hand the slot straight to the fairest waiter so nobody can jump the queue
+        while self._waiters:
+            tag, _, waiter, _ = heapq.heappop(self._waiters)
+            if not waiter.done():
+                self.virtual_time = tag
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def snapshot(self):
+        return {
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "queue_depth": len(self._waiters),
+            "max_queue": self.max_queue,
+            "deadline_seconds": self.deadline,
+            "service_time_seconds": round(self.service_time, 3),
+            "estimated_wait_seconds": round(self.estimated_wait(), 3),
+            **self.stats,
+        }
+
+
+def _build_controllers():
+    controllers = {}
+    for route, (key, concurrency, max_queue, service_time) in ADMISSION_ENDPOINTS.items():
+        controllers[route] = AdmissionController(
+            name=route[1],
+            concurrency=int(os.getenv(f"DREAMFORGE_CONCURRENCY_{key}", str(concurrency))),
+            max_queue=int(os.getenv(f"DREAMFORGE_QUEUE_{key}", str(max_queue))),
+            deadline=ADMISSION_DEADLINE,
+            service_time=service_time,
+        )
+    return controllers
+
+
+# One set of controllers per process (limits are per uvicorn worker)
+controllers = _build_controllers()
+
+
+def admission_stats():
+    """Queue depth, in-flight and shed counters per endpoint, for /api/metrics."""
+    return {f"{method} {path}": controller.snapshot() for (method, path), controller in controllers.items()}
+
+
+async def admit(controller, tenant, tenants):
+    """
+    Checks the tenant's quota, then takes one of its slots and a fair-queued
+    `controller` slot. Raises TenantRejected or Overloaded when the request is
+    shed; otherwise the caller must call release_admission when done and
+    bill the request's usage (tenant.record_usage, off the event loop).
+    """
+    await asyncio.to_thread(tenant.check_quota)  # may read the shared state store
+    await tenant.acquire(timeout=controller.deadline)
+    try:
+        await controller.acquire(tenant, tenants.share(tenant))
+    except BaseException:
+        tenant.release()
+        raise
+
+
+def release_admission(controller, tenant, duration):
+    """Frees the slots taken by admit."""
+    controller.release(duration)
+    tenant.release()
+
+
+class AdmissionMiddleware:
+    """
+    Resolves the caller's tenant from its API key, checks the tenant's token
+    quota and concurrency cap, then holds an endpoint slot (fair-queued by
+    tenant weight) for the whole request, including streamed bodies. The
+    request's token usage is added to the tenant's counters when it ends.
+    Answers 401 / 429 / 503 + Retry-After right away instead of timing out later.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        controller = controllers.get((scope.get("method"), scope.get("path"))) if scope["type"] == "http" else None
+        if controller is None:
+            await self.app(scope, receive, send)
+            return
+
+        tenants = get_tenants()
+        try:
+            tenant = tenants.resolve(Headers(scope=scope))
+            await admit(controller, tenant, tenants)
+        except TenantRejected as e:
+            # 401 / 429 are the caller's problem; a full tenant slot is load
+            busy = e.status == 503
+            print(f"🚦 {'Shedding' if busy else 'Rejecting'} {scope['method']} {scope['path']}: {e.reason}")
+            await self.reject(send, e.status, f"Server busy: {e.reason}" if busy else e.reason, e.retry_after)
+            return
+        except Overloaded as e:
+            print(f"🚦 Shedding {scope['method']} {scope['path']}: {e.reason}")
+            await self.reject(send, 503, f"Server busy: {e.reason}", e.retry_after)
+            return
+        scope.setdefault("state", {})["tenant"] = tenant.name
+
+        started = time.perf_counter()
+        try:
+            with usage_scope() as usage:
+                await self.app(scope, receive, send)
+        finally:
+            release_admission(controller, tenant, time.perf_counter() - started)
+            await asyncio.to_thread(tenant.record_usage, dict(usage))
+
+    @staticmethod
+    async def reject(send, status, detail, retry_after=None):
+        body = json.dumps({"detail": detail, "retry_after": retry_after}).encode("utf-8")
+        headers = MutableHeaders()
+        headers["Content-Type"] = "application/json"
+        headers["Content-Length"] = str(len(body))
+        if retry_after is not None:
+            headers["Retry-After"] = str(retry_after)
+        await send({"type": "http.response.start", "status": status, "headers": headers.raw})
+        await send({"type": "http.response.body", "body": body})
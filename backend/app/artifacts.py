@@ -0,0 +1,171 @@
+"""
+Chunked, de-duplicated storage for generated code.
+
+Regenerating an app mostly rewrites the same files, so whole-file copies of
+every version waste disk. Each artifact is split into content-defined chunks
+instead: a chunk ends after a line whose crc32 hits BOUNDARY_MASK (within
+MIN_CHUNK..MAX_CHUNK bytes). Boundaries depend only on nearby content, so an
+edit changes the chunks around it and the rest of the file chunks exactly as
+before. Chunks are stored once per sha256, zlib-compressed, in the history
+database:
+
+    artifacts        sha256 of the whole text -> size, chunk count
+    artifact_chunks  (artifact, seq) -> chunk sha256
+    chunks           chunk sha256 -> compressed bytes
+
+Reads join the chunks back in order and check the result against the
+artifact hash. `sweep` deletes artifacts no generation refers to, then chunks
+no artifact refers to.
+"""
+import hashlib
+import time
+import zlib
+
+MIN_CHUNK = 256
+MAX_CHUNK = 8192
+# One line in 32 ends a chunk (~1 KB of typical code)
+BOUNDARY_MASK = 0x1F
+COMPRESS_LEVEL = 6
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    sha256      TEXT    PRIMARY KEY,
+    size        INTEGER NOT NULL,
+    chunk_count INTEGER NOT NULL,
+    created_at  REAL    NOT NULL
+);
+CREATE TABLE IF NOT EXISTS artifact_chunks (
+    artifact_sha256 TEXT    NOT NULL,
+    seq             INTEGER NOT NULL,
+    chunk_sha256    TEXT    NOT NULL,
+    PRIMARY KEY (artifact_sha256, seq)
+);
+CREATE INDEX IF NOT EXISTS idx_artifact_chunks_chunk ON artifact_chunks (chunk_sha256);
+CREATE TABLE IF NOT EXISTS chunks (
+    sha256      TEXT    PRIMARY KEY,
+    size        INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL,
+    codec       TEXT    NOT NULL,
+    data        BLOB    NOT NULL
+);
+"""
+
+
+def split_chunks(data):
+    """Content-defined chunks of `data` (bytes), cut at line ends."""
+    chunks, current, size = [], [], 0
+    for line in data.splitlines(keepends=True):
+        # Minified files can have huge lines: cut those at MAX_CHUNK
+        while size + len(line) > MAX_CHUNK:
+            room = MAX_CHUNK - size
+            current.append(line[:room])
+            chunks.append(b"".join(current))
+            current, size, line = [], 0, line[room:]
+        if not line:
+            continue
+        current.append(line)
+        size += len(line)
+        if size >= MIN_CHUNK and zlib.crc32(line) & BOUNDARY_MASK == 0:
+            chunks.append(b"".join(current))
+            current, size = [], 0
+    if current:
+        chunks.append(b"".join(current))
+    return chunks
+
+
+def _encode(chunk):
+    compressed = zlib.compress(chunk, COMPRESS_LEVEL)
+    return ("zlib", compressed) if len(compressed) < len(chunk) else ("raw", chunk)
+
+
+def _decode(codec, data):
+    return zlib.decompress(data) if codec == "zlib" else bytes(data)
+
+
+class ArtifactStore:
+    """
+    Artifact tables inside the history database. Shares its connection and
+    lock; callers commit, so an artifact and the generation row that refers
+    to it land in one transaction.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._conn.executescript(SCHEMA)
+
+    def put(self, text):
+        """Stores `text` (without committing) and returns (sha256, size)."""
+        data = (text or "").encode("utf-8")
+        sha = hashlib.sha256(data).hexdigest()
+        chunks = split_chunks(data)
+        cursor = self._conn.execute(
+            "INSERT OR IGNORE INTO artifacts (sha256, size, chunk_count, created_at) VALUES (?, ?, ?, ?)",
+            (sha, len(data), len(chunks), time.time()),
+        )
+        if cursor.rowcount == 0:
+            return sha, len(data)  # same text stored before
+
+        refs = []
+        for seq, chunk in enumerate(chunks):
+            chunk_sha = hashlib.sha256(chunk).hexdigest()
+            refs.append((sha, seq, chunk_sha))
+            if self._conn.execute("SELECT 1 FROM chunks WHERE sha256 = ?", (chunk_sha,)).fetchone():
+                continue
+            codec, stored = _encode(chunk)
+            self._conn.execute(
+                "INSERT INTO chunks (sha256, size, stored_size, codec, data) VALUES (?, ?, ?, ?, ?)",
+                (chunk_sha, len(chunk), len(stored), codec, stored),
+            )
+        self._conn.executemany(
+            "INSERT INTO artifact_chunks (artifact_sha256, seq, chunk_sha256) VALUES (?, ?, ?)", refs
+        )
+        return sha, len(data)
+
+    def get(self, sha):
+        """Rebuilt text of an artifact, or None when it is unknown (or damaged)."""
+        if self._conn.execute("SELECT 1 FROM artifacts WHERE sha256 = ?", (sha,)).fetchone() is None:
+            return None
+        rows = self._conn.execute(
+            """
+            SELECT c.codec, c.data FROM artifact_chunks ac
+            JOIN chunks c ON c.sha256 = ac.chunk_sha256
+            WHERE ac.artifact_sha256 = ? ORDER BY ac.seq
+            """,
+            (sha,),
+        ).fetchall()
+        data = b"".join(_decode(row[0], row[1]) for row in rows)
+        if hashlib.sha256(data).hexdigest() != sha:
+            print(f"⚠️ Artifact {sha[:12]} failed its hash check")
+            return None
+        return data.decode("utf-8")
+
+    def sweep(self):
+        """Deletes artifacts no generation refers to, then orphaned chunks (without committing)."""
+        orphans = [row[0] for row in self._conn.execute(
+            """
+            SELECT sha256 FROM artifacts WHERE sha256 NOT IN (
+                SELECT code_sha256 FROM generations WHERE code_sha256 IS NOT NULL
+            )
+            """
+        ).fetchall()]
+        for sha in orphans:
+            self._conn.execute("DELETE FROM artifact_chunks WHERE artifact_sha256 = ?", (sha,))
+            self._conn.execute("DELETE FROM artifacts WHERE sha256 = ?", (sha,))
+        chunks = self._conn.execute(
+            "DELETE FROM chunks WHERE sha256 NOT IN (SELECT chunk_sha256 FROM artifact_chunks)"
+        ).rowcount
+        return len(orphans), chunks
+
+    def stats(self):
+        artifacts, logical = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM artifacts").fetchone()
+        chunks, unique, stored = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(stored_size), 0) FROM chunks"
+        ).fetchone()
+        return {
+            "artifacts": artifacts,
+            "chunks": chunks,
+            "logical_bytes": logical,  # what whole-file copies would take
+            "unique_bytes": unique,  # after de-duplication
+            "stored_bytes": stored,  # after compression
+            "ratio": round(logical / stored, 2) if stored else None,
+        }
@@ -0,0 +1,120 @@
+import asyncio
+import os
+import threading
+import time
+
+from code_checks import local_problems
+from llm import CancelToken, cancellation_scope, current_cancel_token, usage_scope
+from tracing import current_span, span
+
+# ✅ Best-of-N Code generation (override per request with `candidates`; 1 = off)
+DEFAULT_CANDIDATES = int(os.getenv("DREAMFORGE_CANDIDATES", "1"))
+MAX_CANDIDATES = int(os.getenv("DREAMFORGE_MAX_CANDIDATES", "5"))
+
+_stats_lock = threading.Lock()
+candidate_stats = {
+    "selections": 0,  # best-of-N runs
+    "generated": 0,  # candidates whose code finished
+    "rejected_locally": 0,  # failed the local checks, never reviewed
+    "rejected_by_review": 0,  # reviewed with status "fail"
+    "cancelled": 0,  # still running when another candidate won
+    "no_winner": 0,  # every candidate failed: the best-ranked one was returned
+}
+
+
+def count_candidates(key, amount=1):
+    with _stats_lock:
+        candidate_stats[key] += amount
+
+
+def candidate_count(requested):
+    """Candidates for one framework: the request's value (or the default) capped at MAX_CANDIDATES."""
+    count = DEFAULT_CANDIDATES if requested is None else requested
+    return max(1, min(int(count), MAX_CANDIDATES))
+
+
+def _rank(outcome):
+    """Higher is better: passed review, then reviewed, then fewest issues / local problems."""
+    evaluation = outcome.get("evaluation")
+    if evaluation is not None:
+        return (2 if evaluation.status != "fail" else 1, -len(evaluation.issues or []))
+    if outcome.get("code") is not None:
+        return (0, -len(outcome["problems"]))
+    return (-1, 0)
+
+
+async def select_candidate(count, generate, review):
+    """
+    Generates `count` candidates concurrently and returns (winner, outcomes).
+
+    Each candidate is scored as soon as its code is ready: local checks first,
+    then the review. The first one whose review does not fail wins and the
+    others are cancelled, provider calls included, so wall time stays close to
+    a single run. When none passes, the best-ranked candidate is returned.
+    Outcomes are dicts with index, status, code, evaluation, problems, seconds
+    and usage; winner is None only when every candidate errored.
+    """
+    parent = current_cancel_token()
+    tokens = [CancelToken(parent=parent) for _ in range(count)]
+    started = time.perf_counter()
+
+    async def attempt(index):
+        outcome = {"index": index, "status": "error", "code": None, "evaluation": None, "problems": []}
+        # Own token per candidate: losing candidates are cancelled without touching the request
+        with cancellation_scope(tokens[index]), span("stage.code.candidate", index=index) as candidate_span, \
+                usage_scope() as usage:
+            try:
+                outcome["code"] = await generate()
+                count_candidates("generated")
+                outcome["problems"] = local_problems(outcome["code"].generated_code)
+                if outcome["problems"]:
+                    outcome["status"] = "rejected_locally"
+                    count_candidates("rejected_locally")
+                else:
+                    outcome["evaluation"] = await review(outcome["code"])
+                    outcome["status"] = "passed" if outcome["evaluation"].status != "fail" else "rejected_by_review"
+                    if outcome["status"] == "rejected_by_review":
+                        count_candidates("rejected_by_review")
+            except Exception as e:
+                outcome["problems"] = [str(getattr(e, "detail", e))]
+            candidate_span.set("status", outcome["status"])
+        outcome["usage"] = dict(usage)
+        outcome["seconds"] = round(time.perf_counter() - started, 3)
+        return outcome
+
+    count_candidates("selections")
+    tasks = [asyncio.ensure_future(attempt(index)) for index in range(count)]
+    outcomes, winner = [], None
+    try:
+        for finished in asyncio.as_completed(tasks):
+            outcome = await finished
+            outcomes.append(outcome)
+            if outcome["status"] == "passed":
+                winner = outcome
+                break
+    finally:
+        pending = [task for task in tasks if not task.done()]
+        for token in tokens:
+            token.cancel("another candidate won")
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+            if winner is not None:
+                count_candidates("cancelled", len(pending))
+
+    if winner is None:
+        count_candidates("no_winner")
+        ranked = [outcome for outcome in outcomes if outcome["code"] is not None]
+        winner = max(ranked, key=_rank) if ranked else None
+
+    reported = {outcome["index"] for outcome in outcomes}
+    for index, task in enumerate(tasks):
+        if index in reported:
+            continue
+        if task.done() and not task.cancelled() and task.exception() is None:
+            outcomes.append(task.result())  # finished in the same tick as the winner
+        else:
+            outcomes.append({"index": index, "status": "cancelled", "problems": [], "seconds": None, "usage": {}})
+    current_span().set("winner", winner["index"] if winner else None)
+    return winner, sorted(outcomes, key=lambda outcome: outcome["index"])
@@ -0,0 +1,32 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from llm import CancelToken, cancellation_scope, count_cancelled
+
+# How often an idle request checks whether its client is still there
+POLL_INTERVAL = 0.25
+
+
+@asynccontextmanager
+async def cancel_on_disconnect(request, poll_interval=POLL_INTERVAL):
+    """
+    Cancels every agent call started inside the block once the HTTP client goes away.
+    Agent calls must run via asyncio.to_thread (or a copied context) to see the token.
+    """
+    token = CancelToken()
+
+    async def watch():
+        while not token.cancelled:
+            if await request.is_disconnected():
+                print("🔌 Client disconnected — cancelling pending LLM calls")
+                count_cancelled("requests_cancelled")
+                token.cancel("client disconnected")
+                return
+            await asyncio.sleep(poll_interval)
+
+    watcher = asyncio.create_task(watch())
+    try:
+        with cancellation_scope(token):
+            yield token
+    finally:
+        watcher.cancel()
@@ -0,0 +1,321 @@
+import glob
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from .artifacts import ArtifactStore
+
+# ✅ Where generation history lives (override with DREAMFORGE_DATA_DIR)
+DATA_DIR = os.getenv(
+    "DREAMFORGE_DATA_DIR",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "../data")),
+)
+# ✅ Runs kept per input (older re-runs of the same prompt are deleted; 0 = keep all)
+KEEP_VERSIONS = int(os.getenv("DREAMFORGE_KEEP_VERSIONS", "0"))
+# Records between garbage collections
+GC_INTERVAL = int(os.getenv("DREAMFORGE_GC_INTERVAL", "50"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS generations (
+    id                INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at        REAL    NOT NULL,
+    input_hash        TEXT    NOT NULL,
+    input_type        TEXT    NOT NULL,
+    input_data        TEXT    NOT NULL,
+    framework         TEXT,
+    vision_json       TEXT,
+    code_sha256       TEXT,
+    code_bytes        INTEGER NOT NULL DEFAULT 0,
+    evaluation_json   TEXT,
+    status            TEXT,
+    success           INTEGER NOT NULL DEFAULT 1,
+    timings_json      TEXT,
+    prompt_tokens     INTEGER NOT NULL DEFAULT 0,
+    completion_tokens INTEGER NOT NULL DEFAULT 0,
+    total_tokens      INTEGER NOT NULL DEFAULT 0,
+    prompts_json      TEXT,
+    tenant            TEXT    NOT NULL DEFAULT 'default'
+);
+CREATE INDEX IF NOT EXISTS idx_generations_input_hash ON generations (input_hash, id DESC);
+CREATE INDEX IF NOT EXISTS idx_generations_code_sha256 ON generations (code_sha256);
+"""
+
+SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+SUMMARY_COLUMNS = (
+    "id, created_at, input_hash, input_type, framework, status, success, "
+    "code_sha256, code_bytes, total_tokens"
+)
+
+
+def input_hash(input_type, input_data, framework):
+    """Stable hash of the orchestration inputs, used for reuse lookups."""
+    payload = json.dumps(
+        {"input_type": input_type, "input_data": input_data, "framework": framework},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class HistoryStore:
+    """
+    SQLite-backed history of every orchestration run.
+    Generated code is kept as a content-addressed artifact (chunked and
+    de-duplicated, see artifacts.py); rows only hold its sha256 reference.
+    """
+
+    def __init__(self, data_dir=DATA_DIR, keep_versions=KEEP_VERSIONS, gc_interval=GC_INTERVAL):
+        self.data_dir = data_dir
+        os.makedirs(data_dir, exist_ok=True)
+        self.keep_versions = keep_versions
+        self.gc_interval = gc_interval
+        self._records_since_gc = 0
+        self.gc_stats = {"runs": 0, "generations": 0, "artifacts": 0, "chunks": 0}
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(data_dir, "history.db"), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        # Only applies to new databases; lets collect_garbage hand freed pages back
+        self._conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(generations)")}
+        if "prompts_json" not in columns:  # databases from before prompt fingerprints were recorded
+            self._conn.execute("ALTER TABLE generations ADD COLUMN prompts_json TEXT")
+        if "tenant" not in columns:  # runs from before tenants go to the unconfigured "default" tenant
+            self._conn.execute("ALTER TABLE generations ADD COLUMN tenant TEXT NOT NULL DEFAULT 'default'")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_generations_tenant ON generations (tenant, id DESC)")
+        self.artifacts = ArtifactStore(self._conn)
+        self._import_legacy_artifacts(os.path.join(data_dir, "artifacts"))
+
+    # ------------------------------------------------------------------
+    # Artifacts
+    # ------------------------------------------------------------------
+
+    def _import_legacy_artifacts(self, artifact_dir):
+        """Moves whole-file artifacts from older versions (artifacts/<sha>.txt) into the chunk store."""
+        paths = glob.glob(os.path.join(artifact_dir, "*.txt"))
+        if not paths:
+            return
+        with self._lock:
+            for path in paths:
+                # Bytes, not text mode: newline translation would change the content and its sha256
+                with open(path, "rb") as f:
+                    self.artifacts.put(f.read().decode("utf-8"))
+            self._conn.commit()
+        for path in paths:
+            os.remove(path)
+        print(f"📦 Moved {len(paths)} artifacts into the chunk store")
+
+    def get_artifact(self, sha, tenant=None):
+        """Artifact content; with `tenant`, only if one of that tenant's runs produced it."""
+        if not sha or not SHA256_RE.match(sha):
+            return None
+        with self._lock:
+            if tenant is not None and self._conn.execute(
+                "SELECT 1 FROM generations WHERE code_sha256 = ? AND tenant = ? LIMIT 1", (sha, tenant)
+            ).fetchone() is None:
+                return None
+            return self.artifacts.get(sha)
+
+    def collect_garbage(self):
+        """
+        Deletes re-runs beyond `keep_versions` per input, then artifacts and
+        chunks nothing refers to any more. Returns what was deleted.
+        """
+        with self._lock:
+            generations = 0
+            if self.keep_versions > 0:
+                generations = self._conn.execute(
+                    """
+                    DELETE FROM generations WHERE id IN (
+                        SELECT id FROM (
+                            SELECT id, ROW_NUMBER() OVER (PARTITION BY input_hash ORDER BY id DESC) AS version
+                            FROM generations
+                        ) WHERE version > ?
+                    )
+                    """,
+                    (self.keep_versions,),
+                ).rowcount
+            artifacts, chunks = self.artifacts.sweep()
+            self._conn.commit()
+            self._conn.execute("PRAGMA incremental_vacuum")
+            self._records_since_gc = 0
+
+        deleted = {"generations": generations, "artifacts": artifacts, "chunks": chunks}
+        self.gc_stats["runs"] += 1
+        for key, count in deleted.items():
+            self.gc_stats[key] += count
+        if any(deleted.values()):
+            print(f"🧹 History GC deleted {generations} runs, {artifacts} artifacts, {chunks} chunks")
+        return deleted
+
+    def stats(self):
+        with self._lock:
+            return {**self.artifacts.stats(), "keep_versions": self.keep_versions, "gc": dict(self.gc_stats)}
+
+    # ------------------------------------------------------------------
+    # Generations
+    # ------------------------------------------------------------------
+
+    def record(self, *, input_type, input_data, framework, vision, code, evaluation,
+               timings, usage, prompts=None, success=True, tenant="default"):
+        """Stores one orchestration run and returns its id."""
+        usage = usage or {}
+        with self._lock:
+            try:
+                # Artifact and row commit together, so a concurrent sweep never sees one without the other
+                code_sha, code_bytes = self.artifacts.put(code) if code is not None else (None, 0)
+                row = (
+                    time.time(),
+                    input_hash(input_type, input_data, framework),
+                    input_type,
+                    input_data,
+                    framework,
+                    json.dumps(vision) if vision is not None else None,
+                    code_sha,
+                    code_bytes,
+                    json.dumps(evaluation) if evaluation is not None else None,
+                    (evaluation or {}).get("status"),
+                    1 if success else 0,
+                    json.dumps(timings or {}),
+                    usage.get("prompt_tokens", 0),
+                    usage.get("completion_tokens", 0),
+                    usage.get("total_tokens", 0),
+                    json.dumps(prompts) if prompts else None,
+                    tenant,
+                )
+                cursor = self._conn.execute(
+                    """
+                    INSERT INTO generations (
+                        created_at, input_hash, input_type, input_data, framework,
+                        vision_json, code_sha256, code_bytes, evaluation_json, status,
+                        success, timings_json, prompt_tokens, completion_tokens, total_tokens,
+                        prompts_json, tenant
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    row,
+                )
+            except Exception:
+                self._conn.rollback()
+                raise
+            self._conn.commit()
+            self._records_since_gc += 1
+            collect = self.gc_interval > 0 and self._records_since_gc >= self.gc_interval
+        if collect:
+            self.collect_garbage()
+        return cursor.lastrowid
+
+    def get(self, generation_id, include_code=True, tenant=None):
+        """One run, or None; with `tenant`, runs of other tenants are not found."""
+        where, params = _tenant_filter("id = ?", (generation_id,), tenant)
+        with self._lock:
+            row = self._conn.execute(f"SELECT * FROM generations WHERE {where}", params).fetchone()
+        if row is None:
+            return None
+        return self._to_record(row, include_code)
+
+    def find_by_input_hash(self, hash_value, limit=10, tenant=None):
+        """Most recent runs for the same inputs, newest first."""
+        where, params = _tenant_filter("input_hash = ?", (hash_value,), tenant)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {SUMMARY_COLUMNS} FROM generations WHERE {where} ORDER BY id DESC LIMIT ?",
+                params + (limit,),
+            ).fetchall()
+        return [self._to_summary(row) for row in rows]
+
+    def hottest(self, limit=20):
+        """Latest run of each of the `limit` most repeated inputs, most repeated first."""
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT g.* FROM generations g JOIN (
+                    SELECT MAX(id) AS id, COUNT(*) AS runs FROM generations
+                    WHERE success = 1 GROUP BY input_hash
+                ) hot ON hot.id = g.id
+                ORDER BY hot.runs DESC, g.id DESC LIMIT ?
+                """,
+                (limit,),
+            ).fetchall()
+        return [self._to_record(row, include_code=True) for row in rows]
+
+    def list(self, limit=20, before=None, tenant=None):
+        """
+        Keyset pagination over generations (of `tenant`, if given), newest first.
+        Returns (items, next_cursor); pass next_cursor back as `before`.
+        """
+        where, params = ("id < ?", (before,)) if before is not None else ("1 = 1", ())
+        where, params = _tenant_filter(where, params, tenant)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {SUMMARY_COLUMNS} FROM generations WHERE {where} ORDER BY id DESC LIMIT ?",
+                params + (limit + 1,),
+            ).fetchall()
+
+        has_more = len(rows) > limit
+        items = [self._to_summary(row) for row in rows[:limit]]
+        next_cursor = items[-1]["id"] if has_more and items else None
+        return items, next_cursor
+
+    # ------------------------------------------------------------------
+    # Row helpers
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _to_summary(row):
+        return {
+            "id": row["id"],
+            "created_at": row["created_at"],
+            "input_hash": row["input_hash"],
+            "input_type": row["input_type"],
+            "framework": row["framework"],
+            "status": row["status"],
+            "success": bool(row["success"]),
+            "code_sha256": row["code_sha256"],
+            "code_bytes": row["code_bytes"],
+            "total_tokens": row["total_tokens"],
+        }
+
+    def _to_record(self, row, include_code):
+        record = self._to_summary(row)
+        record.update({
+            "input_data": row["input_data"],
+            "vision_result": json.loads(row["vision_json"]) if row["vision_json"] else None,
+            "evaluation_result": json.loads(row["evaluation_json"]) if row["evaluation_json"] else None,
+            "timings": json.loads(row["timings_json"]) if row["timings_json"] else {},
+            "prompts": json.loads(row["prompts_json"]) if row["prompts_json"] else {},
+            "usage": {
+                "prompt_tokens": row["prompt_tokens"],
+                "completion_tokens": row["completion_tokens"],
+                "total_tokens": row["total_tokens"],
+            },
+            "generated_code": self.get_artifact(row["code_sha256"]) if include_code else None,
+        })
+        return record
+
+
+def _tenant_filter(where, params, tenant):
+    """Adds `AND tenant = ?` to a WHERE clause unless `tenant` is None (unscoped)."""
+    if tenant is None:
+        return where, params
+    return f"{where} AND tenant = ?", params + (tenant,)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_history_store():
+    """Lazily opened process-wide history store."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = HistoryStore()
+        return _store
@@ -0,0 +1,124 @@
+import gzip
+import hashlib
+
+from fastapi import Request
+from fastapi.responses import Response
+from starlette.datastructures import Headers, MutableHeaders
+
+from .serialization import dump_json
+
+# Bodies smaller than this are cheaper to send as-is
+GZIP_MINIMUM_SIZE = 1024
+GZIP_LEVEL = 6
+GZIP_ETAG_SUFFIX = "-gzip"
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "application/x-ndjson")
+
+
+# -------------------------------------------------------------------
+# ------------------------- ETAGS -----------------------------------
+# -------------------------------------------------------------------
+
+def content_etag(body):
+    """Strong ETag derived from the exact response bytes."""
+    return f'"{hashlib.sha256(body).hexdigest()}"'
+
+
+def _opaque_tag(tag):
+    # Weak comparison (RFC 9110 §13.1.2): ignore W/ and our per-encoding suffix
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    if tag.endswith(GZIP_ETAG_SUFFIX + '"'):
+        tag = tag[: -len(GZIP_ETAG_SUFFIX) - 1] + '"'
+    return tag
+
+
+def if_none_match(request: Request, etag):
+    """True when the client already holds the representation tagged `etag`."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    wanted = _opaque_tag(etag)
+    return any(_opaque_tag(tag) == wanted for tag in header.split(","))
+
+
+def conditional_response(request: Request, body, media_type, etag=None, cache_control="no-cache"):
+    """Returns 304 if the client's copy is current, else the full body with its ETag."""
+    etag = etag or content_etag(body)
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if if_none_match(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def conditional_json(request: Request, data):
+    """JSON response with a content-hash ETag and If-None-Match support."""
+    body = dump_json(data)
+    return conditional_response(request, body, "application/json")
+
+
+# -------------------------------------------------------------------
+# ---------------------- COMPRESSION --------------------------------
+# -------------------------------------------------------------------
+
+class CompressionMiddleware:
+    """
+    Gzips large single-message responses for clients that accept it.
+    Streaming responses (more than one body message) pass through untouched so
+    progress updates are not held back in the compressor.
+    """
+
+    def __init__(self, app, minimum_size=GZIP_MINIMUM_SIZE, level=GZIP_LEVEL):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = level
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or "gzip" not in Headers(scope=scope).get("accept-encoding", ""):
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            headers = MutableHeaders(raw=start_message["headers"])
+
+            if (
+                more_body
+                or len(body) < self.minimum_size
+                or "content-encoding" in headers
+                or not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+            ):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            compressed = gzip.compress(body, compresslevel=self.level)
+            headers["Content-Encoding"] = "gzip"
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/") and etag.endswith('"'):
+                # A strong tag names one exact byte sequence, so the gzip variant gets its own
+                headers["ETag"] = etag[:-1] + GZIP_ETAG_SUFFIX + '"'
+
+            await send(start_message)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
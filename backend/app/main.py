@@ -1,24 +1,68 @@
 # main.py
 from dotenv import load_dotenv
 load_dotenv()
+import asyncio
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from .routes import router
+from .sessions import router as sessions_router
 # Make sure file is named routes.py and in the same folder
 from fastapi.middleware.cors import CORSMiddleware
+from .admission import AdmissionMiddleware
+from .http_cache import CompressionMiddleware
+from .request_tracing import TRACE_ID_HEADER, TracingMiddleware
+from .profiling import PROFILE_ID_HEADER, ProfilingMiddleware
+from .profiling import router as admin_router
+from .warmup import get_warmup
+from tracing import get_exporter
 
 app = FastAPI(title="DreamForge Backend")
 
+# Concurrency limits + bounded queues for the LLM endpoints; early 503 + Retry-After when
+# overloaded. Added first so it sits inside CORS and shed responses stay readable by the browser.
+app.add_middleware(AdmissionMiddleware)
+
 # Enable CORS for frontend integration
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Retry-After", TRACE_ID_HEADER, PROFILE_ID_HEADER],
 )
 
+# Gzip large JSON/code bodies (streams pass through uncompressed)
+app.add_middleware(CompressionMiddleware)
+
+# Admin-requested or 1-in-N sampled request profiles (see /api/admin/profiles)
+app.add_middleware(ProfilingMiddleware)
+
+# One trace per request: spans for every pipeline stage and LLM call (see orchestrator/trace_report.py)
+app.add_middleware(TracingMiddleware)
+
 # Include all API routes
 app.include_router(router)
+app.include_router(sessions_router)
+app.include_router(admin_router)
+
+# Warm-up runs in the background so /ready can answer (503) while it is in progress
+@app.on_event("startup")
+async def start_warmup():
+    app.state.warmup_task = asyncio.create_task(get_warmup().run())
+
+# Write out spans still queued for the trace file before the process exits
+@app.on_event("shutdown")
+async def flush_traces():
+    await asyncio.to_thread(get_exporter().flush)
 
 @app.get("/")
 def read_root():
     return {"message": "DreamForge backend is running successfully 🚀"}
+
+# Readiness probe for load balancers: 200 only once warm-up has finished
+@app.get("/ready")
+def readiness():
+    report = get_warmup().report()
+    if not report["ready"]:
+        return JSONResponse(report, status_code=503, headers={"Retry-After": "1"})
+    return report
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 
 class VisionAgentRequest(BaseModel):
@@ -10,6 +10,7 @@ class VisionAgentResponse(BaseModel):
     layout: str
     components: Optional[List[str]] = []
     data_elements: Optional[List[str]] = []
+    layout_hash: Optional[str] = None  # canonical hash of components + data elements (Code stage cache key)
     success: bool = True
     message: Optional[str] = None
 
@@ -36,9 +37,127 @@ class OrchestratorRequest(BaseModel):
     input_type: str = "voice"
     input_data: str
     framework: Optional[str] = "react"
+    frameworks: Optional[List[str]] = None  # fan out: one Vision run, code + evaluation per framework
+    refresh: Optional[List[str]] = None  # stages to recompute instead of reusing memoized output
+    speculative: Optional[bool] = None  # start Code from partial Vision output (default: DREAMFORGE_SPECULATIVE_CODE)
+    max_repairs: Optional[int] = None  # patch rounds when the review fails (default: DREAMFORGE_MAX_REPAIRS, 0 = off)
+    candidates: Optional[int] = None  # best-of-N Code runs per framework (default: DREAMFORGE_CANDIDATES, 1 = off)
+
+class SessionMessage(BaseModel):
+    """Client message on the /api/ws/orchestrate WebSocket."""
+    type: str  # "run", "rerun", "cancel", "ping"
+    input_type: str = "voice"
+    input_data: str = ""  # run
+    framework: Optional[str] = None  # run (default "react") or rerun (default: the session's)
+    stage: Optional[str] = None  # rerun: "vision", "code" or "evaluate"
+
+class RepairRequest(BaseModel):
+    generated_code: str
+    framework: Optional[str] = "react"
+    evaluation: Optional[EvaluatorAgentResponse] = None  # reviewed first when missing
+    max_iterations: Optional[int] = None
+
+class RepairAttempt(BaseModel):
+    iteration: int
+    files: List[str] = []
+    patches_applied: int = 0
+    patches_failed: int = 0
+    status: Optional[str] = None  # review status after this round
+    issues: int = 0
+    completion_tokens: int = 0
+
+class RepairResponse(BaseModel):
+    code_result: CodeAgentResponse
+    evaluation_result: EvaluatorAgentResponse
+    attempts: List[RepairAttempt] = []
+    repaired: bool = False
+    stop_reason: str  # "passed", "max_iterations", "no_patch", "no_progress", "review_error"
+
+class CandidateReport(BaseModel):
+    index: int
+    status: str  # "passed", "rejected_locally", "rejected_by_review", "error", "cancelled"
+    problems: List[str] = []  # local check failures or the error
+    issues: int = 0
+    seconds: Optional[float] = None  # from the start of the selection until scored
+    completion_tokens: int = 0
+
+class CandidateSelection(BaseModel):
+    winner: int
+    passed: bool  # False when no candidate passed and the best-ranked one was used
+    candidates: List[CandidateReport] = []
+
+class FrameworkVariant(BaseModel):
+    framework: str
+    code_result: Optional[CodeAgentResponse] = None
+    evaluation_result: Optional[EvaluatorAgentResponse] = None
+    repair: Optional[RepairResponse] = None
+    selection: Optional[CandidateSelection] = None
+    generation_id: Optional[int] = None
+    success: bool = True
+    message: Optional[str] = None
 
 class OrchestratorResponse(BaseModel):
     vision_result: VisionAgentResponse
     code_result: CodeAgentResponse
     evaluation_result: EvaluatorAgentResponse
+    repair: Optional[RepairResponse] = None
+    selection: Optional[CandidateSelection] = None
+    success: bool = True
+    generation_id: Optional[int] = None
+    input_hash: Optional[str] = None
+    variants: Optional[List[FrameworkVariant]] = None
+
+class GenerationSummary(BaseModel):
+    id: int
+    created_at: float
+    input_hash: str
+    input_type: str
+    framework: Optional[str] = None
+    status: Optional[str] = None
     success: bool = True
+    code_sha256: Optional[str] = None
+    code_bytes: int = 0
+    total_tokens: int = 0
+
+class GenerationRecord(GenerationSummary):
+    input_data: str
+    vision_result: Optional[Dict[str, Any]] = None
+    evaluation_result: Optional[Dict[str, Any]] = None
+    timings: Dict[str, float] = {}
+    usage: Dict[str, int] = {}
+    prompts: Dict[str, str] = {}  # prompt fingerprints the run was generated with
+    generated_code: Optional[str] = None
+
+class GenerationPage(BaseModel):
+    items: List[GenerationSummary]
+    next_cursor: Optional[int] = None
+
+class DiffHunk(BaseModel):
+    start: int  # 0-based line in the old file
+    delete: int
+    insert: List[str]
+
+class FileDiff(BaseModel):
+    name: str
+    status: str  # "added", "modified", "removed"
+    hunks: Optional[List[DiffHunk]] = None
+    content: Optional[str] = None  # whole new file when hunks would be bigger
+    header: Optional[str] = None  # raw header line, when not the plain **name** form or changed
+
+class GenerationDiff(BaseModel):
+    from_id: int
+    to_id: int
+    from_sha256: Optional[str] = None
+    to_sha256: Optional[str] = None
+    files: List[FileDiff]
+    order: List[str]
+    stats: Dict[str, int]
+
+class SandboxRunResponse(BaseModel):
+    generation_id: int
+    exit_code: Optional[int] = None
+    stdout: str = ""
+    stderr: str = ""
+    duration: float = 0.0
+    timed_out: bool = False
+    warm: bool = True
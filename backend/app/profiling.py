@@ -0,0 +1,324 @@
+import asyncio
+import concurrent.futures.thread
+import hmac
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from fastapi import APIRouter, HTTPException, Request
+from starlette.datastructures import Headers, MutableHeaders, QueryParams
+
+from .history import DATA_DIR
+from .http_cache import conditional_json
+
+# ✅ Profiling settings
+# DREAMFORGE_ADMIN_TOKEN      enables on-demand profiles (X-Profile: 1 or ?profile=1 plus X-Admin-Token)
+# DREAMFORGE_PROFILE_SAMPLE_N profile 1 in N API requests into the on-disk ring buffer (0 = off)
+ADMIN_TOKEN = os.getenv("DREAMFORGE_ADMIN_TOKEN", "")
+SAMPLE_EVERY = int(os.getenv("DREAMFORGE_PROFILE_SAMPLE_N", "0"))
+RING_SIZE = int(os.getenv("DREAMFORGE_PROFILE_RING_SIZE", "50"))
+SAMPLE_INTERVAL = float(os.getenv("DREAMFORGE_PROFILE_INTERVAL_MS", "5")) / 1000
+PROFILE_DIR = os.path.join(DATA_DIR, "profiles")
+
+PROFILE_ID_HEADER = "X-Profile-Id"
+MAX_STACK_DEPTH = 64
+TOP_FUNCTIONS = 40
+# Thread-pool plumbing present in every worker stack; dropped to keep stacks readable
+SKIPPED_FILES = {threading.__file__, concurrent.futures.thread.__file__, __file__}
+
+# The profile collecting samples for the current request, if any
+_active_profile = ContextVar("dreamforge_active_profile", default=None)
+
+router = APIRouter(prefix="/api/admin")
+
+
+def is_admin(headers):
+    supplied = headers.get("x-admin-token", "")
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode())
+
+
+# -------------------------------------------------------------------
+# ------------------------ SAMPLER ----------------------------------
+# -------------------------------------------------------------------
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _is_idle(frame):
+    # An event loop waiting in select() is not spending CPU on anyone's request
+    return frame.f_code.co_name in ("select", "poll") and "selectors" in frame.f_code.co_filename
+
+
+class RequestProfile:
+    """
+    Wall-clock sampling profiler scoped to one request.
+    A background thread reads the stacks of the event loop thread and of the
+    worker threads this request registered (see `to_thread`) every interval.
+    Samples of the loop thread include any other request it was serving.
+    """
+
+    def __init__(self, method, path, interval=SAMPLE_INTERVAL):
+        self.method = method
+        self.path = path
+        self.interval = interval
+        self.threads = {threading.get_ident(): "event-loop"}
+        self.stacks = Counter()
+        self.samples = 0
+        self.idle_samples = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample_loop, name="dreamforge-profiler", daemon=True)
+        self.started = time.time()
+        self.duration = None
+
+    def start(self):
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        self._sampler.join()
+        self.duration = time.time() - self.started
+
+    def register_thread(self, ident, label):
+        with self._lock:
+            self.threads[ident] = label
+
+    def unregister_thread(self, ident):
+        with self._lock:
+            self.threads.pop(ident, None)
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                threads = dict(self.threads)
+            for ident, label in threads.items():
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                if _is_idle(frame):
+                    self.idle_samples += 1
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    if frame.f_code.co_filename not in SKIPPED_FILES:
+                        stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(label)
+                self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+
+    def to_dict(self, profile_id):
+        self_counts, total_counts = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")[1:]
+            if frames:
+                self_counts[frames[-1]] += count
+            for function in set(frames):
+                total_counts[function] += count
+        return {
+            "id": profile_id,
+            "method": self.method,
+            "path": self.path,
+            "started": self.started,
+            "duration": self.duration,
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "idle_samples": self.idle_samples,
+            "top_functions": [
+                {"function": function, "self": self_counts[function], "total": total}
+                for function, total in total_counts.most_common(TOP_FUNCTIONS)
+            ],
+            "folded": dict(self.stacks.most_common()),
+        }
+
+
+async def to_thread(func, *args, **kwargs):
+    """asyncio.to_thread that lets an active request profile sample the worker thread too."""
+    profile = _active_profile.get()
+    if profile is None:
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+    def run():
+        ident = threading.get_ident()
+        profile.register_thread(ident, f"worker:{getattr(func, '__name__', 'call')}")
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.unregister_thread(ident)
+
+    return await asyncio.to_thread(run)
+
+
+# -------------------------------------------------------------------
+# ------------------------ STORAGE ----------------------------------
+# -------------------------------------------------------------------
+
+class ProfileStore:
+    """
+    On-demand profiles are kept as `request-<id>.json`; sampled ones go to a
+    fixed ring of `ring-<slot>.json` files, so the oldest sample is overwritten.
+    """
+
+    def __init__(self, directory=PROFILE_DIR, ring_size=RING_SIZE):
+        self.directory = directory
+        self.ring_size = max(1, ring_size)
+        self._lock = threading.Lock()
+        self._requests = 0
+        os.makedirs(directory, exist_ok=True)
+        self._ring_slot = self._next_ring_slot()
+
+    def _next_ring_slot(self):
+        # Continue after the newest sample from a previous process instead of overwriting it
+        ring = [name for name in os.listdir(self.directory) if name.startswith("ring-") and name.endswith(".json")]
+        if not ring:
+            return 0
+        newest = max(ring, key=lambda name: os.path.getmtime(os.path.join(self.directory, name)))
+        try:
+            return (int(newest[5:-5]) + 1) % self.ring_size
+        except ValueError:
+            return 0
+
+    def should_sample(self):
+        """True for every SAMPLE_EVERY-th request."""
+        if SAMPLE_EVERY <= 0:
+            return False
+        with self._lock:
+            self._requests += 1
+            return self._requests % SAMPLE_EVERY == 0
+
+    def _write(self, name, data):
+        path = os.path.join(self.directory, f"{name}.json")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def new_id(self, sampled):
+        """Next ring slot for sampled profiles, a fresh unique name otherwise."""
+        if not sampled:
+            return f"request-{int(time.time())}-{secrets.token_hex(4)}"
+        with self._lock:
+            slot = self._ring_slot
+            self._ring_slot = (slot + 1) % self.ring_size
+        return f"ring-{slot:03d}"
+
+    def save(self, profile_id, profile):
+        self._write(profile_id, profile.to_dict(profile_id))
+
+    def list(self):
+        items = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, name)
+            items.append({"id": name[:-5], "modified": os.path.getmtime(path), "bytes": os.path.getsize(path)})
+        return sorted(items, key=lambda item: item["modified"], reverse=True)
+
+    def get(self, profile_id):
+        if not profile_id.replace("-", "").isalnum():
+            return None
+        try:
+            with open(os.path.join(self.directory, f"{profile_id}.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+
+_store = None
+
+
+def get_profile_store():
+    """Lazily created process-wide profile store."""
+    global _store
+    if _store is None:
+        _store = ProfileStore()
+    return _store
+
+
+# -------------------------------------------------------------------
+# ----------------------- MIDDLEWARE --------------------------------
+# -------------------------------------------------------------------
+
+class ProfilingMiddleware:
+    """
+    Profiles an API request when an admin asks for it (X-Profile: 1 or
+    ?profile=1, with a valid X-Admin-Token) or when it is picked by 1-in-N
+    sampling. The profile id is returned in X-Profile-Id.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith("/api/") \
+                or scope["path"].startswith("/api/admin/"):
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        requested = headers.get("x-profile") == "1" or \
+            QueryParams(scope.get("query_string", b"").decode("latin-1")).get("profile") == "1"
+        on_demand = requested and is_admin(headers)
+        sampled = not on_demand and get_profile_store().should_sample()
+        if not on_demand and not sampled:
+            await self.app(scope, receive, send)
+            return
+
+        store = get_profile_store()
+        profile = RequestProfile(scope["method"], scope["path"])
+        # The id is assigned up front so it can go out with the response headers
+        profile_id = store.new_id(sampled)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[PROFILE_ID_HEADER] = profile_id
+            await send(message)
+
+        reset = _active_profile.set(profile)
+        profile.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _active_profile.reset(reset)
+            profile.stop()
+            try:
+                await asyncio.to_thread(store.save, profile_id, profile)
+                print(f"🔬 Profiled {scope['method']} {scope['path']} → {profile_id} ({profile.samples} samples)")
+            except OSError as e:
+                print("⚠️ Could not store profile:", e)
+
+
+# -------------------------------------------------------------------
+# ---------------------- ADMIN ENDPOINTS ----------------------------
+# -------------------------------------------------------------------
+
+def require_admin(request: Request):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled (set DREAMFORGE_ADMIN_TOKEN)")
+    if not is_admin(request.headers):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@router.get("/profiles")
+async def list_profiles(request: Request):
+    """Stored request profiles, newest first (admin only)"""
+    require_admin(request)
+    return conditional_json(request, get_profile_store().list())
+
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(request: Request, profile_id: str):
+    """One profile: top functions by sample count plus folded stacks for flamegraph tools (admin only)"""
+    require_admin(request)
+    profile = get_profile_store().get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found")
+    return conditional_json(request, profile)
@@ -0,0 +1,35 @@
+from starlette.datastructures import Headers, MutableHeaders
+
+from tracing import parse_traceparent, span
+
+TRACE_ID_HEADER = "X-Trace-Id"
+
+
+class TracingMiddleware:
+    """
+    Opens a root span for every HTTP request; pipeline stages and agent calls
+    made while handling it become its children. An incoming W3C `traceparent`
+    header is continued, and the trace id is echoed back in X-Trace-Id.
+    WebSocket sessions trace each run themselves (a connection can hold many).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace_id, parent_id = parse_traceparent(Headers(scope=scope).get("traceparent"))
+        attributes = {"http.method": scope["method"], "http.path": scope["path"]}
+        name = f"{scope['method']} {scope['path']}"
+        with span(name, trace_id=trace_id, parent_id=parent_id, **attributes) as request_span:
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    request_span.set("http.status_code", message["status"])
+                    MutableHeaders(scope=message)[TRACE_ID_HEADER] = request_span.trace_id
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import StreamingResponse
-import json
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+import asyncio
 import os
 import sys
+from contextlib import contextmanager
+from typing import List, Optional
 from dotenv import load_dotenv
 
 # Import models from same folder
@@ -10,8 +12,14 @@ from .models import (
     VisionAgentRequest, VisionAgentResponse,
     CodeAgentRequest, CodeAgentResponse,
     EvaluatorAgentRequest, EvaluatorAgentResponse,
-    OrchestratorRequest, OrchestratorResponse
+    OrchestratorRequest, OrchestratorResponse, FrameworkVariant, CandidateSelection,
+    RepairRequest, RepairResponse,
+    GenerationRecord, GenerationPage, GenerationSummary, GenerationDiff, SandboxRunResponse
 )
+from .history import get_history_store, input_hash
+from .http_cache import conditional_json, conditional_response, if_none_match
+from .profiling import is_admin, to_thread
+from .serialization import FastJSONResponse, dump_json
 
 # ✅ Dynamically add orchestrator path for imports
 # Detect whether agents are inside /orchestrator or /orchestrator/agents
@@ -20,167 +28,771 @@ agents_path = os.path.join(base_orchestrator_path, "agents")
 
 if os.path.exists(agents_path):
     sys.path.append(agents_path)
-else:
-    sys.path.append(base_orchestrator_path)
+sys.path.append(base_orchestrator_path)
 
 # ✅ Import your agents
 from vision_agent import process_input
-from code_agent import generate_code
-from evaluator_agent import validate_code
-
-# ✅ Optional: Import Groq client (for streaming endpoint)
-try:
-    from groq import Groq
-except ImportError:
-    Groq = None
+from code_agent import DEFAULT_FRAMEWORK, generate_code, save_code
+from code_diff import diff_code, unified_diff
+from code_files import python_entrypoint
+from layout_schema import layout_prompt_text, normalize_layout
+from evaluator_agent import parse_review, validate_code, validate_code_streaming
+from repair_agent import MAX_REPAIR_ITERATIONS, repair_code
+from llm import (
+    CancelToken, RequestCancelled, cancel_stats, cancellation_scope, count_cancelled, delta_listener,
+    provider_stats, record_usage, usage_scope
+)
+from pipeline import Node, Pipeline, SharedMemo
+from prompts import prompt_fingerprint
+from shared_state import get_shared_state
+from tracing import current_span, span, start_span
+from sandbox import SandboxUnavailable, get_sandbox_pool
+from .disconnect import cancel_on_disconnect
+from .admission import admission_stats
+from .tenants import TenantRejected, get_tenants, tenant_stats, tenant_totals
+from .candidates import candidate_count, candidate_stats, select_candidate
+from .speculation import SPECULATION_ENABLED, Speculation, active_speculation, speculation_scope, speculation_stats
 
 # ✅ Load environment variables
 load_dotenv()
 router = APIRouter(prefix="/api")
 
-# ✅ Initialize Groq client safely
-client = None
-if Groq is not None:
-    groq_api_key = os.getenv("GROQ_API_KEY")
-    if groq_api_key:
-        client = Groq(api_key=groq_api_key)
+# ✅ Stage outputs memoized by input hash, shared by every pipeline run in this process and,
+# with DREAMFORGE_SHARED_STATE, by every worker; identical stages in flight run only once
+pipeline_memo = SharedMemo(
+    get_shared_state(),
+    max_entries=int(os.getenv("DREAMFORGE_MEMO_ENTRIES", "256")),
+    ttl=float(os.getenv("DREAMFORGE_MEMO_TTL", str(24 * 3600))),
+)
 
 
 # -------------------------------------------------------------------
 # --------------------- INDIVIDUAL AGENTS ----------------------------
 # -------------------------------------------------------------------
 
-@router.post("/vision", response_model=VisionAgentResponse)
-async def vision_agent_endpoint(request: VisionAgentRequest):
-    """Vision Agent: Converts voice/sketch/text into structured layout components"""
+# ✅ The run_* helpers are the internal path: they validate LLM output once, where it
+# enters the system, and hand back models that later hops pass along untouched.
+
+async def run_vision_agent(input_type, input_data):
     try:
-        result = process_input(request.input_type, request.input_data)
+        result = await to_thread(process_input, input_type, input_data)
+        if isinstance(result, dict) and result.get("error"):
+            # The agent's fallback layout: fail the stage so it is never memoized or shared
+            raise HTTPException(status_code=500, detail=f"Vision Agent failed: {result['error']}")
         layout_content = str(result.get("layout") if isinstance(result, dict) and "layout" in result else result)
 
-        # Try to parse as JSON
-        try:
-            parsed = json.loads(layout_content)
-            return VisionAgentResponse(
-                layout=parsed.get("layout", layout_content),
-                components=parsed.get("components", []),
-                data_elements=parsed.get("data_elements", []),
-                success=True,
-            )
-        except json.JSONDecodeError:
-            return VisionAgentResponse(layout=layout_content, components=[], data_elements=[], success=True)
+        # Canonical schema (vocabulary component names, sorted lists, layout hash) so
+        # differently worded answers for the same app hit the same downstream cache entries
+        return VisionAgentResponse.model_construct(**normalize_layout(layout_content), success=True)
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Vision Agent failed: {e}")
 
 
-@router.post("/code", response_model=CodeAgentResponse)
-async def code_agent_endpoint(request: CodeAgentRequest):
-    """Code Agent: Generates frontend + backend code based on layout description"""
+async def run_code_agent(layout, framework, save=True):
     try:
-        generated_code = generate_code(request.layout)
+        generated_code = await to_thread(generate_code, layout, framework or DEFAULT_FRAMEWORK, save)
         if not generated_code:
             raise HTTPException(status_code=500, detail="Code generation failed")
-        return CodeAgentResponse(generated_code=generated_code, success=True)
+        # Plain str from our own agent: nothing to validate, so skip copying it through pydantic
+        return CodeAgentResponse.model_construct(generated_code=generated_code, success=True)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Code Agent failed: {e}")
 
 
-@router.post("/evaluate", response_model=EvaluatorAgentResponse)
-async def evaluator_agent_endpoint(request: EvaluatorAgentRequest):
-    """Evaluator Agent: Reviews and validates generated code"""
+async def run_evaluator_agent(generated_code, on_finding=None):
     try:
-        result = validate_code(request.generated_code)
-        if isinstance(result, str):
-            try:
-                result = json.loads(result)
-            except json.JSONDecodeError:
-                return EvaluatorAgentResponse(
-                    status="ok", issues=[], suggestions=[], overall_feedback=result, success=True
-                )
+        if on_finding is None:
+            result = await to_thread(validate_code, generated_code)
+        else:
+            result = await to_thread(validate_code_streaming, generated_code, on_finding)
+        # Lenient: a review wrapped in prose or ``` fences keeps its "fail" status (and triggers repair)
+        result = parse_review(result)
+        if result["status"] == "error":
+            # The agent's fallback when the LLM call failed: not a review, so fail the stage
+            raise HTTPException(status_code=500, detail=f"Evaluator Agent failed: {result['overall_feedback']}")
         return EvaluatorAgentResponse(
-            status=result.get("status", "ok"),
-            issues=result.get("issues", []),
-            suggestions=result.get("suggestions", []),
-            overall_feedback=result.get("overall_feedback", "Code reviewed successfully"),
+            status=result["status"],
+            issues=result["issues"],
+            suggestions=result["suggestions"],
+            overall_feedback=result["overall_feedback"] or "Code reviewed successfully",
             success=True,
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Evaluator Agent failed: {e}")
 
 
+async def run_repair_agent(code_result, evaluation_result, framework, max_iterations):
+    try:
+        result = await to_thread(
+            repair_code, code_result.generated_code, evaluation_result.model_dump(),
+            framework or DEFAULT_FRAMEWORK, max_iterations,
+        )
+        return RepairResponse(
+            code_result=CodeAgentResponse.model_construct(generated_code=result["code"], success=True),
+            evaluation_result=EvaluatorAgentResponse(**{**result["evaluation"], "success": True}),
+            attempts=result["attempts"],
+            repaired=result["repaired"],
+            stop_reason=result["stop_reason"],
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Repair Agent failed: {e}")
+
+
+@router.post("/vision", response_model=VisionAgentResponse)
+async def vision_agent_endpoint(request: VisionAgentRequest):
+    """Vision Agent: Converts voice/sketch/text into structured layout components"""
+    return FastJSONResponse(await run_vision_agent(request.input_type, request.input_data))
+
+
+@router.post("/code", response_model=CodeAgentResponse)
+async def code_agent_endpoint(request: CodeAgentRequest):
+    """Code Agent: Generates frontend + backend code based on layout description"""
+    return FastJSONResponse(await run_code_agent(request.layout, request.framework))
+
+
+@router.post("/evaluate", response_model=EvaluatorAgentResponse)
+async def evaluator_agent_endpoint(request: EvaluatorAgentRequest):
+    """Evaluator Agent: Reviews and validates generated code"""
+    return FastJSONResponse(await run_evaluator_agent(request.generated_code))
+
+
+@router.post("/repair", response_model=RepairResponse)
+async def repair_agent_endpoint(request: RepairRequest):
+    """Repair Agent: patches the files the review complains about and re-reviews, up to max_iterations rounds"""
+    evaluation = request.evaluation or await run_evaluator_agent(request.generated_code)
+    code = CodeAgentResponse.model_construct(generated_code=request.generated_code, success=True)
+    max_iterations = MAX_REPAIR_ITERATIONS if request.max_iterations is None else request.max_iterations
+    return FastJSONResponse(await run_repair_agent(code, evaluation, request.framework, max_iterations))
+
+
+@router.post("/evaluate-stream")
+async def evaluator_stream_endpoint(request: EvaluatorAgentRequest):
+    """
+    Evaluator Agent as NDJSON: one {"type": "issue" | "suggestion", "index", "value"} record
+    as soon as the LLM has written it, then a final {"type": "status", ...} record with the full review
+    """
+    async def stream_records():
+        token = CancelToken()
+        loop = asyncio.get_running_loop()
+        records = asyncio.Queue()
+
+        def on_finding(record):
+            loop.call_soon_threadsafe(records.put_nowait, record)
+
+        # Findings are queued from the worker thread before its result is, so None always comes last
+        with cancellation_scope(token):
+            review_task = asyncio.ensure_future(run_evaluator_agent(request.generated_code, on_finding))
+        review_task.add_done_callback(lambda task: records.put_nowait(None))
+
+        try:
+            while (record := await records.get()) is not None:
+                yield dump_json(record) + b"\n"
+            evaluation = review_task.result()
+            yield dump_json({"type": "status", **evaluation.model_dump()}) + b"\n"
+        except (asyncio.CancelledError, GeneratorExit):
+            count_cancelled("requests_cancelled")
+            token.cancel("client disconnected")
+            review_task.cancel()
+            raise
+        except RequestCancelled:
+            return
+        except HTTPException as e:
+            yield dump_json({"type": "error", "message": e.detail}) + b"\n"
+
+    return StreamingResponse(stream_records(), media_type="application/x-ndjson")
+
+
 # -------------------------------------------------------------------
 # --------------------- ORCHESTRATOR --------------------------------
 # -------------------------------------------------------------------
 
+async def vision_stage(input_type, input_data):
+    speculation = active_speculation()
+    if speculation is None:
+        return await run_vision_agent(input_type, input_data)
+    # The streamed Vision JSON can start Code before Vision has finished
+    with delta_listener(speculation.on_vision_delta):
+        return await run_vision_agent(input_type, input_data)
+
+
+def code_layout(vision):
+    """Layout text the Code Agent gets for a (canonical) Vision result."""
+    return layout_prompt_text(vision.layout, vision.components, vision.data_elements)
+
+
+def vision_key(args):
+    """Code-stage memo key: the hash of the canonical layout (everything code_layout puts in the prompt)."""
+    vision = args["vision"]
+    return {**args, "vision": vision.layout_hash or vision}
+
+
+async def code_stage(vision, framework):
+    speculation = active_speculation()
+    if speculation is not None:
+        claimed = await speculation.claim(code_layout(vision), framework)
+        if claimed is not None:
+            result, usage = claimed
+            record_usage(usage)  # bill the speculative call to this stage
+            current_span().set("speculative", True)
+            return result
+    return await run_code_agent(code_layout(vision), framework)
+
+
+async def evaluate_stage(code):
+    return await run_evaluator_agent(code.generated_code)
+
+
+async def candidates_stage(vision, framework, count):
+    """Best-of-N Code: the first candidate that passes local checks and review, plus a report per candidate."""
+    winner, outcomes = await select_candidate(
+        count,
+        # Only the selected candidate is written to generated_app.py
+        generate=lambda: run_code_agent(code_layout(vision), framework, save=False),
+        review=evaluate_stage,
+    )
+    if winner is None:
+        raise HTTPException(status_code=500, detail=f"Code Agent failed: {'; '.join(outcomes[0]['problems'])}")
+    evaluation = winner["evaluation"]
+    if evaluation is None:
+        # Every candidate failed the local checks; review the best one so the response is complete
+        evaluation = await evaluate_stage(winner["code"])
+    selection = CandidateSelection(
+        winner=winner["index"],
+        passed=winner["status"] == "passed",
+        candidates=[{
+            "index": outcome["index"],
+            "status": outcome["status"],
+            "problems": outcome["problems"],
+            "issues": len(outcome["evaluation"].issues or []) if outcome.get("evaluation") else 0,
+            "seconds": outcome["seconds"],
+            "completion_tokens": outcome["usage"].get("completion_tokens", 0),
+        } for outcome in outcomes],
+    )
+    print(f"🏁 {framework}: candidate {winner['index'] + 1} of {count} selected ({winner['status']})")
+    await to_thread(save_code, winner["code"].generated_code, framework or DEFAULT_FRAMEWORK)
+    return {"code": winner["code"], "evaluation": evaluation, "selection": selection}
+
+
+async def selected_code(candidates):
+    return candidates["code"]
+
+
+async def selected_evaluation(candidates):
+    return candidates["evaluation"]
+
+
+async def repair_stage(code, evaluation, framework, max_iterations):
+    """None when the review passed; otherwise the patched code and its new review."""
+    if evaluation.status != "fail":
+        return None
+    return await run_repair_agent(code, evaluation, framework, max_iterations)
+
+
+# ✅ Each node's memo version is its prompt fingerprint, so editing one prompt only
+# invalidates the memoized outputs of that stage (and of the stages fed by it).
+VISION_NODE = Node("vision", vision_stage, inputs=("input_type", "input_data"), version=prompt_fingerprint("vision"))
+
+
+def framework_nodes(framework, suffix="", candidates=1):
+    """
+    Code → Evaluation nodes for one framework, fed by the "vision" node.
+    With several candidates a best-of-N node does both; the Code and Evaluation
+    nodes then just hand out the winner's parts.
+    """
+    if candidates > 1:
+        return [
+            Node(f"candidates{suffix}", candidates_stage, inputs={"vision": "vision"},
+                 params={"framework": framework, "count": candidates},
+                 version=f"{prompt_fingerprint('code')}+{prompt_fingerprint('evaluate')}", key=vision_key),
+            Node(f"code{suffix}", selected_code, inputs={"candidates": f"candidates{suffix}"}, memoize=False),
+            Node(f"evaluate{suffix}", selected_evaluation, inputs={"candidates": f"candidates{suffix}"}, memoize=False),
+        ]
+    return [
+        Node(f"code{suffix}", code_stage, inputs={"vision": "vision"}, params={"framework": framework},
+             version=prompt_fingerprint("code"), key=vision_key),
+        Node(f"evaluate{suffix}", evaluate_stage, inputs={"code": f"code{suffix}"},
+             version=prompt_fingerprint("evaluate")),
+    ]
+
+
+def repair_node(framework, suffix="", max_iterations=MAX_REPAIR_ITERATIONS):
+    """Repair node fed by one framework's Code and Evaluation nodes."""
+    return Node(f"repair{suffix}", repair_stage, inputs={"code": f"code{suffix}", "evaluation": f"evaluate{suffix}"},
+                params={"framework": framework, "max_iterations": max_iterations},
+                version=f"{prompt_fingerprint('repair')}+{prompt_fingerprint('evaluate')}")
+
+
+def build_orchestration_pipeline(frameworks, max_repairs=0, candidates=1):
+    """
+    Vision → (Code → Evaluation → Repair) per framework; framework branches run
+    concurrently. Repair is left out when max_repairs is 0; with candidates > 1
+    Code and Evaluation are a best-of-N selection.
+    """
+    nodes = [VISION_NODE]
+    for framework in frameworks:
+        nodes.extend(framework_nodes(framework, suffix=f":{framework}", candidates=candidates))
+        if max_repairs > 0:
+            nodes.append(repair_node(framework, suffix=f":{framework}", max_iterations=max_repairs))
+    return Pipeline(nodes, memo=pipeline_memo)
+
+
+@contextmanager
+def stage_scope(name):
+    """Pipeline node scope: a trace span around the stage plus its token usage."""
+    with span(f"stage.{name}", cache_hit=False) as stage_span, usage_scope() as usage:
+        yield usage
+        stage_span.set("total_tokens", usage["total_tokens"])
+
+
+def trace_memo_hit(event, name, value):
+    """Memoized stages never enter stage_scope; record them as zero-cost cache hits."""
+    if event == "reused":
+        start_span(f"stage.{name}", cache_hit=True).end()
+
+
+def refresh_nodes(pipeline, stages):
+    """Maps stage names ("vision", "code", "evaluate") onto pipeline node names."""
+    stages = set(stages or [])
+    if stages & {"code", "evaluate"}:
+        stages.add("candidates")  # a best-of-N node produces both
+    return {name for name in pipeline.nodes if name.split(":", 1)[0] in stages}
+
+
 @router.post("/orchestrate", response_model=OrchestratorResponse)
-async def orchestrate_endpoint(request: OrchestratorRequest):
-    """Runs all three agents in sequence (Vision → Code → Evaluation)"""
+async def orchestrate_endpoint(request: OrchestratorRequest, http_request: Request):
+    """
+    Runs Vision → Code → Evaluation. With `frameworks`, Vision runs once and
+    code generation plus evaluation run concurrently for every framework.
+    Stage outputs are memoized by input hash; list stages in `refresh` to recompute them.
+    Code starts speculatively from the streamed Vision JSON and is confirmed
+    (or re-run) once Vision finishes. With `candidates` > 1, Code runs that
+    many times concurrently and the first version to pass the local checks and
+    the review wins. A failed review triggers up to `max_repairs` rounds of
+    patching and re-review.
+    """
+    frameworks = list(dict.fromkeys(request.frameworks or [request.framework or DEFAULT_FRAMEWORK]))
+    max_repairs = MAX_REPAIR_ITERATIONS if request.max_repairs is None else max(0, request.max_repairs)
+    candidates = candidate_count(request.candidates)
+    pipeline = build_orchestration_pipeline(frameworks, max_repairs, candidates)
+    speculative = SPECULATION_ENABLED if request.speculative is None else request.speculative
+    speculative = speculative and candidates == 1  # best-of-N does not claim speculative code
     try:
-        # Step 1: Vision Agent
-        vision_result = await vision_agent_endpoint(
-            VisionAgentRequest(input_type=request.input_type, input_data=request.input_data)
-        )
-
-        # Step 2: Code Agent
-        code_result = await code_agent_endpoint(CodeAgentRequest(layout=vision_result.layout, framework=request.framework))
+        async with cancel_on_disconnect(http_request):
+            speculation = Speculation(frameworks, run_code_agent) if speculative else None
+
+            def on_event(event, name, value):
+                trace_memo_hit(event, name, value)
+                stage, _, framework = name.partition(":")
+                if event == "reused" and stage == "code" and speculation is not None:
+                    speculation.reused(framework)
+
+            with speculation_scope(speculation):
+                run = await pipeline.run(
+                    {"input_type": request.input_type, "input_data": request.input_data},
+                    refresh=refresh_nodes(pipeline, request.refresh),
+                    node_scope=stage_scope,
+                    on_event=on_event,
+                )
+        if "vision" in run.errors:
+            raise run.errors["vision"]
+
+        tenant = request_tenant(http_request)
+        variants = [await record_framework_variant(request, run, framework, tenant, first=index == 0)
+                    for index, framework in enumerate(frameworks)]
+        primary = next((variant for variant in variants if variant.success), None)
+        if primary is None:
+            raise HTTPException(status_code=500, detail="; ".join(
+                f"{variant.framework}: {variant.message}" for variant in variants
+            ))
+
+        # Every part was validated when its stage produced it; build and encode once
+        return FastJSONResponse(OrchestratorResponse.model_construct(
+            vision_result=run.results["vision"],
+            code_result=primary.code_result,
+            evaluation_result=primary.evaluation_result,
+            repair=primary.repair,
+            selection=primary.selection,
+            success=all(variant.success for variant in variants),
+            generation_id=primary.generation_id,
+            input_hash=input_hash(request.input_type, request.input_data, primary.framework),
+            variants=variants if request.frameworks else None,
+        ))
+    except RequestCancelled:
+        # Nobody is listening any more; 499 mirrors nginx's "client closed request"
+        return Response(status_code=499)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Orchestrator failed: {e}")
 
-        # Step 3: Evaluator Agent
-        evaluation_result = await evaluator_agent_endpoint(EvaluatorAgentRequest(generated_code=code_result.generated_code))
 
-        return OrchestratorResponse(
-            vision_result=vision_result,
-            code_result=code_result,
-            evaluation_result=evaluation_result,
-            success=True,
+async def record_framework_variant(request, run, framework, tenant, first=False):
+    """Turns one framework branch of a pipeline run into a stored FrameworkVariant."""
+    code_node, evaluate_node = f"code:{framework}", f"evaluate:{framework}"
+    for node in (code_node, evaluate_node):
+        if node in run.errors:
+            error = run.errors[node]
+            return FrameworkVariant.model_construct(framework=framework, success=False,
+                                                    message=str(getattr(error, "detail", error)))
+
+    # A failed repair keeps the unrepaired code; it is an improvement, not a requirement
+    repair_name = f"repair:{framework}"
+    repair = run.results.get(repair_name)
+    candidates_name = f"candidates:{framework}"
+    selection = (run.results.get(candidates_name) or {}).get("selection")
+
+    # The shared Vision call is billed to the first variant only, so totals add up
+    nodes = ("vision", code_node, evaluate_node) if first else (code_node, evaluate_node)
+    nodes += (candidates_name, repair_name)
+    usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    for node in nodes:
+        for key in usage:
+            usage[key] += (run.scopes.get(node) or {}).get(key, 0)
+    timings = {
+        "vision": run.timings["vision"],
+        "code": run.timings[code_node],
+        "evaluation": run.timings[evaluate_node],
+    }
+    if candidates_name in run.timings:
+        timings["candidates"] = run.timings[candidates_name]  # Code + Evaluation of every candidate
+    if repair_name in run.timings:
+        timings["repair"] = run.timings[repair_name]
+    timings["total"] = sum(timings.values())
+
+    code_result, evaluation_result = run.results[code_node], run.results[evaluate_node]
+    if repair is not None:
+        code_result, evaluation_result = repair.code_result, repair.evaluation_result
+    generation_id = await record_generation(
+        request.input_type, request.input_data, framework, tenant,
+        vision=run.results["vision"].model_dump(),
+        code=code_result.generated_code,
+        evaluation=evaluation_result.model_dump(),
+        timings=timings,
+        usage=usage,
+    )
+    return FrameworkVariant.model_construct(
+        framework=framework,
+        code_result=code_result,
+        evaluation_result=evaluation_result,
+        repair=repair,
+        selection=selection,
+        generation_id=generation_id,
+    )
+
+
+def stage_prompts():
+    """Fingerprints of the prompts behind the memoized stages, stored with each run."""
+    return {name: prompt_fingerprint(name) for name in ("vision", "code", "evaluate")}
+
+
+async def record_generation(input_type, input_data, framework, tenant, **fields):
+    """Stores a finished run of `tenant` (a name) in the history store; history must never break a run."""
+    try:
+        # Off the event loop: the write (and every GC_INTERVAL-th, a garbage collection) hits SQLite
+        return await to_thread(
+            get_history_store().record,
+            input_type=input_type, input_data=input_data, framework=framework, prompts=stage_prompts(),
+            tenant=tenant, **fields
         )
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Orchestrator failed: {e}")
+        print("⚠️ Could not record generation history:", e)
+        return None
 
 
 # -------------------------------------------------------------------
 # ------------------- STREAMING ORCHESTRATOR -------------------------
 # -------------------------------------------------------------------
 
+STREAM_STARTED = {
+    "vision": "🎤 Running Vision Agent...\n",
+    "code": "⚙️ Running Code Agent...\n",
+    "evaluate": "🧪 Evaluating Code...\n",
+}
+
+
+def stream_stage_done(name, value, reused):
+    cached = " (cached)" if reused else ""
+    if name == "vision":
+        return f"✅ Vision Agent Output{cached}:\n{value.model_dump_json(indent=2)}\n\n"
+    if name == "code":
+        return f"✅ Code Generated Successfully!{cached}\n\n"
+    return f"🧾 Evaluation Result{cached}:\n{value.status}: {value.overall_feedback}\n\n"
+
+
 @router.get("/orchestrate-stream")
-def orchestrate_stream(input_type: str = "voice", input_data: str = "Create a mood tracker app"):
-    """Streaming orchestrator for real-time updates"""
-    def stream_response():
+async def orchestrate_stream(http_request: Request, input_type: str = "voice", input_data: str = "Create a mood tracker app", framework: str = DEFAULT_FRAMEWORK):
+    """Streaming orchestrator for real-time updates (same prompts, stages and memo as /orchestrate)"""
+    tenant = request_tenant(http_request)
+
+    async def stream_response():
         yield "🚀 Orchestrator started...\n\n"
 
+        # Starlette cancels this generator when the client disconnects;
+        # the token then stops the agent call still running in its thread.
+        token = CancelToken()
+        events = asyncio.Queue()
+
+        def on_event(event, name, value):
+            trace_memo_hit(event, name, value)
+            events.put_nowait((event, name, value))
+
+        pipeline = Pipeline([VISION_NODE] + framework_nodes(framework), memo=pipeline_memo)
+        # The run task copies this context, so it sees the token and the usage scope
+        with cancellation_scope(token), usage_scope() as usage:
+            run_task = asyncio.ensure_future(pipeline.run(
+                {"input_type": input_type, "input_data": input_data},
+                node_scope=stage_scope,
+                on_event=on_event,
+            ))
+        run_task.add_done_callback(lambda task: events.put_nowait(("finished", None, None)))
+
         try:
-            if not client:
-                yield "❌ Error: Groq client not initialized. Set GROQ_API_KEY in .env\n"
+            while True:
+                event, name, value = await events.get()
+                if event == "finished":
+                    break
+                if event == "started":
+                    yield STREAM_STARTED[name]
+                elif event in ("completed", "reused"):
+                    yield stream_stage_done(name, value, reused=event == "reused")
+
+            run = run_task.result()
+            if not run.ok:
+                error = next(iter(run.errors.values()))
+                yield f"❌ Error: {getattr(error, 'detail', error)}\n"
                 return
 
-            # Vision Agent
-            yield "🎤 Running Vision Agent...\n"
-            vision_prompt = f"You are a UI/UX layout designer AI.\nInput type: {input_type}\nInput: {input_data}"
-            vision_response = client.chat.completions.create(
-                model="llama-3.1-8b-instant", messages=[{"role": "user", "content": vision_prompt}]
+            timings = {"vision": run.timings["vision"], "code": run.timings["code"],
+                       "evaluation": run.timings["evaluate"]}
+            timings["total"] = sum(timings.values())
+            await record_generation(
+                input_type, input_data, framework, tenant,
+                vision=run.results["vision"].model_dump(),
+                code=run.results["code"].generated_code,
+                evaluation=run.results["evaluate"].model_dump(),
+                timings=timings,
+                usage=usage,
             )
-            layout = vision_response.choices[0].message.content
-            yield f"✅ Vision Agent Output:\n{layout}\n\n"
-
-            # Code Agent
-            yield "⚙️ Running Code Agent...\n"
-            code_prompt = f"Generate React + FastAPI code for layout: {layout}"
-            code_response = client.chat.completions.create(
-                model="llama-3.1-8b-instant", messages=[{"role": "user", "content": code_prompt}]
-            )
-            yield "✅ Code Generated Successfully!\n\n"
-
-            # Evaluation Agent
-            yield "🧪 Evaluating Code...\n"
-            eval_prompt = f"Review this code and suggest improvements: {code_response.choices[0].message.content[:500]}"
-            eval_response = client.chat.completions.create(
-                model="llama-3.1-8b-instant", messages=[{"role": "user", "content": eval_prompt}]
-            )
-            evaluation = eval_response.choices[0].message.content
-            yield f"🧾 Evaluation Result:\n{evaluation}\n\n"
 
             yield "🎉 All Agents Completed Successfully!\n"
 
+        except (asyncio.CancelledError, GeneratorExit):
+            print("🔌 Stream client disconnected — cancelling pending LLM calls")
+            count_cancelled("requests_cancelled")
+            token.cancel("client disconnected")
+            run_task.cancel()
+            raise
+        except RequestCancelled:
+            return
         except Exception as e:
             yield f"❌ Error: {e}\n"
 
     return StreamingResponse(stream_response(), media_type="text/plain")
+
+
+# -------------------------------------------------------------------
+# --------------------- GENERATION HISTORY ---------------------------
+# -------------------------------------------------------------------
+
+def request_tenant(request: Request):
+    """Name of the caller's tenant (the admission middleware already resolved it on LLM endpoints)."""
+    name = getattr(request.state, "tenant", None)
+    if name is not None:
+        return name
+    try:
+        return get_tenants().resolve(request.headers).name
+    except TenantRejected as e:
+        raise HTTPException(status_code=e.status, detail=e.reason)
+
+
+def history_scope(request: Request):
+    """Tenant whose runs the caller may read; None (every tenant) for the admin token."""
+    return None if is_admin(request.headers) else request_tenant(request)
+
+
+@router.get("/generations", response_model=GenerationPage)
+async def list_generations(
+    request: Request,
+    limit: int = Query(20, ge=1, le=200),
+    before: Optional[int] = Query(None, description="Cursor from a previous page (next_cursor)"),
+):
+    """Lists past orchestrations, newest first, using keyset pagination"""
+    items, next_cursor = await to_thread(
+        get_history_store().list, limit=limit, before=before, tenant=history_scope(request)
+    )
+    return conditional_json(request, GenerationPage(items=items, next_cursor=next_cursor))
+
+
+@router.get("/generations/by-hash/{input_hash_value}", response_model=List[GenerationSummary])
+async def find_generations_by_hash(request: Request, input_hash_value: str, limit: int = Query(10, ge=1, le=100)):
+    """Finds earlier runs with identical inputs (input_type, input_data, framework)"""
+    generations = await to_thread(
+        get_history_store().find_by_input_hash, input_hash_value, limit=limit, tenant=history_scope(request)
+    )
+    return conditional_json(request, generations)
+
+
+@router.get("/generations/{generation_id}", response_model=GenerationRecord)
+async def get_generation(request: Request, generation_id: int):
+    """Returns one stored orchestration including its generated code"""
+    record = await to_thread(get_history_store().get, generation_id, tenant=history_scope(request))
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Generation {generation_id} not found")
+    return conditional_json(request, GenerationRecord(**record))
+
+
+@router.get("/generations/{generation_id}/diff", response_model=GenerationDiff)
+async def diff_generations(
+    request: Request,
+    generation_id: int,
+    from_id: int = Query(..., alias="from", description="Generation the client already has"),
+    format: str = Query("json", pattern="^(json|unified)$"),
+    context: int = Query(3, ge=0, le=50, description="Context lines for format=unified"),
+):
+    """Changes from generation `from` to this one, file by file, so clients can patch their copy"""
+    store, tenant = get_history_store(), history_scope(request)
+    records = {}
+    for key in (from_id, generation_id):
+        records[key] = await to_thread(store.get, key, tenant=tenant)
+        if records[key] is None:
+            raise HTTPException(status_code=404, detail=f"Generation {key} not found")
+        if records[key]["generated_code"] is None:
+            raise HTTPException(status_code=404, detail=f"Generation {key} has no stored code")
+    old_code, new_code = records[from_id]["generated_code"], records[generation_id]["generated_code"]
+
+    if format == "unified":
+        patch = await to_thread(unified_diff, old_code, new_code, context)
+        return conditional_response(request, patch.encode("utf-8"), "text/x-diff")
+    diff = await to_thread(diff_code, old_code, new_code)
+    return conditional_json(request, {
+        "from_id": from_id,
+        "to_id": generation_id,
+        "from_sha256": records[from_id]["code_sha256"],
+        "to_sha256": records[generation_id]["code_sha256"],
+        **diff,
+    })
+
+
+def require_runner(request: Request):
+    """Running generated code needs the admin token or a tenant's API key (never anonymous)."""
+    if is_admin(request.headers):
+        return
+    try:
+        tenant = get_tenants().resolve(request.headers)
+    except TenantRejected as e:
+        raise HTTPException(status_code=e.status, detail=e.reason)
+    if tenant is get_tenants().anonymous:
+        raise HTTPException(status_code=401, detail="Running generated code needs an API key or the admin token")
+
+
+@router.post("/generations/{generation_id}/run", response_model=SandboxRunResponse)
+async def run_generation(request: Request, generation_id: int):
+    """Smoke-runs a stored generation's Python code in a pre-warmed, isolated sandbox (API key or admin only)"""
+    require_runner(request)
+    record = await to_thread(get_history_store().get, generation_id, tenant=history_scope(request))
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Generation {generation_id} not found")
+    if not record["generated_code"]:
+        raise HTTPException(status_code=404, detail=f"Generation {generation_id} has no stored code")
+    source = python_entrypoint(record["generated_code"])
+    if source is None:
+        raise HTTPException(status_code=422, detail=f"Generation {generation_id} has no Python file to run")
+    try:
+        result = await to_thread(get_sandbox_pool().run, source)
+    except SandboxUnavailable as e:
+        raise HTTPException(status_code=503, detail=f"Sandbox unavailable: {e}")
+    return SandboxRunResponse(generation_id=generation_id, **result.to_dict())
+
+
+@router.get("/artifacts/{sha256}", response_class=Response)
+async def get_artifact(request: Request, sha256: str):
+    """Raw generated code by content hash (of the caller's runs); immutable, so clients can cache it forever"""
+    # The artifact name is the hash of its bytes, so it is already a strong ETag.
+    # Private: a shared cache must not hand one tenant's code to another.
+    etag = f'"{sha256}"'
+    cache_control = "private, max-age=31536000, immutable"
+    if if_none_match(request, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+    code = await to_thread(get_history_store().get_artifact, sha256, tenant=history_scope(request))
+    if code is None:
+        raise HTTPException(status_code=404, detail=f"Artifact {sha256} not found")
+    return conditional_response(
+        request, code.encode("utf-8"), "text/plain; charset=utf-8", etag=etag, cache_control=cache_control
+    )
+
+
+# -------------------------------------------------------------------
+# ------------------------- WARM-UP ---------------------------------
+# -------------------------------------------------------------------
+
+def preload_memo(limit):
+    """
+    Seeds the stage memo from history: Vision, Code and Evaluation of the latest
+    run of the `limit` most repeated inputs. Runs made with other prompts are
+    skipped, and so are the Code stages of repaired or best-of-N runs, since
+    their stored code is not what the plain Code stage returned. Returns the
+    number of entries added.
+    """
+    prompts = stage_prompts()
+    loaded = 0
+    for record in get_history_store().hottest(limit):
+        vision = record["vision_result"]
+        if not vision or not vision.get("layout_hash") or record["prompts"].get("vision") != prompts["vision"]:
+            continue
+        # Re-normalized, so runs stored under an older schema get the current layout hash
+        vision = VisionAgentResponse.model_construct(**normalize_layout(vision), success=True)
+        entries = [(VISION_NODE, {"input_type": record["input_type"], "input_data": record["input_data"]}, vision)]
+
+        plain_run = "repair" not in record["timings"] and "candidates" not in record["timings"]
+        same_prompts = all(record["prompts"].get(name) == prompts[name] for name in ("code", "evaluate"))
+        if plain_run and same_prompts and record["generated_code"] is not None:
+            code_node, evaluate_node = framework_nodes(record["framework"] or DEFAULT_FRAMEWORK)
+            code = CodeAgentResponse.model_construct(generated_code=record["generated_code"], success=True)
+            entries.append((code_node, {"vision": vision}, code))
+            if record["evaluation_result"]:
+                entries.append((evaluate_node, {"code": code}, EvaluatorAgentResponse(**record["evaluation_result"])))
+
+        for node, args, value in entries:
+            key = node.cache_key(args)
+            hit, _ = pipeline_memo.get(key)
+            if not hit:
+                pipeline_memo.put(key, value)
+                loaded += 1
+    return loaded
+
+
+# -------------------------------------------------------------------
+# ------------------------- METRICS ---------------------------------
+# -------------------------------------------------------------------
+
+@router.get("/usage")
+async def usage_endpoint(request: Request):
+    """The calling tenant's request and token counters, quota and queue state."""
+    try:
+        tenant = get_tenants().resolve(request.headers)
+    except TenantRejected as e:
+        raise HTTPException(status_code=e.status, detail=e.reason)
+    return await to_thread(tenant.usage)
+
+
+@router.get("/metrics")
+async def metrics_endpoint(request: Request):
+    """Process-level counters for monitoring; per-tenant usage needs the admin token"""
+    return {
+        "cancellation": dict(cancel_stats),
+        "admission": admission_stats(),
+        "providers": provider_stats(),
+        "speculation": dict(speculation_stats),
+        "candidates": dict(candidate_stats),
+        "shared_state": {"backend": pipeline_memo.state.name, **pipeline_memo.stats},
+        "tenants": await to_thread(tenant_stats if is_admin(request.headers) else tenant_totals),
+        "artifacts": await to_thread(get_history_store().stats),
+    }
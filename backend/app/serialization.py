@@ -0,0 +1,25 @@
+from fastapi.responses import Response
+from pydantic_core import to_json
+
+
+def dump_json(content):
+    """
+    Encodes `content` to UTF-8 JSON bytes in a single pass.
+    Pydantic models are serialized in place by pydantic-core, so large strings
+    (generated code) are copied once into the output instead of going through
+    model_dump → jsonable_encoder → json.dumps → encode.
+    """
+    return to_json(content)
+
+
+class FastJSONResponse(Response):
+    """
+    JSONResponse for already-trusted content (models built by our own stages).
+    Returning it from an endpoint skips FastAPI's response_model re-validation;
+    keep response_model on the route so the OpenAPI schema stays documented.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dump_json(content)
@@ -0,0 +1,249 @@
+import asyncio
+import json
+import time
+from contextlib import contextmanager
+
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+
+from .admission import Overloaded, admit, controllers, release_admission
+from .models import SessionMessage
+from .routes import (
+    VISION_NODE, framework_nodes, pipeline_memo, record_generation, stage_scope, trace_memo_hit
+)
+from .serialization import dump_json
+from .tenants import TenantRejected, get_tenants
+from llm import (
+    CancelToken, RequestCancelled, cancellation_scope, count_cancelled, delta_listener, usage_scope
+)
+from pipeline import Pipeline
+from tracing import span
+
+router = APIRouter(prefix="/api")
+
+# Pipeline order; re-running a stage also re-runs everything after it
+STAGES = ("vision", "code", "evaluate")
+
+# Every run is admitted like an HTTP orchestration: tenant quota and slots, then the fair queue
+RUN_ADMISSION = controllers[("WS", "/api/ws/orchestrate")]
+
+# Close code for a handshake without a valid API key
+POLICY_VIOLATION = 1008
+
+
+def build_session_pipeline(framework):
+    return Pipeline([VISION_NODE] + framework_nodes(framework), memo=pipeline_memo)
+
+
+class OrchestrationSession:
+    """
+    One WebSocket connection driving any number of orchestration runs.
+
+    Client → server messages:
+      {"type": "run", "input_type": "voice", "input_data": "...", "framework": "react"}
+      {"type": "rerun", "stage": "code", "framework": "vue"}   # reuses held upstream outputs
+      {"type": "cancel"}
+      {"type": "ping"}
+
+    Server → client messages:
+      {"type": "stage", "run_id", "stage", "status": "started" | "completed" | "reused", "result"}
+      {"type": "delta", "run_id", "stage", "text"}
+      {"type": "done" | "cancelled" | "error", "run_id", ...}
+      (an error for a run that was not admitted carries "status" and "retry_after")
+
+    Stage outputs live in the shared pipeline memo, so anything upstream of the
+    re-run stage whose inputs did not change is reused instead of recomputed.
+    """
+
+    def __init__(self, websocket, tenant):
+        self.websocket = websocket
+        self.tenant = tenant
+        self.inputs = {}
+        self.run_counter = 0
+        self.run_task = None
+        self.token = None
+        self.outbox = asyncio.Queue()
+
+    # ------------------------------------------------------------------
+    # Outgoing messages (single writer keeps deltas and stage events ordered)
+    # ------------------------------------------------------------------
+
+    def send(self, message):
+        self.outbox.put_nowait(message)
+
+    async def writer(self):
+        while True:
+            message = await self.outbox.get()
+            await self.websocket.send_text(dump_json(message).decode("utf-8"))
+
+    # ------------------------------------------------------------------
+    # Incoming commands
+    # ------------------------------------------------------------------
+
+    def handle(self, raw):
+        try:
+            message = SessionMessage.model_validate(raw)
+        except ValidationError as e:
+            problems = "; ".join(
+                f"{'.'.join(str(part) for part in error['loc']) or 'message'}: {error['msg']}" for error in e.errors()
+            )
+            self.send({"type": "error", "message": f"Invalid message: {problems}"})
+            return
+        kind = message.type
+
+        if kind == "ping":
+            self.send({"type": "pong"})
+        elif kind == "cancel":
+            if self.is_running():
+                self.token.cancel("cancelled by client")
+            else:
+                self.send({"type": "error", "message": "No run in progress"})
+        elif kind == "run":
+            inputs = {
+                "input_type": message.input_type,
+                "input_data": message.input_data,
+                "framework": message.framework or "react",
+            }
+            if not inputs["input_data"].strip():
+                self.send({"type": "error", "message": "input_data is required"})
+                return
+            # A new run always writes fresh code; Vision is reused when the idea is unchanged
+            self.start({"code"}, inputs)
+        elif kind == "rerun":
+            stage = message.stage
+            if stage not in STAGES:
+                self.send({"type": "error", "message": f"Unknown stage: {stage}"})
+                return
+            if not self.inputs:
+                self.send({"type": "error", "message": f"Cannot re-run {stage}: no run in this session yet"})
+                return
+            inputs = dict(self.inputs)
+            if message.framework:
+                inputs["framework"] = message.framework
+            self.start({stage}, inputs)
+        else:
+            self.send({"type": "error", "message": f"Unknown message type: {kind}"})
+
+    def is_running(self):
+        return self.run_task is not None and not self.run_task.done()
+
+    def start(self, refresh, inputs):
+        if self.is_running():
+            self.send({"type": "error", "message": "A run is already in progress; cancel it first"})
+            return
+        self.run_counter += 1
+        self.inputs = inputs
+        self.token = CancelToken()
+        self.run_task = asyncio.create_task(self.run(self.run_counter, refresh, inputs, self.token))
+
+    def close(self):
+        if self.is_running():
+            count_cancelled("requests_cancelled")
+            self.token.cancel("client disconnected")
+
+    # ------------------------------------------------------------------
+    # Pipeline
+    # ------------------------------------------------------------------
+
+    async def run(self, run_id, refresh, inputs, token):
+        tenants = get_tenants()
+        try:
+            await admit(RUN_ADMISSION, self.tenant, tenants)
+        except TenantRejected as e:
+            self.send({"type": "error", "run_id": run_id, "status": e.status,
+                       "message": e.reason, "retry_after": e.retry_after})
+            return
+        except Overloaded as e:
+            self.send({"type": "error", "run_id": run_id, "status": 503,
+                       "message": f"Server busy: {e.reason}", "retry_after": e.retry_after})
+            return
+
+        started = time.perf_counter()
+        with usage_scope() as usage:
+            try:
+                await self.execute(run_id, refresh, inputs, token)
+            finally:
+                # No await here: the run must count as finished as soon as "done" is sent
+                release_admission(RUN_ADMISSION, self.tenant, time.perf_counter() - started)
+                asyncio.get_running_loop().run_in_executor(None, self.tenant.record_usage, dict(usage))
+
+    async def execute(self, run_id, refresh, inputs, token):
+        loop = asyncio.get_running_loop()
+
+        @contextmanager
+        def node_scope(stage):
+            def on_delta(text):
+                loop.call_soon_threadsafe(
+                    self.send, {"type": "delta", "run_id": run_id, "stage": stage, "text": text}
+                )
+            with delta_listener(on_delta), stage_scope(stage) as usage:
+                yield usage
+
+        def on_event(event, stage, value):
+            trace_memo_hit(event, stage, value)
+            message = {"type": "stage", "run_id": run_id, "stage": stage, "status": event}
+            if event in ("completed", "reused"):
+                message["result"] = value  # encoded once by the writer
+            elif event in ("failed", "skipped"):
+                message["message"] = str(getattr(value, "detail", value))
+            self.send(message)
+
+        try:
+            # Each run is its own trace; the connection itself is not traced
+            with cancellation_scope(token), span("ws.run", run_id=run_id, refresh=sorted(refresh)), \
+                    usage_scope() as usage:
+                pipeline = build_session_pipeline(inputs["framework"])
+                run = await pipeline.run(inputs, refresh=refresh, node_scope=node_scope, on_event=on_event)
+
+            if not run.ok:
+                error = next(iter(run.errors.values()))
+                self.send({"type": "error", "run_id": run_id, "message": str(getattr(error, "detail", error))})
+                return
+
+            timings = {stage: run.timings[stage] for stage in STAGES}
+            timings["total"] = sum(timings.values())
+            generation_id = await record_generation(
+                inputs["input_type"], inputs["input_data"], inputs["framework"], self.tenant.name,
+                vision=run.results["vision"].model_dump(),
+                code=run.results["code"].generated_code,
+                evaluation=run.results["evaluate"].model_dump(),
+                timings=timings,
+                usage=usage,
+            )
+            self.send({"type": "done", "run_id": run_id, "generation_id": generation_id,
+                       "timings": timings, "usage": usage, "reused": sorted(run.memo_hits)})
+
+        except RequestCancelled as e:
+            self.send({"type": "cancelled", "run_id": run_id, "reason": str(e)})
+        except HTTPException as e:
+            self.send({"type": "error", "run_id": run_id, "message": e.detail})
+        except Exception as e:
+            self.send({"type": "error", "run_id": run_id, "message": str(e)})
+
+
+@router.websocket("/ws/orchestrate")
+async def orchestrate_session(websocket: WebSocket):
+    """WebSocket orchestration session: many runs, live progress, cancel and re-run"""
+    await websocket.accept()
+    try:
+        # Same API key headers as HTTP; browsers send none and get the anonymous tenant
+        tenant = get_tenants().resolve(websocket.headers)
+    except TenantRejected as e:
+        await websocket.send_text(dump_json({"type": "error", "status": e.status, "message": e.reason}).decode("utf-8"))
+        await websocket.close(code=POLICY_VIOLATION, reason=e.reason)
+        return
+    session = OrchestrationSession(websocket, tenant)
+    writer = asyncio.create_task(session.writer())
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except json.JSONDecodeError:
+                session.send({"type": "error", "message": "Messages must be JSON objects"})
+                continue
+            session.handle(message)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        session.close()
+        writer.cancel()
@@ -0,0 +1,149 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from json_stream import IncrementalJSONParser
+from layout_schema import layout_prompt_text, normalize_layout
+from llm import CancelToken, cancellation_scope, usage_scope
+from tracing import span
+
+# ✅ Start the Code stage from the streamed Vision JSON (override per request with `speculative`)
+SPECULATION_ENABLED = os.getenv("DREAMFORGE_SPECULATIVE_CODE", "1") != "0"
+
+# Vision fields that must be complete before Code starts: the Code prompt is built
+# from the canonical `components` and `data_elements` (and `layout` when there are none).
+SPECULATION_FIELDS = ("layout", "components", "data_elements")
+
+_stats_lock = threading.Lock()
+speculation_stats = {
+    "started": 0,  # speculative Code runs launched before Vision finished
+    "confirmed": 0,  # final layout matched: the result was used as is
+    "restarted": 0,  # final layout differed (or the run failed): Code ran again
+    "discarded": 0,  # never claimed (Vision failed, Code memoized, request cancelled)
+    "seconds_overlapped": 0.0,  # Code time that ran in parallel with Vision on confirmed runs
+}
+
+_active = contextvars.ContextVar("dreamforge_speculation", default=None)
+
+
+def count_speculation(key, amount=1):
+    with _stats_lock:
+        speculation_stats[key] += amount
+
+
+class Speculation:
+    """
+    Speculative Code runs for one orchestration request.
+
+    The Vision stage feeds its streamed text to `on_vision_delta`. Once the
+    JSON has a complete `layout` and `components`, Code starts for every
+    framework while Vision is still writing. The Code stage then calls `claim`
+    with the final layout: a match returns the speculative result, anything
+    else cancels the speculative calls so Code runs normally. A Code stage that
+    turns out to be memoized calls `reused` instead, which stops its run.
+    """
+
+    def __init__(self, frameworks, generate):
+        self.frameworks = list(frameworks)
+        self.generate = generate  # async (layout, framework) -> code result
+        self.loop = asyncio.get_running_loop()
+        # Request context (trace span, ...) for the speculative tasks, without stage scopes
+        self.context = contextvars.copy_context()
+        self.token = CancelToken()
+        self.tokens = {}  # framework -> child of self.token, to stop one framework's run
+        self.parser = IncrementalJSONParser()
+        self.fields = {}
+        self.layout = None
+        self.launched_at = None
+        self.tasks = {}
+
+    def on_vision_delta(self, text):
+        """Delta listener on the Vision worker thread."""
+        if self.layout is not None or self.parser.failed:
+            return
+        for path, value in self.parser.feed(text):
+            if len(path) == 1 and path[0] in SPECULATION_FIELDS:
+                self.fields[path[0]] = value
+        if all(field in self.fields for field in SPECULATION_FIELDS) and isinstance(self.fields["layout"], str):
+            canonical = normalize_layout(self.fields)
+            self.layout = layout_prompt_text(canonical["layout"], canonical["components"], canonical["data_elements"])
+            self.loop.call_soon_threadsafe(self._launch, context=self.context)
+
+    def _launch(self):
+        self.launched_at = time.perf_counter()
+        for framework in self.frameworks:
+            self.tokens[framework] = CancelToken(parent=self.token)
+            task = asyncio.ensure_future(self._speculate(framework))
+            # Unclaimed runs end cancelled; mark their errors retrieved so asyncio does not log them
+            task.add_done_callback(lambda task: task.cancelled() or task.exception())
+            self.tasks[framework] = task
+            count_speculation("started")
+
+    async def _speculate(self, framework):
+        # Own token: a mismatch cancels the provider calls, not just this task
+        with cancellation_scope(self.tokens[framework]), span("stage.code.speculative", framework=framework), \
+                usage_scope(isolated=True) as usage:
+            result = await self.generate(self.layout, framework)
+        return result, usage, time.perf_counter()
+
+    async def claim(self, layout, framework):
+        """(result, usage) of the speculative run if it was built from `layout` (Code prompt text), else None."""
+        task = self.tasks.pop(framework, None)
+        if task is None:
+            return None
+        if layout != self.layout:
+            print(f"🔮 Speculative {framework} code used a stale layout — restarting Code")
+            task.cancel()
+            self.cancel()
+            count_speculation("restarted")
+            return None
+        try:
+            result, usage, finished_at = await task
+        except Exception as e:
+            print(f"🔮 Speculative {framework} code failed ({e}) — restarting Code")
+            count_speculation("restarted")
+            return None
+        count_speculation("confirmed")
+        count_speculation("seconds_overlapped", max(0.0, min(finished_at, time.perf_counter()) - self.launched_at))
+        return result, usage
+
+    def reused(self, framework):
+        """The Code stage of `framework` was a memo hit: its speculative run is not needed."""
+        task = self.tasks.pop(framework, None)
+        if task is None:
+            return
+        print(f"🔮 {framework} code is memoized — stopping its speculative run")
+        self.tokens[framework].cancel("Code stage memoized")
+        task.cancel()
+        count_speculation("discarded")
+
+    def cancel(self):
+        self.token.cancel("speculation discarded")
+        for task in self.tasks.values():
+            task.cancel()
+
+    def discard(self):
+        """Drops unclaimed speculative runs once the request is done."""
+        if self.tasks:
+            count_speculation("discarded", len(self.tasks))
+            self.cancel()
+            self.tasks.clear()
+
+
+def active_speculation():
+    return _active.get()
+
+
+@contextmanager
+def speculation_scope(speculation):
+    """Makes `speculation` visible to the Vision and Code stages run inside the block."""
+    reset = _active.set(speculation)
+    try:
+        yield speculation
+    finally:
+        _active.reset(reset)
+        if speculation is not None:
+            speculation.discard()
@@ -0,0 +1,234 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+
+from shared_state import SharedStateError, get_shared_state
+
+# ✅ API-key tenants (DREAMFORGE_TENANTS), e.g.
+#   [{"name": "web", "api_key_env": "WEB_API_KEY", "weight": 4},
+#    {"name": "batch", "api_key_env": "BATCH_API_KEY", "weight": 1, "max_concurrency": 2,
+#     "token_quota": 500000, "quota_period": 86400},
+#    {"name": "public", "anonymous": true, "weight": 1, "max_concurrency": 1}]
+# Unset, every caller is the unlimited "default" tenant and no key is needed.
+API_KEY_HEADER = "X-API-Key"
+DEFAULT_QUOTA_PERIOD = 86400
+
+
+class TenantRejected(Exception):
+    def __init__(self, status, reason, retry_after=None):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def _key_digest(api_key):
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+class Tenant:
+    """
+    One API-key holder: a weight for fair queueing, an optional cap on
+    concurrent LLM-backed requests (per worker) and an optional token quota
+    per period. Usage counters and quota windows live in shared state, so
+    they add up across workers.
+    """
+
+    def __init__(self, name, weight=1.0, max_concurrency=None, token_quota=None, quota_period=DEFAULT_QUOTA_PERIOD):
+        self.name = name
+        self.weight = max(float(weight), 0.01)
+        self.max_concurrency = max_concurrency
+        self.token_quota = token_quota
+        self.quota_period = quota_period
+        self.in_flight = 0
+        self._waiters = []
+        self.stats = {"admitted": 0, "waited_for_slot": 0, "rejected_quota": 0, "shed": 0}
+
+    # ------------------------------------------------------------------
+    # Concurrency
+    # ------------------------------------------------------------------
+
+    async def acquire(self, timeout):
+        """Takes one of the tenant's request slots, waiting up to `timeout` seconds."""
+        if self.max_concurrency is None or (self.in_flight < self.max_concurrency and not self._waiters):
+            self.in_flight += 1
+            self.stats["admitted"] += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.stats["waited_for_slot"] += 1
+        try:
+            await asyncio.wait_for(waiter, timeout=timeout)
+        except asyncio.TimeoutError:
+            self.stats["shed"] += 1
+            raise TenantRejected(503, f"tenant {self.name} is at its concurrency limit", retry_after=max(1, int(timeout)))
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        self.stats["admitted"] += 1
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.pop(0)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    # ------------------------------------------------------------------
+    # Quota and usage
+    # ------------------------------------------------------------------
+
+    def _window(self):
+        return int(time.time() // self.quota_period)
+
+    def quota_used(self):
+        if not self.token_quota:
+            return 0
+        try:
+            return int(get_shared_state().get(f"tenant:{self.name}:tokens:{self._window()}") or 0)
+        except SharedStateError as e:
+            print(f"⚠️ Quota check for tenant {self.name} failed: {e}")
+            return 0  # quotas are best effort; never block requests on the state store
+
+    def check_quota(self):
+        """Raises TenantRejected (429) when this period's token quota is used up."""
+        if self.token_quota and self.quota_used() >= self.token_quota:
+            self.stats["rejected_quota"] += 1
+            retry_after = max(1, int(self.quota_period - time.time() % self.quota_period))
+            raise TenantRejected(429, f"tenant {self.name} used its {self.token_quota} token quota", retry_after)
+
+    def record_usage(self, usage):
+        """Adds a finished request's token usage to the shared counters."""
+        state = get_shared_state()
+        try:
+            state.incr(f"tenant:{self.name}:requests")
+            for key in ("prompt_tokens", "completion_tokens", "total_tokens"):
+                if usage.get(key):
+                    state.incr(f"tenant:{self.name}:{key}", usage[key])
+            if self.token_quota and usage.get("total_tokens"):
+                state.incr(f"tenant:{self.name}:tokens:{self._window()}", usage["total_tokens"], ttl=self.quota_period)
+        except SharedStateError as e:
+            print(f"⚠️ Could not record usage for tenant {self.name}: {e}")
+
+    def usage(self):
+        """Shared usage counters plus this worker's queue state."""
+        counters = {}
+        try:
+            state = get_shared_state()
+            for key in ("requests", "prompt_tokens", "completion_tokens", "total_tokens"):
+                counters[key] = int(state.get(f"tenant:{self.name}:{key}") or 0)
+        except SharedStateError as e:
+            print(f"⚠️ Could not read usage for tenant {self.name}: {e}")
+        quota = None
+        if self.token_quota:
+            used = self.quota_used()
+            quota = {
+                "tokens": self.token_quota,
+                "used": used,
+                "remaining": max(0, self.token_quota - used),
+                "period_seconds": self.quota_period,
+                "resets_in_seconds": int(self.quota_period - time.time() % self.quota_period),
+            }
+        return {
+            "tenant": self.name,
+            "weight": self.weight,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            **counters,
+            "quota": quota,
+            **self.stats,
+        }
+
+
+class TenantRegistry:
+    def __init__(self, tenants, keys, anonymous=None):
+        self.tenants = {tenant.name: tenant for tenant in tenants}
+        self._keys = keys  # sha256(api key) -> tenant
+        self.anonymous = anonymous
+        self.total_weight = sum(tenant.weight for tenant in tenants) or 1.0
+
+    def resolve(self, headers):
+        """Tenant for a request's X-API-Key (or `Authorization: Bearer`) header."""
+        api_key = headers.get(API_KEY_HEADER.lower(), "")
+        if not api_key and headers.get("authorization", "").lower().startswith("bearer "):
+            api_key = headers["authorization"][7:].strip()
+        if api_key:
+            tenant = self._keys.get(_key_digest(api_key))
+            if tenant is None:
+                raise TenantRejected(401, "Invalid API key")
+            return tenant
+        if self.anonymous is None:
+            raise TenantRejected(401, f"Missing {API_KEY_HEADER} header")
+        return self.anonymous
+
+    def share(self, tenant):
+        """Fraction of the configured weight held by `tenant` (its fair share under contention)."""
+        return tenant.weight / self.total_weight
+
+    def stats(self):
+        return {name: tenant.usage() for name, tenant in self.tenants.items()}
+
+
+def load_tenants(config=None):
+    """Registry from DREAMFORGE_TENANTS, or one unlimited anonymous "default" tenant."""
+    config = os.getenv("DREAMFORGE_TENANTS") if config is None else config
+    if not config:
+        default = Tenant("default")
+        return TenantRegistry([default], {}, anonymous=default)
+
+    tenants, keys, anonymous = [], {}, None
+    for entry in json.loads(config):
+        tenant = Tenant(
+            entry["name"],
+            weight=float(entry.get("weight", 1.0)),
+            max_concurrency=int(entry["max_concurrency"]) if entry.get("max_concurrency") else None,
+            token_quota=int(entry["token_quota"]) if entry.get("token_quota") else None,
+            quota_period=int(entry.get("quota_period", DEFAULT_QUOTA_PERIOD)),
+        )
+        tenants.append(tenant)
+        api_key = entry.get("api_key") or os.getenv(entry.get("api_key_env", ""), "")
+        if api_key:
+            keys[_key_digest(api_key)] = tenant
+        if entry.get("anonymous"):
+            anonymous = tenant
+    return TenantRegistry(tenants, keys, anonymous)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_tenants():
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = load_tenants()
+        return _registry
+
+
+def tenant_stats():
+    """Per-tenant usage, quota and queue state, for admins on /api/metrics."""
+    return get_tenants().stats()
+
+
+def tenant_totals():
+    """Usage and queue state summed over all tenants, for everyone else on /api/metrics."""
+    totals = {"tenants": 0, "in_flight": 0, "waiting": 0, "requests": 0,
+              "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    for usage in tenant_stats().values():
+        totals["tenants"] += 1
+        for key in totals:
+            if key != "tenants":
+                totals[key] += usage.get(key, 0)
+    return totals
+
@@ -0,0 +1,119 @@
+import asyncio
+import os
+import time
+
+import llm
+from cassettes import active_cassette
+from prompts import PROMPTS
+from .profiling import to_thread
+from .routes import preload_memo
+
+# ✅ Startup warm-up: the instance reports ready (GET /ready) only once it is done
+WARMUP_ENABLED = os.getenv("DREAMFORGE_WARMUP", "1") != "0"
+# Longest warm-up may take before the instance reports ready anyway
+WARMUP_TIMEOUT = float(os.getenv("DREAMFORGE_WARMUP_TIMEOUT", "30"))
+# History entries (most repeated inputs) loaded into the stage memo
+WARMUP_PRELOAD = int(os.getenv("DREAMFORGE_WARMUP_PRELOAD", "20"))
+# One tiny completion through the best provider (0 = skip; costs a few tokens per start)
+WARMUP_COMPLETION = os.getenv("DREAMFORGE_WARMUP_COMPLETION", "1") != "0"
+
+WARMUP_PROMPT = "Reply with the single word OK."
+
+
+class WarmUp:
+    """
+    Runs the warm-up steps once and remembers how each went. Failed steps are
+    reported but do not keep the instance out of rotation: a cold instance is
+    still better than none.
+    """
+
+    def __init__(self):
+        self.ready = not WARMUP_ENABLED
+        self.started_at = None
+        self.seconds = None
+        self.steps = {}
+
+    async def _step(self, name, func, *args):
+        self.steps[name] = {"status": "running"}
+        started = time.perf_counter()
+        try:
+            detail = await to_thread(func, *args)
+            self.steps[name] = {"status": "skipped" if detail is None else "ok", "detail": detail}
+        except Exception as e:
+            self.steps[name] = {"status": "failed", "detail": f"{type(e).__name__}: {e}"}
+            print(f"⚠️ Warm-up step {name} failed: {e}")
+        self.steps[name]["seconds"] = round(time.perf_counter() - started, 3)
+
+    async def _run_steps(self):
+        await asyncio.gather(
+            self._step("providers", warm_providers),
+            self._step("prompts", load_prompts),
+            self._step("memo", preload_history),
+        )
+        # After the connections are open, so it measures the model rather than the handshake
+        await self._step("completion", warm_completion)
+
+    async def run(self):
+        if self.ready:
+            return
+        self.started_at = time.time()
+        started = time.perf_counter()
+        print("🔥 Warming up...")
+        try:
+            await asyncio.wait_for(self._run_steps(), timeout=WARMUP_TIMEOUT)
+        except asyncio.TimeoutError:
+            for step in self.steps.values():
+                if step["status"] == "running":
+                    step["status"] = "timed_out"
+            print(f"⚠️ Warm-up did not finish within {WARMUP_TIMEOUT:.0f}s")
+        self.seconds = round(time.perf_counter() - started, 3)
+        self.ready = True
+        print(f"✅ Warm-up done in {self.seconds}s")
+
+    def report(self):
+        return {"ready": self.ready, "enabled": WARMUP_ENABLED, "seconds": self.seconds, "steps": self.steps}
+
+
+# -------------------------------------------------------------------
+# ------------------------- STEPS -----------------------------------
+# -------------------------------------------------------------------
+
+def warm_providers():
+    """Opens a pooled connection (DNS, TCP, TLS) to every provider."""
+    pool = llm.get_provider_pool()
+    if pool is None:
+        return None  # cassette replay: no providers
+    for provider in pool.providers:
+        provider.warm()
+    return f"{len(pool.providers)} providers"
+
+
+def load_prompts():
+    """Renders every registered prompt template once."""
+    for template in PROMPTS.values():
+        template.render(**{field: "" for field in template.fields})
+    return f"{len(PROMPTS)} templates"
+
+
+def preload_history():
+    """Loads the stage outputs of the most repeated inputs from history into the memo."""
+    return f"{preload_memo(WARMUP_PRELOAD)} entries"
+
+
+def warm_completion():
+    """One tiny completion, so the first request does not pay for a cold model path."""
+    if not WARMUP_COMPLETION or active_cassette() is not None or llm.get_provider_pool() is None:
+        return None  # never record or replay the warm-up call in a cassette
+    with llm.usage_scope(isolated=True) as usage:
+        answer = llm.complete(WARMUP_PROMPT, temperature=0)
+    return f"{len(answer)} chars, {usage.get('total_tokens', 0)} tokens"
+
+
+_warmup = None
+
+
+def get_warmup():
+    global _warmup
+    if _warmup is None:
+        _warmup = WarmUp()
+    return _warmup
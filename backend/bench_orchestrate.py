@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+End-to-end latency benchmark for /api/orchestrate on recorded LLM answers.
+
+Every LLM call is replayed from a cassette (see orchestrator/agents/cassettes.py),
+so runs are deterministic, need no API key and cost nothing. --time-scale keeps
+the recorded chunk timings (1 = as recorded, 0 = instant, measures only our overhead).
+
+Run from the backend folder:
+    python bench_orchestrate.py --requests 40 --concurrency 4 --time-scale 1
+Record a fresh cassette with:  python test_api.py --cassette cassettes/test_api.jsonl --record
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+PAYLOAD = {"input_type": "voice", "input_data": "Create a simple calculator app", "framework": "react"}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+async def run(app, requests_total, concurrency):
+    import httpx
+
+    latencies = []
+    failures = 0
+    semaphore = asyncio.Semaphore(concurrency)
+    # Recompute every stage so each request really replays its LLM calls
+    payload = dict(PAYLOAD, refresh=["vision", "code", "evaluate"])
+
+    async with httpx.AsyncClient(app=app, base_url="http://bench", timeout=120) as client:
+        async def one():
+            nonlocal failures
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post("/api/orchestrate", json=payload)
+                if response.status_code == 200:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    failures += 1
+
+        await one()  # warm-up, not counted
+        latencies.clear()
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests_total)))
+        elapsed = time.perf_counter() - started
+    return latencies, failures, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay benchmark for /api/orchestrate")
+    parser.add_argument("--cassette", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "cassettes", "test_api.jsonl"))
+    parser.add_argument("--time-scale", type=float, default=1.0)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    # The cassette is picked up when the agents are imported, so configure it first
+    os.environ["DREAMFORGE_CASSETTE"] = os.path.abspath(args.cassette)
+    os.environ["DREAMFORGE_CASSETTE_MODE"] = "replay"
+    os.environ["DREAMFORGE_CASSETTE_TIME_SCALE"] = str(args.time_scale)
+    os.environ.setdefault("DREAMFORGE_DATA_DIR", tempfile.mkdtemp(prefix="dreamforge-bench-"))
+    os.environ.setdefault("DREAMFORGE_TRACING", "0")
+
+    from app.main import app
+
+    # The code agent writes generated_app*.py into the working directory; keep the tree clean
+    os.chdir(os.environ["DREAMFORGE_DATA_DIR"])
+
+    print(f"🚀 /api/orchestrate replay benchmark ({args.requests} requests, concurrency {args.concurrency}, "
+          f"time scale {args.time_scale})")
+    latencies, failures, elapsed = asyncio.run(run(app, args.requests, args.concurrency))
+    if not latencies:
+        print(f"❌ All {failures} requests failed")
+        return
+
+    print(f"{'p50':>10} {'p95':>10} {'max':>10} {'mean':>10} {'req/s':>8}")
+    print(f"{percentile(latencies, 0.5) * 1000:>8.1f}ms {percentile(latencies, 0.95) * 1000:>8.1f}ms "
+          f"{max(latencies) * 1000:>8.1f}ms {statistics.mean(latencies) * 1000:>8.1f}ms {len(latencies) / elapsed:>8.2f}")
+    if failures:
+        print(f"⚠️ {failures} requests failed")
+    else:
+        print("✅ All requests succeeded")
+
+
+if __name__ == "__main__":
+    main()
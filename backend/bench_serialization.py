@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: legacy vs. fast serialization of /api/orchestrate responses.
+
+legacy  stage models built with validation, wrapped in OrchestratorResponse,
+        then FastAPI's response_model validation + JSONResponse encoding
+fast    the internal path in app/routes.py: model_construct between hops and a
+        single pydantic-core encode via FastJSONResponse
+
+Run from the backend folder:  python bench_serialization.py
+No LLM calls or server needed.
+"""
+
+import asyncio
+import json
+import time
+import tracemalloc
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.models import (
+    CodeAgentResponse, EvaluatorAgentResponse, FrameworkVariant,
+    OrchestratorResponse, VisionAgentResponse
+)
+from app.serialization import FastJSONResponse
+
+SIZES_KB = (16, 256, 2048)
+FRAMEWORKS = ("react", "vue", "angular")
+ROUNDS = 50
+
+response_field = create_response_field(name="Response_orchestrate", type_=OrchestratorResponse)
+
+
+def make_code(size_kb):
+    line = "export function Component() { return <div className=\"mood\">😊 mood</div>; }\n"
+    return line * (size_kb * 1024 // len(line.encode("utf-8")) + 1)
+
+
+def legacy_body(code):
+    vision = VisionAgentResponse(layout="Mood tracker", components=["Header", "List"], data_elements=["mood"])
+    evaluation = EvaluatorAgentResponse(status="ok", issues=[], suggestions=["Add tests"], overall_feedback="Fine")
+    variants = [
+        FrameworkVariant(
+            framework=framework,
+            code_result=CodeAgentResponse(generated_code=code),
+            evaluation_result=evaluation,
+            generation_id=index,
+        )
+        for index, framework in enumerate(FRAMEWORKS)
+    ]
+    response = OrchestratorResponse(
+        vision_result=vision,
+        code_result=variants[0].code_result,
+        evaluation_result=evaluation,
+        variants=variants,
+    )
+    content = asyncio.run(serialize_response(field=response_field, response_content=response))
+    return JSONResponse(content).body
+
+
+def fast_body(code):
+    vision = VisionAgentResponse(layout="Mood tracker", components=["Header", "List"], data_elements=["mood"])
+    evaluation = EvaluatorAgentResponse(status="ok", issues=[], suggestions=["Add tests"], overall_feedback="Fine")
+    variants = [
+        FrameworkVariant.model_construct(
+            framework=framework,
+            code_result=CodeAgentResponse.model_construct(generated_code=code, success=True),
+            evaluation_result=evaluation,
+            generation_id=index,
+        )
+        for index, framework in enumerate(FRAMEWORKS)
+    ]
+    response = OrchestratorResponse.model_construct(
+        vision_result=vision,
+        code_result=variants[0].code_result,
+        evaluation_result=evaluation,
+        variants=variants,
+    )
+    return FastJSONResponse(response).body
+
+
+def measure(build, code):
+    """CPU ms per request and allocated bytes per request (peak, one request)."""
+    build(code)  # warm up caches and lazy imports
+
+    started = time.process_time()
+    for _ in range(ROUNDS):
+        build(code)
+    cpu_ms = (time.process_time() - started) * 1000 / ROUNDS
+
+    tracemalloc.start()
+    build(code)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return cpu_ms, peak
+
+
+def main():
+    print("🚀 Serialization microbenchmark (3 framework variants per response)")
+    print(f"{'code':>8} {'path':>7} {'cpu ms/req':>11} {'peak alloc':>12} {'≈ code copies':>14}")
+
+    for size_kb in SIZES_KB:
+        code = make_code(size_kb)
+        payload = len(code.encode("utf-8")) * len(FRAMEWORKS)
+        assert json.loads(legacy_body(code)) == json.loads(fast_body(code)), "both paths must produce the same JSON"
+
+        results = {}
+        for name, build in (("legacy", legacy_body), ("fast", fast_body)):
+            cpu_ms, peak = measure(build, code)
+            results[name] = cpu_ms
+            print(f"{size_kb:>6}KB {name:>7} {cpu_ms:>11.2f} {peak / 1024:>10.0f}KB {peak / payload:>14.1f}")
+        print(f"✅ {size_kb}KB: fast path is {results['legacy'] / results['fast']:.1f}x cheaper in CPU\n")
+
+
+if __name__ == "__main__":
+    main()
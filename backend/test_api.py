@@ -2,12 +2,24 @@
 """
 Simple API test script for DreamForge AI Backend
 Run this to test your API endpoints
+
+    python test_api.py                                        # against a server on :8000
+    python test_api.py --cassette cassettes/test_api.jsonl    # own server, recorded LLM answers
+    python test_api.py --cassette cassettes/test_api.jsonl --record   # re-record (needs a provider)
 """
 
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
 import requests
 import json
 
 BASE_URL = "http://localhost:8000"
+CASSETTE_PORT = 8765
 
 def test_health_check():
     """Test the health check endpoint"""
@@ -22,6 +34,23 @@ def test_health_check():
     except Exception as e:
         print(f"❌ Health check failed: {e}")
 
+def test_readiness():
+    """Test the readiness probe (503 until startup warm-up is done)"""
+    print("\n🔍 Testing readiness probe...")
+    try:
+        deadline = time.time() + 60
+        response = requests.get(f"{BASE_URL}/ready")
+        while response.status_code == 503 and time.time() < deadline:
+            time.sleep(0.5)
+            response = requests.get(f"{BASE_URL}/ready")
+        if response.status_code == 200 and response.json().get("ready"):
+            print("✅ Readiness probe passed!")
+            print(f"Warm-up: {json.dumps(response.json().get('steps'))}")
+        else:
+            print(f"❌ Readiness probe failed with status {response.status_code}")
+    except Exception as e:
+        print(f"❌ Readiness probe failed: {e}")
+
 def test_vision_agent():
     """Test the Vision Agent endpoint"""
     print("\n🔍 Testing Vision Agent...")
@@ -111,6 +140,26 @@ def test_full_orchestration():
     except Exception as e:
         print(f"❌ Full Orchestration test failed: {e}")
 
+def test_generation_history():
+    """Test the generation history endpoints"""
+    print("\n🔍 Testing Generation History...")
+    try:
+        response = requests.get(f"{BASE_URL}/api/generations", params={"limit": 5})
+        if response.status_code == 200:
+            page = response.json()
+            print("✅ Generation listing passed!")
+            print(f"Items: {len(page.get('items', []))}, next cursor: {page.get('next_cursor')}")
+            if page.get("items"):
+                latest = page["items"][0]
+                detail = requests.get(f"{BASE_URL}/api/generations/{latest['id']}")
+                same_inputs = requests.get(f"{BASE_URL}/api/generations/by-hash/{latest['input_hash']}")
+                print(f"Lookup by id: {detail.status_code}, by input hash: {same_inputs.status_code}")
+        else:
+            print(f"❌ Generation history failed with status {response.status_code}")
+            print(f"Error: {response.text}")
+    except Exception as e:
+        print(f"❌ Generation history test failed: {e}")
+
 def test_api_docs():
     """Test API documentation"""
     print("\n🔍 Testing API Documentation...")
@@ -124,26 +173,81 @@ def test_api_docs():
     except Exception as e:
         print(f"❌ API docs test failed: {e}")
 
+def start_cassette_server(cassette, record=False, time_scale=0.0):
+    """Starts uvicorn with LLM calls recorded to / replayed from `cassette`; returns the process."""
+    env = dict(
+        os.environ,
+        DREAMFORGE_CASSETTE=os.path.abspath(cassette),
+        DREAMFORGE_CASSETTE_MODE="record" if record else "replay",
+        DREAMFORGE_CASSETTE_TIME_SCALE=str(time_scale),
+        # Fresh history so no stage is skipped as already generated
+        DREAMFORGE_DATA_DIR=tempfile.mkdtemp(prefix="dreamforge-test-"),
+    )
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(CASSETTE_PORT)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+    )
+    for _ in range(100):
+        try:
+            requests.get(f"http://127.0.0.1:{CASSETTE_PORT}/", timeout=1)
+            return process
+        except requests.ConnectionError:
+            if process.poll() is not None:
+                raise RuntimeError("❌ Test server exited during startup")
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("❌ Test server did not start")
+
 def main():
+    global BASE_URL
+
+    parser = argparse.ArgumentParser(description="DreamForge AI API tests")
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--cassette", help="start a local server that replays LLM calls from this cassette")
+    parser.add_argument("--record", action="store_true", help="record the cassette instead (real provider calls)")
+    parser.add_argument("--time-scale", type=float, default=0.0, help="replay speed: 0 = instant, 1 = as recorded")
+    args = parser.parse_args()
+
+    server = None
+    BASE_URL = args.base_url
+    if args.cassette:
+        if args.record and os.path.exists(args.cassette):
+            os.remove(args.cassette)
+        server = start_cassette_server(args.cassette, record=args.record, time_scale=args.time_scale)
+        BASE_URL = f"http://127.0.0.1:{CASSETTE_PORT}"
+
+    try:
+        run_tests()
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+def run_tests():
     print("🚀 DreamForge AI Backend API Tests")
     print("=" * 50)
     
     # Run all tests
     test_health_check()
+    test_readiness()
     test_vision_agent()
     test_code_agent()
     test_evaluator_agent()
     test_full_orchestration()
+    test_generation_history()
     test_api_docs()
     
     print("\n" + "=" * 50)
     print("🎉 API testing completed!")
     print(f"\n📋 Available endpoints:")
     print(f"• Health Check: {BASE_URL}/")
+    print(f"• Readiness: {BASE_URL}/ready")
     print(f"• Vision Agent: {BASE_URL}/api/vision")
     print(f"• Code Agent: {BASE_URL}/api/code")
     print(f"• Evaluator Agent: {BASE_URL}/api/evaluate")
     print(f"• Full Orchestration: {BASE_URL}/api/orchestrate")
+    print(f"• Generation History: {BASE_URL}/api/generations")
     print(f"• API Documentation: {BASE_URL}/docs")
 
 if __name__ == "__main__":
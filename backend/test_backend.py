@@ -25,10 +25,10 @@ def test_imports():
         return False
     
     try:
-        from groq import Groq
-        print("✅ Groq imported successfully")
+        import httpx
+        print("✅ httpx imported successfully")
     except ImportError as e:
-        print(f"❌ Groq import failed: {e}")
+        print(f"❌ httpx import failed: {e}")
         return False
     
     try:
@@ -114,22 +114,145 @@ def test_app_structure():
     
     return True
 
-def test_groq_client():
-    """Test Groq client initialization"""
-    print("\n🔍 Testing Groq client...")
+def test_provider_pool():
+    """Test LLM provider pool initialization"""
+    print("\n🔍 Testing LLM providers...")
     
     try:
-        from groq import Groq
+        from agents.providers import Provider, ProviderPool
         
-        # Try to create client with dummy key
-        test_key = "test_key"
-        client = Groq(api_key=test_key)
-        print("✅ Groq client created successfully")
+        # Try to create a pool with a dummy key
+        pool = ProviderPool([Provider("groq", "https://api.groq.com/openai/v1", api_key="test_key")])
+        print(f"✅ Provider pool created successfully: {[p.name for p in pool.ranked()]}")
+        pool.close()
         return True
     except Exception as e:
-        print(f"❌ Groq client creation failed: {e}")
+        print(f"❌ Provider pool creation failed: {e}")
         return False
 
+def test_cassette_replay():
+    """Test agent calls against the recorded LLM answers (no network needed)"""
+    print("\n🔍 Testing cassette replay...")
+    
+    cassette = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cassettes', 'test_api.jsonl')
+    try:
+        from agents.cassettes import use_cassette
+        from agents.vision_agent import process_input
+        
+        with use_cassette(cassette, mode="replay"):
+            layout = process_input("voice", "Create a simple todo list app with add, edit, and delete functionality")
+        if "fallback" in layout["layout"]:
+            print("❌ Cassette replay missed the recorded Vision call")
+            return False
+        print(f"✅ Cassette replay works: {str(layout)[:80]}")
+        return True
+    except Exception as e:
+        print(f"❌ Cassette replay failed: {e}")
+        return False
+
+def test_code_files_round_trip():
+    """Test that splitting generated code into files and joining it back is byte-exact"""
+    print("\n🔍 Testing multi-file round trip...")
+    
+    samples = [
+        "print('no headers')\n",
+        "intro text\n**app.py**\nprint(1)\n**App.jsx**\nexport default App;\n",
+        "**`app.py`**\nprint(1)\n",  # backticked header
+        "**app.py**  \t\nprint(1)\n",  # trailing spaces after the header
+        "**app.py**\nprint(1)\n**app.py**\nprint(2)\n",  # duplicate filename
+        "**app.py**\nprint(1)\n**styles.css**",  # header on the last line, no newline
+        "**app.py**\n**empty.py**\n\n**other.py**\nx = 1",
+    ]
+    try:
+        from agents.code_diff import apply_diff, diff_code
+        from agents.code_files import join_files, split_files
+        
+        for code in samples:
+            if join_files(split_files(code)) != code:
+                print(f"❌ split/join changed {code!r}")
+                return False
+        for old in samples:
+            for new in samples:
+                if apply_diff(old, diff_code(old, new)) != new:
+                    print(f"❌ apply_diff({old!r}) did not rebuild {new!r}")
+                    return False
+        print(f"✅ Round trip is byte-exact for {len(samples)} samples")
+        return True
+    except Exception as e:
+        print(f"❌ Round trip test failed: {e}")
+        return False
+
+def test_headerless_local_checks():
+    """Test that the local checks don't flag valid headerless CSS or JS"""
+    print("\n🔍 Testing local checks on headerless output...")
+    
+    samples = [
+        "body { color: #fff; }\n#app {\n  margin: 0;\n}\n",  # CSS ids and colours
+        "const re = /[(]/;\nconst label = `total: ${items.map(i => i.price).join(\", \")}`;\n",  # JS regex and template
+        "import React from 'react';\n// it's fine\nexport default () => <p>Don't panic</p>;\n",
+    ]
+    try:
+        from agents.code_checks import local_problems
+        
+        for code in samples:
+            problems = local_problems(code)
+            if problems:
+                print(f"❌ Headerless {code!r} flagged: {problems}")
+                return False
+        if not local_problems("**app.py**\nprint(1\n"):
+            print("❌ Broken app.py was not flagged")
+            return False
+        print(f"✅ {len(samples)} headerless samples passed the local checks")
+        return True
+    except Exception as e:
+        print(f"❌ Local checks test failed: {e}")
+        return False
+
+def test_fenced_fail_review_triggers_repair():
+    """Test that a "fail" review wrapped in a ``` fence still triggers the Repair Agent"""
+    print("\n🔍 Testing repair after a fenced review...")
+    
+    import json
+    import tempfile
+    os.environ.setdefault("DREAMFORGE_DATA_DIR", tempfile.mkdtemp(prefix="dreamforge-test-"))
+    os.environ["DREAMFORGE_WARMUP"] = "0"
+    workdir = os.getcwd()
+    try:
+        from fastapi.testclient import TestClient
+        from app.main import app
+        import code_agent, evaluator_agent, repair_agent, vision_agent
+        
+        reviews = [
+            '```json\n{"status": "fail", "issues": ["app.py: prints the wrong greeting"]}\n```',
+            '{"status": "ok", "issues": [], "overall_feedback": "Fixed."}',
+        ]
+        vision_agent.complete = lambda prompt, **kwargs: json.dumps(
+            {"layout": "greeting page", "components": ["header"], "data_elements": ["greeting"]}
+        )
+        code_agent.complete = lambda prompt, **kwargs: "**app.py**\nprint('helo')\n"
+        evaluator_agent.complete = lambda prompt, **kwargs: reviews.pop(0)
+        repair_agent.complete = lambda prompt, **kwargs: (
+            "FILE: app.py\n<<<<<<< SEARCH\nprint('helo')\n=======\nprint('hello')\n>>>>>>> REPLACE\n"
+        )
+        os.chdir(tempfile.mkdtemp(prefix="dreamforge-test-"))  # the Code Agent writes generated_app.py here
+        response = TestClient(app).post("/api/orchestrate", json={
+            "input_data": "fenced review repair test", "max_repairs": 1, "speculative": False,
+        })
+        result = response.json()
+        if response.status_code != 200 or not result.get("repair"):
+            print(f"❌ The fenced fail review did not trigger a repair: {response.status_code} {str(result)[:200]}")
+            return False
+        if "print('hello')" not in result["code_result"]["generated_code"] or result["evaluation_result"]["status"] != "ok":
+            print(f"❌ Repair did not produce the fixed code: {str(result)[:200]}")
+            return False
+        print(f"✅ Fenced fail review repaired ({result['repair']['stop_reason']})")
+        return True
+    except Exception as e:
+        print(f"❌ Fenced review repair test failed: {e}")
+        return False
+    finally:
+        os.chdir(workdir)
+
 def main():
     print("🚀 DreamForge AI Backend Diagnostic Test")
     print("=" * 50)
@@ -149,9 +272,29 @@ def main():
         print("\n❌ Orchestrator agents test failed")
         return
     
-    # Test Groq client
-    if not test_groq_client():
-        print("\n❌ Groq client test failed")
+    # Test LLM providers
+    if not test_provider_pool():
+        print("\n❌ LLM provider test failed")
+        return
+    
+    # Test recorded LLM answers
+    if not test_cassette_replay():
+        print("\n❌ Cassette replay test failed")
+        return
+    
+    # Test multi-file split/join and diffs
+    if not test_code_files_round_trip():
+        print("\n❌ Multi-file round trip test failed")
+        return
+    
+    # Test the local checks on headerless CSS and JS
+    if not test_headerless_local_checks():
+        print("\n❌ Local checks test failed")
+        return
+    
+    # Test that a fenced "fail" review is repaired
+    if not test_fenced_fail_review_triggers_repair():
+        print("\n❌ Fenced review repair test failed")
         return
     
     print("\n🎉 All tests passed! Backend should work correctly.")
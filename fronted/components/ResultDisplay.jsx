@@ -75,6 +75,7 @@ export default function ResultDisplay({ agentId, result }) {
         <span className={`px-3 py-1 rounded-full text-sm font-medium ${
           result.status === 'ok' ? 'bg-green-500/20 text-green-300' :
           result.status === 'warning' ? 'bg-yellow-500/20 text-yellow-300' :
+          result.status === 'reviewing' ? 'bg-gray-500/20 text-gray-300 animate-pulse' :
           'bg-red-500/20 text-red-300'
         }`}>
           {result.status.toUpperCase()}
@@ -1,9 +1,16 @@
-import { useState } from 'react';
+import { useEffect, useRef, useState } from 'react';
 import Head from 'next/head';
 import AgentCard from '../components/AgentCard';
 import ResultDisplay from '../components/ResultDisplay';
 import LoadingSpinner from '../components/LoadingSpinner';
 
+// One WebSocket session drives every orchestration run (progress, cancel, re-run)
+const SESSION_URL = 'ws://localhost:8000/api/ws/orchestrate';
+const STAGE_RESULT_KEYS = { vision: 'vision', code: 'code', evaluate: 'evaluator' };
+// A dropped session is reopened (after 1 s, 2 s, 3 s) while a run is in flight
+const MAX_RECONNECTS = 3;
+const RECONNECT_DELAY_MS = 1000;
+
 export default function Home() {
   const [activeAgent, setActiveAgent] = useState(null);
   const [inputData, setInputData] = useState('');
@@ -11,6 +18,118 @@ export default function Home() {
   const [results, setResults] = useState({});
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState('');
+  const [stageStatus, setStageStatus] = useState({});
+  const [liveOutput, setLiveOutput] = useState('');
+  const socketRef = useRef(null);
+  const pendingCommandRef = useRef(null);  // command whose run has not reported done/cancelled/error yet
+  const lastRunRef = useRef(null);  // inputs a fresh session needs before it can re-run a stage
+  const reconnectsRef = useRef(0);
+
+  useEffect(() => () => {
+    pendingCommandRef.current = null;  // leaving the page is not a dropped connection
+    if (socketRef.current) {
+      socketRef.current.close();
+    }
+  }, []);
+
+  const finishRun = () => {
+    pendingCommandRef.current = null;
+    reconnectsRef.current = 0;
+    setLiveOutput('');
+    setLoading(false);
+    setActiveAgent(null);
+  };
+
+  const handleSessionMessage = (message) => {
+    reconnectsRef.current = 0;
+    switch (message.type) {
+      case 'stage':
+        setStageStatus(prev => ({ ...prev, [message.stage]: message.status }));
+        if (message.status === 'started') {
+          setLiveOutput('');
+        }
+        if (message.result) {
+          setResults(prev => ({ ...prev, [STAGE_RESULT_KEYS[message.stage]]: message.result }));
+        }
+        break;
+      case 'delta':
+        setLiveOutput(prev => prev + message.text);
+        break;
+      case 'done':
+      case 'cancelled':
+      case 'error':
+        if (message.type === 'error') {
+          setError(`Failed to orchestrate: ${message.message}`);
+        }
+        finishRun();
+        break;
+      default:
+        break;
+    }
+  };
+
+  const getSession = () => new Promise((resolve, reject) => {
+    const existing = socketRef.current;
+    if (existing && existing.readyState === WebSocket.OPEN) {
+      resolve(existing);
+      return;
+    }
+    const socket = new WebSocket(SESSION_URL);
+    socket.onopen = () => resolve(socket);
+    socket.onerror = () => reject(new Error('Could not connect to the orchestration session'));
+    socket.onmessage = (event) => handleSessionMessage(JSON.parse(event.data));
+    socket.onclose = () => {
+      if (socketRef.current === socket) {
+        socketRef.current = null;
+      }
+      // The server cancels a session's run when its socket drops; start it again on a new one
+      if (pendingCommandRef.current) {
+        reconnect();
+      }
+    };
+    socketRef.current = socket;
+  });
+
+  const reconnect = () => {
+    if (reconnectsRef.current >= MAX_RECONNECTS) {
+      setError('Failed to orchestrate: could not reach the orchestration session');
+      finishRun();
+      return;
+    }
+    reconnectsRef.current += 1;
+    setLiveOutput('');
+    setTimeout(async () => {
+      const command = pendingCommandRef.current;
+      if (!command) {
+        return;  // cancelled while waiting
+      }
+      try {
+        const socket = await getSession();
+        // A new session has no inputs to re-run a stage on, so it gets the last run again
+        // (stages that already finished come back from the server's memo)
+        socket.send(JSON.stringify(command.type === 'rerun' && lastRunRef.current ? lastRunRef.current : command));
+      } catch (err) {
+        // The failed socket's onclose schedules the next attempt
+      }
+    }, RECONNECT_DELAY_MS * reconnectsRef.current);
+  };
+
+  const sendSessionCommand = async (command) => {
+    setLoading(true);
+    setError('');
+    setActiveAgent('orchestrator');
+    pendingCommandRef.current = command;
+    reconnectsRef.current = 0;
+    if (command.type === 'run') {
+      lastRunRef.current = command;
+    }
+    try {
+      const socket = await getSession();
+      socket.send(JSON.stringify(command));
+    } catch (err) {
+      // Could not connect: onclose retries, and reports the error once the attempts run out
+    }
+  };
 
   const agents = [
     {
@@ -47,6 +166,11 @@ export default function Home() {
     setActiveAgent(agentId);
 
     try {
+      if (agentId === 'evaluator') {
+        await streamEvaluation();
+        return;
+      }
+
       const response = await fetch(`http://localhost:8000/api/${agentId}`, {
         method: 'POST',
         headers: {
@@ -75,44 +199,71 @@ export default function Home() {
     }
   };
 
+  // Evaluator findings arrive as NDJSON records, each shown as soon as the LLM has written it
+  const streamEvaluation = async () => {
+    const response = await fetch('http://localhost:8000/api/evaluate-stream', {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({ generated_code: inputData }),
+    });
+
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    let review = { status: 'reviewing', overall_feedback: 'Reviewing…', issues: [], suggestions: [] };
+    setResults(prev => ({ ...prev, evaluator: review }));
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = '';
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffered += decoder.decode(value, { stream: true });
+      const lines = buffered.split('\n');
+      buffered = lines.pop();
+      for (const line of lines) {
+        if (!line.trim()) continue;
+        const record = JSON.parse(line);
+        if (record.type === 'issue') {
+          review = { ...review, issues: [...review.issues, record.value] };
+        } else if (record.type === 'suggestion') {
+          review = { ...review, suggestions: [...review.suggestions, record.value] };
+        } else if (record.type === 'status') {
+          review = record;
+        } else if (record.type === 'error') {
+          throw new Error(record.message);
+        }
+        setResults(prev => ({ ...prev, evaluator: review }));
+      }
+    }
+  };
+
   const handleOrchestrate = async () => {
     if (!inputData.trim()) {
       setError('Please enter some input data');
       return;
     }
 
-    setLoading(true);
-    setError('');
-    setActiveAgent('orchestrator');
-
-    try {
-      const response = await fetch('http://localhost:8000/api/orchestrate', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          input_type: inputType,
-          input_data: inputData,
-          framework: 'react'
-        }),
-      });
+    setStageStatus({});
+    await sendSessionCommand({
+      type: 'run',
+      input_type: inputType,
+      input_data: inputData,
+      framework: 'react'
+    });
+  };
 
-      if (!response.ok) {
-        throw new Error(`HTTP error! status: ${response.status}`);
-      }
+  const handleRerun = (stage) => sendSessionCommand({ type: 'rerun', stage });
 
-      const result = await response.json();
-      setResults({
-        vision: result.vision_result,
-        code: result.code_result,
-        evaluator: result.evaluation_result
-      });
-    } catch (err) {
-      setError(`Failed to orchestrate: ${err.message}`);
-    } finally {
-      setLoading(false);
-      setActiveAgent(null);
+  const handleCancel = () => {
+    if (socketRef.current && socketRef.current.readyState === WebSocket.OPEN) {
+      socketRef.current.send(JSON.stringify({ type: 'cancel' }));
+    } else {
+      finishRun();  // between reconnect attempts: just stop retrying
     }
   };
 
@@ -188,7 +339,39 @@ export default function Home() {
                 '🎯 Run Full Orchestration'
               )}
             </button>
+            {loading && activeAgent === 'orchestrator' && (
+              <button
+                onClick={handleCancel}
+                className="ml-4 bg-red-600/80 hover:bg-red-700 text-white font-bold py-3 px-6 rounded-full transition-all duration-200"
+              >
+                ⏹ Cancel
+              </button>
+            )}
+            {!loading && results.vision && stageStatus.vision && (
+              <button
+                onClick={() => handleRerun('code')}
+                className="ml-4 bg-green-600/80 hover:bg-green-700 text-white font-bold py-3 px-6 rounded-full transition-all duration-200"
+              >
+                ♻️ Re-run Code
+              </button>
+            )}
           </div>
+
+          {/* Live session progress */}
+          {Object.keys(stageStatus).length > 0 && (
+            <div className="flex justify-center gap-3 mb-4">
+              {Object.entries(stageStatus).map(([stage, status]) => (
+                <span key={stage} className="bg-gray-800/60 text-gray-200 px-3 py-1 rounded-full text-sm">
+                  {stage}: {status}
+                </span>
+              ))}
+            </div>
+          )}
+          {liveOutput && (
+            <pre className="bg-gray-900 text-green-400 text-sm rounded-lg p-4 max-h-64 overflow-y-auto whitespace-pre-wrap">
+              {liveOutput}
+            </pre>
+          )}
         </div>
 
         {/* Agent Cards */}
@@ -0,0 +1,152 @@
+"""
+Record/replay of LLM calls at the agent-call boundary (llm.stream_complete).
+
+A cassette is a JSONL file with one line per recorded call:
+
+    {"key": "<sha256>", "prompt": "code@2:6e16…", "preview": "Generate full…",
+     "chunks": [[38, "imp"], [12, "ort "], ...], "usage": {...}}
+
+`key` hashes the model, temperature and prompt text; each chunk is the delay in
+milliseconds since the previous one plus its text. Replay yields the same chunks
+in the same order and never touches the network; `time_scale` stretches the
+recorded delays (0 = instant, 1 = as recorded). When one prompt was recorded
+several times, successive replays walk through the recordings in order.
+
+Activate with DREAMFORGE_CASSETTE=<path> and DREAMFORGE_CASSETTE_MODE=record|replay
+(plus DREAMFORGE_CASSETTE_TIME_SCALE), or with `use_cassette(...)` in scripts.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+try:
+    from .providers import chunk_delta, chunk_usage
+except ImportError:
+    from providers import chunk_delta, chunk_usage
+
+PREVIEW_CHARS = 80
+
+
+class CassetteMiss(Exception):
+    """Replay found no recording for a prompt; re-record the cassette."""
+
+
+def call_key(model, temperature, prompt):
+    payload = json.dumps([model, temperature, str(prompt)], separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    def __init__(self, path, mode="replay", time_scale=0.0):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.time_scale = time_scale
+        self._lock = threading.Lock()
+        self._entries = defaultdict(list)
+        self._played = defaultdict(int)
+
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry["key"]].append(entry)
+        elif mode == "replay":
+            raise FileNotFoundError(f"Cassette not found: {path}")
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._entries.values())
+
+    # ------------------------------------------------------------------
+    # Replay
+    # ------------------------------------------------------------------
+
+    def replay(self, key, prompt):
+        """OpenAI-style chunk dicts for the next recording of `key`."""
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                raise CassetteMiss(f"No recording in {self.path} for prompt: {str(prompt)[:PREVIEW_CHARS]!r}")
+            entry = entries[self._played[key] % len(entries)]
+            self._played[key] += 1
+
+        chunks = entry["chunks"]
+        for index, (delay_ms, text) in enumerate(chunks):
+            if self.time_scale > 0 and delay_ms:
+                time.sleep(delay_ms / 1000 * self.time_scale)
+            chunk = {"choices": [{"index": 0, "delta": {"content": text}}]}
+            if index == len(chunks) - 1 and entry.get("usage"):
+                chunk["usage"] = entry["usage"]
+            yield chunk
+        if not chunks and entry.get("usage"):
+            yield {"choices": [], "usage": entry["usage"]}
+
+    # ------------------------------------------------------------------
+    # Record
+    # ------------------------------------------------------------------
+
+    def record(self, key, prompt, source):
+        """Passes `source` chunks through and appends the call to the cassette once it completes."""
+        template = getattr(prompt, "template", None)
+        chunks = []
+        usage = None
+        last = time.perf_counter()
+        try:
+            for chunk in source:
+                now = time.perf_counter()
+                usage = chunk_usage(chunk) or usage
+                text = chunk_delta(chunk)
+                if text:
+                    chunks.append([round((now - last) * 1000), text])
+                    last = now
+                yield chunk
+        finally:
+            # An aborted call is not recorded; closing the source drops its connection
+            source.close()
+
+        entry = {
+            "key": key,
+            "prompt": f"{template.name}@{template.version}:{template.fingerprint}" if template else None,
+            "preview": str(prompt)[:PREVIEW_CHARS],
+            "chunks": chunks,
+            "usage": usage,
+        }
+        with self._lock:
+            self._entries[key].append(entry)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+
+_active = None
+
+
+def active_cassette():
+    return _active
+
+
+@contextmanager
+def use_cassette(path, mode="replay", time_scale=0.0):
+    """Routes every LLM call in this process through a cassette inside the block."""
+    global _active
+    previous, _active = _active, Cassette(path, mode=mode, time_scale=time_scale)
+    try:
+        yield _active
+    finally:
+        _active = previous
+
+
+if os.getenv("DREAMFORGE_CASSETTE"):
+    _active = Cassette(
+        os.getenv("DREAMFORGE_CASSETTE"),
+        mode=os.getenv("DREAMFORGE_CASSETTE_MODE", "replay"),
+        time_scale=float(os.getenv("DREAMFORGE_CASSETTE_TIME_SCALE", "0")),
+    )
+    print(f"📼 LLM cassette {_active.mode}: {_active.path} ({len(_active)} recordings)")
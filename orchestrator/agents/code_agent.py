@@ -1,60 +1,69 @@
 import os
-from dotenv import load_dotenv
+import re
 
-# ✅ Import Groq with fallback for all versions
-from groq import Groq
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+# ✅ Shared LLM client (works as `agents.llm` or top-level `llm`)
+try:
+    from .llm import complete
+    from .prompts import render_prompt
+except ImportError:
+    from llm import complete
+    from prompts import render_prompt
 
+# Frontend frameworks the Code Agent knows how to target
+FRAMEWORK_LABELS = {
+    "react": "React",
+    "vue": "Vue.js",
+    "angular": "Angular",
+}
+DEFAULT_FRAMEWORK = "react"
 
 
-# ✅ Load API key from .env
-load_dotenv()
-api_key = os.getenv("GROQ_API_KEY")
+def framework_label(framework):
+    """Human-readable framework name for prompts (unknown names pass through)."""
+    framework = (framework or DEFAULT_FRAMEWORK).strip()
+    return FRAMEWORK_LABELS.get(framework.lower(), framework)
 
-if not api_key:
-    raise ValueError("❌ GROQ_API_KEY is missing! Add it to your .env file in project root.")
 
-# ✅ Initialize Groq client
-client = Groq(api_key=api_key)
-
-def generate_code(layout):
+def save_code(code, framework=DEFAULT_FRAMEWORK):
     """
-    Code Agent: Generates frontend + backend runnable code using Groq LLM.
-    Cleans extra text and saves the code to a file.
+    Writes generated code to generated_app.py (generated_app_<framework>.py for
+    other frameworks), atomically so concurrent generations never leave a
+    half-written file behind. Returns the file path.
     """
-    print("⚙️ Code Agent: Generating code with Groq...")
+    key = re.sub(r"[^a-z0-9]+", "_", (framework or DEFAULT_FRAMEWORK).strip().lower())
+    filename = "generated_app.py" if key == DEFAULT_FRAMEWORK else f"generated_app_{key}.py"
+    output_file = os.path.join(os.getcwd(), filename)
+    tmp_file = f"{output_file}.{os.getpid()}.{id(code)}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        f.write(code)
+    os.replace(tmp_file, output_file)
+    print(f"💾 Code saved to: {output_file}")
+    return output_file
 
-    prompt = f"""
-    Generate full frontend + backend code for this layout:
-    {layout}
 
-    ⚠️ Important:
-    - Respond ONLY with clean runnable code (no explanations, no markdown, no comments).
-    - Prefer Python (Streamlit or Flask) or MERN stack if suitable.
-    - Do not include ``` in the response.
+def generate_code(layout, framework=DEFAULT_FRAMEWORK, save=True):
+    """
+    Code Agent: Generates frontend + backend runnable code using Groq LLM.
+    Cleans extra text and saves the code to a file (unless `save` is False,
+    e.g. for best-of-N candidates that may not be selected).
     """
+    label = framework_label(framework)
+    print(f"⚙️ Code Agent: Generating {label} code with Groq...")
 
-    try:
-        completion = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7,
-        )
+    prompt = render_prompt("code", framework=label, layout=layout)
 
-        code_output = completion.choices[0].message.content
+    try:
+        code_output = complete(prompt)
 
         # 🧹 Clean response: remove triple backticks if any
         final_code = "\n".join(
             [line for line in code_output.splitlines() if not line.strip().startswith("```")]
         ).strip()
 
-        # 💾 Optionally, save the generated code
-        output_file = os.path.join(os.getcwd(), "generated_app.py")
-        with open(output_file, "w", encoding="utf-8") as f:
-            f.write(final_code)
-
         print("✅ Code Agent completed successfully!")
-        print(f"💾 Code saved to: {output_file}")
+        # 💾 Optionally, save the generated code (one file per framework)
+        if save:
+            save_code(final_code, framework)
         return final_code
 
     except Exception as e:
@@ -0,0 +1,108 @@
+"""
+Cheap local checks for generated code, run before paying for an LLM review.
+
+`local_problems(code)` splits the output into files and returns a list of
+problems: Python files must compile, JSON files must parse and script or
+markup files must have balanced brackets. Output without file headers has no
+known language (the Code prompt does not ask for headers), so it is left to
+the LLM review. An empty list means the code is worth reviewing; it does not
+mean the code is correct.
+"""
+import json
+import os
+
+# ✅ Shared helpers (works as `agents.code_files` or top-level `code_files`)
+try:
+    from .code_files import DEFAULT_FILENAME, split_files
+except ImportError:
+    from code_files import DEFAULT_FILENAME, split_files
+
+SCRIPT_EXTENSIONS = {".js", ".jsx", ".ts", ".tsx", ".vue", ".css", ".scss"}
+# Only these get `//` line comments and template strings; stylesheets and .vue get
+# /* */ comments
+JS_EXTENSIONS = {".js", ".jsx", ".ts", ".tsx"}
+BRACKETS = {")": "(", "]": "[", "}": "{"}
+
+
+def _python_problem(name, content):
+    try:
+        compile(content, name, "exec")
+    except (SyntaxError, ValueError) as e:
+        return f"{name}: syntax error on line {getattr(e, 'lineno', '?')}: {getattr(e, 'msg', e)}"
+    return None
+
+
+def _json_problem(name, content):
+    try:
+        json.loads(content)
+    except ValueError as e:
+        return f"{name}: invalid JSON: {e}"
+    return None
+
+
+def _bracket_problem(name, content):
+    """Unbalanced (), [] or {} outside strings and comments (rough lexing, good enough for a sanity check)."""
+    extension = os.path.splitext(name)[1].lower()
+    javascript = extension in JS_EXTENSIONS
+    line_comment = "//" if javascript else None
+    block_comments = extension in SCRIPT_EXTENSIONS
+    quotes = "'\"`" if javascript else "'\""
+    stack = []
+    index, length = 0, len(content)
+    while index < length:
+        char = content[index]
+        pair = content[index:index + 2]
+        if line_comment and content.startswith(line_comment, index):
+            index = content.find("\n", index)
+            index = length if index < 0 else index
+            continue
+        if block_comments and pair == "/*":
+            end = content.find("*/", index + 2)
+            index = length if end < 0 else end + 2
+            continue
+        if not javascript and content.startswith(char * 3, index) and char in quotes:
+            # Python triple-quoted string
+            end = content.find(char * 3, index + 3)
+            index = length if end < 0 else end + 3
+            continue
+        if char in quotes:
+            index += 1
+            while index < length and content[index] != char:
+                if content[index] == "\n" and char != "`":
+                    break  # unterminated quote (e.g. an apostrophe in JSX text): stop at the line end
+                index += 2 if content[index] == "\\" else 1
+            index += 1
+            continue
+        if char in "([{":
+            stack.append(char)
+        elif char in BRACKETS:
+            if not stack or stack.pop() != BRACKETS[char]:
+                line = content.count("\n", 0, index) + 1
+                return f"{name}: unexpected '{char}' on line {line}"
+        index += 1
+    if stack:
+        return f"{name}: {len(stack)} unclosed bracket(s)"
+    return None
+
+
+def local_problems(code):
+    """Problems found without calling the LLM; [] when the code looks well-formed."""
+    if not (code or "").strip():
+        return ["no code generated"]
+
+    problems = []
+    for name, content in split_files(code).items():
+        if not name or name == DEFAULT_FILENAME or not content.strip():
+            continue  # no header: could be Python, CSS or JS, so no rule applies safely
+        extension = os.path.splitext(name)[1].lower()
+        if extension == ".py":
+            problem = _python_problem(name, content)
+        elif extension == ".json":
+            problem = _json_problem(name, content)
+        elif extension in SCRIPT_EXTENSIONS:
+            problem = _bracket_problem(name, content)
+        else:
+            problem = None
+        if problem:
+            problems.append(problem)
+    return problems
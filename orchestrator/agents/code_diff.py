@@ -0,0 +1,119 @@
+"""
+File-aware diffs between two versions of generated code.
+
+`diff_code(old, new)` splits both versions into files (see code_files) and
+describes only what changed:
+
+    {"files": [{"name": "app.py", "status": "modified",
+                "hunks": [{"start": 12, "delete": 1, "insert": ["    return x + 1\n"]}]},
+               {"name": "theme.css", "status": "added", "content": "..."},
+               {"name": "old.js", "status": "removed"}],
+     "order": ["app.py", "theme.css", "styles.css"]}
+
+Hunks count 0-based lines of the old file, in ascending order; a file whose
+hunks would be bigger than its new content is sent whole ("content"). A file
+whose header line is not the plain `**name**` form (or changed) carries it
+in "header", so the rebuilt text matches byte for byte.
+Unchanged files are left out and `order` is the new file order. `apply_diff`
+rebuilds the new version from the old one; `unified_diff` renders the same
+change as a git-style patch.
+"""
+import difflib
+import json
+
+# ✅ Shared helpers (works as `agents.code_files` or top-level `code_files`)
+try:
+    from .code_files import CodeFiles, default_header, file_header, join_files, split_files
+except ImportError:
+    from code_files import CodeFiles, default_header, file_header, join_files, split_files
+
+
+def _hunks(old_lines, new_lines):
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    return [
+        {"start": i1, "delete": i2 - i1, "insert": new_lines[j1:j2]}
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != "equal"
+    ]
+
+
+def diff_code(old_code, new_code):
+    """Structured per-file diff from `old_code` to `new_code`, plus line counts."""
+    old_files, new_files = split_files(old_code), split_files(new_code)
+    files, added, removed = [], 0, 0
+    for name, content in new_files.items():
+        header = file_header(new_files, name)
+        if name not in old_files:
+            change = {"name": name, "status": "added", "content": content}
+            if name and header != default_header(name):
+                change["header"] = header
+            files.append(change)
+            added += len(content.splitlines())
+            continue
+        if old_files[name] == content and file_header(old_files, name) == header:
+            continue
+        hunks = _hunks(old_files[name].splitlines(keepends=True), content.splitlines(keepends=True))
+        added += sum(len(hunk["insert"]) for hunk in hunks)
+        removed += sum(hunk["delete"] for hunk in hunks)
+        if len(json.dumps(hunks)) < len(json.dumps(content)):
+            change = {"name": name, "status": "modified", "hunks": hunks}
+        else:
+            change = {"name": name, "status": "modified", "content": content}
+        if file_header(old_files, name) != header:
+            change["header"] = header
+        files.append(change)
+    for name, content in old_files.items():
+        if name not in new_files:
+            files.append({"name": name, "status": "removed"})
+            removed += len(content.splitlines())
+    return {
+        "files": files,
+        "order": list(new_files),
+        "stats": {"files_changed": len(files), "lines_added": added, "lines_removed": removed},
+    }
+
+
+def apply_diff(old_code, diff):
+    """New version of the code from the old one and a `diff_code` result."""
+    files = split_files(old_code)
+    for change in diff["files"]:
+        name = change["name"]
+        if change["status"] == "removed":
+            files.pop(name, None)
+            files.headers.pop(name, None)
+            continue
+        if "header" in change:
+            files.headers[name] = change["header"]
+        elif change["status"] == "added":
+            files.headers.pop(name, None)
+        if "content" in change:
+            files[name] = change["content"]
+        else:
+            old_lines, new_lines, position = files[name].splitlines(keepends=True), [], 0
+            for hunk in change["hunks"]:
+                new_lines += old_lines[position:hunk["start"]] + hunk["insert"]
+                position = hunk["start"] + hunk["delete"]
+            files[name] = "".join(new_lines + old_lines[position:])
+    return join_files(CodeFiles({name: files[name] for name in diff["order"]}, headers=files.headers))
+
+
+def unified_diff(old_code, new_code, context=3):
+    """Git-style unified diff of every changed file."""
+    old_files, new_files = split_files(old_code), split_files(new_code)
+    names = list(new_files) + [name for name in old_files if name not in new_files]
+    parts = []
+    for name in names:
+        old, new = old_files.get(name), new_files.get(name)
+        if old == new:
+            continue
+        label = name or "(preamble)"
+        lines = difflib.unified_diff(
+            (old or "").splitlines(keepends=True),
+            (new or "").splitlines(keepends=True),
+            fromfile=f"a/{label}" if old is not None else "/dev/null",
+            tofile=f"b/{label}" if new is not None else "/dev/null",
+            n=context,
+        )
+        for line in lines:
+            parts.append(line if line.endswith("\n") else line + "\n\\ No newline at end of file\n")
+    return "".join(parts)
@@ -0,0 +1,118 @@
+"""
+Helpers for the multi-file text the Code Agent produces.
+
+Generated apps come back as one string with a `**filename**` line in front of
+every file:
+
+    **app.py**
+    from fastapi import FastAPI
+    ...
+    **App.jsx**
+    export default function App() { ... }
+
+`split_files` turns that into an ordered {filename: content} dict and
+`join_files` turns it back, byte for byte: each file remembers its raw header
+line (backticks, trailing spaces, missing final newline), and a name that
+appears twice gets a numbered key ("app (2).py") so both copies keep their
+place. Output without any header becomes a single file called DEFAULT_FILENAME.
+"""
+import os
+import re
+
+DEFAULT_FILENAME = "generated_app"
+
+FILE_HEADER = re.compile(r"^\*\*`?([^*`\n]+?)`?\*\*[ \t]*$", re.MULTILINE)
+
+
+class CodeFiles(dict):
+    """{filename: content} that also keeps the raw header line of every file."""
+
+    def __init__(self, *args, headers=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.headers = dict(headers or {})
+
+    def copy(self):
+        return CodeFiles(self, headers=self.headers)
+
+
+def default_header(name):
+    return f"**{name}**\n"
+
+
+def file_header(files, name):
+    """Header line written in front of `name` ("" for the preamble)."""
+    if name == "":
+        return ""
+    return getattr(files, "headers", {}).get(name) or default_header(name)
+
+
+def _unique_name(name, files):
+    if name not in files:
+        return name
+    root, ext = os.path.splitext(name)
+    number = 2
+    while f"{root} ({number}){ext}" in files:
+        number += 1
+    return f"{root} ({number}){ext}"
+
+
+def split_files(code):
+    """Ordered {filename: content}; text before the first header is kept under ""."""
+    code = code or ""
+    headers = list(FILE_HEADER.finditer(code))
+    if not headers:
+        return CodeFiles({DEFAULT_FILENAME: code})
+
+    files = CodeFiles()
+    if headers[0].start() > 0:
+        files[""] = code[:headers[0].start()]
+    for index, header in enumerate(headers):
+        end = headers[index + 1].start() if index + 1 < len(headers) else len(code)
+        # The header line keeps its own newline, when there is one
+        header_end = header.end() + 1 if code.startswith("\n", header.end()) else header.end()
+        name = _unique_name(header.group(1).strip(), files)
+        files.headers[name] = code[header.start():header_end]
+        files[name] = code[header_end:end]
+    return files
+
+
+def join_files(files):
+    """Inverse of split_files."""
+    if list(files) == [DEFAULT_FILENAME] and not getattr(files, "headers", None):
+        return files[DEFAULT_FILENAME]
+    parts = []
+    for name, content in files.items():
+        header = file_header(files, name)
+        if header and parts and not parts[-1].endswith("\n"):
+            parts.append("\n")  # an edited file lost its final newline: keep the header on its own line
+        if header and content and not header.endswith("\n"):
+            header += "\n"  # the header used to be the last line
+        parts += [part for part in (header, content) if part]
+    return "".join(parts)
+
+
+# Preferred entry points when the output has several Python files
+PYTHON_ENTRYPOINTS = ("main.py", "app.py", "server.py", "backend.py")
+
+
+def python_entrypoint(code):
+    """
+    Python source worth smoke-running: the main .py file of multi-file output,
+    or headerless output that compiles as Python. None when there is none
+    (e.g. a React-only answer).
+    """
+    files = split_files(code)
+    python_files = [name for name in files if name.endswith(".py")]
+    for name in PYTHON_ENTRYPOINTS:
+        if name in python_files:
+            return files[name]
+    if python_files:
+        return files[python_files[0]]
+    source = files.get(DEFAULT_FILENAME)
+    if source and source.strip():
+        try:
+            compile(source, DEFAULT_FILENAME, "exec")
+            return source
+        except SyntaxError:
+            return None
+    return None
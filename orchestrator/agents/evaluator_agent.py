@@ -1,20 +1,15 @@
-import os
-from dotenv import load_dotenv
+# ✅ Shared LLM client (works as `agents.llm` or top-level `llm`)
+try:
+    from .json_stream import IncrementalJSONParser
+    from .llm import complete, delta_listener
+    from .prompts import render_prompt
+except ImportError:
+    from json_stream import IncrementalJSONParser
+    from llm import complete, delta_listener
+    from prompts import render_prompt
 
-# ✅ Import Groq with fallback for all versions
-from groq import Groq
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-
-
-# ✅ Load API key from .env
-load_dotenv()
-api_key = os.getenv("GROQ_API_KEY")
-
-if not api_key:
-    raise ValueError("❌ GROQ_API_KEY is missing! Add it to your .env file in project root.")
-
-# ✅ Initialize Groq client
-client = Groq(api_key=api_key)
+# Review fields streamed item by item, and the record type of their items
+FINDING_FIELDS = {"issues": "issue", "suggestions": "suggestion"}
 
 def validate_code(generated_code):
     """
@@ -22,28 +17,10 @@ def validate_code(generated_code):
     """
     print("🧪 Evaluator Agent: Checking code with Groq AI...")
 
-    prompt = f"""
-    You are an expert code reviewer.
-    Analyze the following code and respond in JSON format with:
-    {{
-      "status": "ok" or "fail",
-      "issues": [list of problems if any],
-      "suggestions": [list of improvements],
-      "overall_feedback": "brief summary"
-    }}
-
-    Code to evaluate:
-    {generated_code}
-    """
+    prompt = render_prompt("evaluate", generated_code=generated_code)
 
     try:
-        completion = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-        )
-
-        response = completion.choices[0].message.content
+        response = complete(prompt)
         print("✅ Evaluation completed!\n")
         print(response)
 
@@ -61,3 +38,59 @@ def validate_code(generated_code):
     except Exception as e:
         print("❌ Evaluation failed:", e)
         return {"status": "error", "message": str(e)}
+
+
+def parse_review(result):
+    """
+    A validate_code result as a dict with status, issues, suggestions and
+    overall_feedback ("error" status when the LLM call failed).
+    """
+    if isinstance(result, str):
+        # Reviews wrapped in prose or ``` fences still parse
+        parser = IncrementalJSONParser()
+        parser.feed(result)
+        if parser.done and isinstance(parser.value, dict):
+            result = parser.value
+        else:
+            result = {"status": "ok", "overall_feedback": result}
+    return {
+        "status": result.get("status", "ok"),
+        "issues": list(result.get("issues") or []),
+        "suggestions": list(result.get("suggestions") or []),
+        "overall_feedback": result.get("overall_feedback") or result.get("message") or "",
+    }
+
+
+def review_code(generated_code):
+    """validate_code as a dict with status, issues, suggestions and overall_feedback."""
+    return parse_review(validate_code(generated_code))
+
+
+class ReviewFindings:
+    """Turns streamed review text into finding records as soon as each item is complete."""
+
+    def __init__(self):
+        self.parser = IncrementalJSONParser()
+
+    def feed(self, text):
+        records = []
+        for path, value in self.parser.feed(text):
+            if len(path) == 2 and path[0] in FINDING_FIELDS:
+                records.append({"type": FINDING_FIELDS[path[0]], "index": path[1], "value": value})
+        return records
+
+
+def validate_code_streaming(generated_code, on_finding):
+    """
+    Same review as validate_code, but calls `on_finding(record)` for every issue
+    and suggestion the moment the LLM has finished writing it.
+    Runs on a worker thread; `on_finding` must be thread-safe.
+    """
+    findings = ReviewFindings()
+
+    def on_delta(text):
+        for record in findings.feed(text):
+            on_finding(record)
+
+    with delta_listener(on_delta):
+        return validate_code(generated_code)
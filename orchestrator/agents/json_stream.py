@@ -0,0 +1,152 @@
+"""
+Incremental JSON parser for LLM output that is still being streamed.
+
+Feed it text deltas as they arrive; it reports every value the moment its
+closing character has been seen, together with its path from the root:
+
+    parser = IncrementalJSONParser()
+    parser.feed('{"issues": ["no keys", "unu')   # -> [(("issues", 0), "no keys")]
+    parser.feed('sed import"], "status"')       # -> [(("issues", 1), "unused import"), (("issues",), [...])]
+
+Text before the first `{` or `[` (chatty preambles, ``` fences) and after the
+root value is ignored. Invalid JSON stops the parser (`failed` is set) instead
+of raising, so callers can fall back to whatever they do with plain text.
+"""
+import json
+
+WHITESPACE = " \t\r\n"
+
+
+class _Container:
+    __slots__ = ("value", "key", "state")
+
+    def __init__(self, value):
+        self.value = value
+        self.key = None  # current object key / next array index
+        # object: "key" | "colon" | "value" | "comma";  array: "value" | "comma"
+        self.state = "key" if isinstance(value, dict) else "value"
+        if isinstance(value, list):
+            self.key = 0
+
+
+class IncrementalJSONParser:
+    def __init__(self):
+        self._stack = []
+        self._string = None  # raw characters of the string being read, escapes included
+        self._escape = False
+        self._literal = None  # number / true / false / null being read
+        self.started = False
+        self.done = False
+        self.failed = False
+        self.value = None  # the root value once done
+
+    def feed(self, text):
+        """Consumes a chunk of text; returns the (path, value) pairs completed by it."""
+        events = []
+        for char in text:
+            if self.done or self.failed:
+                break
+            try:
+                self._consume(char, events)
+            except ValueError:
+                self.failed = True
+        return events
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _path(self):
+        return tuple(container.key for container in self._stack)
+
+    def _complete(self, value, events):
+        """A value finished: attach it to its parent and report it."""
+        if not self._stack:
+            self.value = value
+            self.done = True
+            events.append(((), value))
+            return
+        parent = self._stack[-1]
+        if parent.state == "key":
+            # Object keys are strings too, but they are not values
+            parent.key = value
+            parent.state = "colon"
+            return
+        events.append((self._path(), value))
+        if isinstance(parent.value, dict):
+            parent.value[parent.key] = value
+        else:
+            parent.value.append(value)
+        parent.state = "comma"
+
+    def _finish_literal(self, events):
+        literal, self._literal = self._literal, None
+        self._complete(json.loads(literal), events)
+
+    def _consume(self, char, events):
+        if self._string is not None:
+            if self._escape:
+                self._escape = False
+                self._string.append(char)
+            elif char == "\\":
+                self._escape = True
+                self._string.append(char)
+            elif char == '"':
+                raw, self._string = "".join(self._string), None
+                self._complete(json.loads(f'"{raw}"'), events)
+            else:
+                self._string.append(char)
+            return
+
+        if self._literal is not None:
+            if char not in WHITESPACE and char not in ",]}":
+                self._literal += char
+                return
+            self._finish_literal(events)
+            if self.done:
+                return
+
+        if not self.started:
+            if char in "{[":
+                self.started = True
+                self._stack.append(_Container({} if char == "{" else []))
+            return
+
+        if char in WHITESPACE:
+            return
+
+        container = self._stack[-1]
+        if container.state == "colon":
+            if char != ":":
+                raise ValueError(f"expected ':' but got {char!r}")
+            container.state = "value"
+        elif container.state == "comma":
+            if char == ",":
+                if isinstance(container.value, list):
+                    container.key += 1
+                    container.state = "value"
+                else:
+                    container.state = "key"
+            elif char in "}]":
+                self._close(char, events)
+            else:
+                raise ValueError(f"expected ',' but got {char!r}")
+        elif char in "}]":
+            # Empty container (or a trailing comma, which we tolerate)
+            self._close(char, events)
+        elif container.state == "key":
+            if char != '"':
+                raise ValueError(f"expected a key but got {char!r}")
+            self._string = []
+        elif char == '"':
+            self._string = []
+        elif char in "{[":
+            self._stack.append(_Container({} if char == "{" else []))
+        else:
+            self._literal = char
+
+    def _close(self, char, events):
+        container = self._stack.pop()
+        if (char == "}") != isinstance(container.value, dict):
+            raise ValueError(f"mismatched {char!r}")
+        self._complete(container.value, events)
@@ -0,0 +1,169 @@
+"""
+Canonical form of Vision Agent layouts.
+
+Vision answers for the same app differ in wording, key order and component
+names ("nav bar", "Navbar", "navigation"). `normalize_layout` maps a raw answer
+onto one schema:
+
+    {"layout": "<summary>", "components": [...], "data_elements": [...], "layout_hash": "<sha256>"}
+
+Component names are mapped onto COMPONENT_VOCABULARY; components mentioned
+only in the summary are added too. Both lists are sorted and de-duplicated.
+
+The Code prompt is built from the canonical fields only (`code_prompt_fields`):
+components and data elements. The free-text summary is kept for display but
+left out, since its wording changes from answer to answer; it is used only
+when the answer has no data elements (plain-text answers), where it is all
+there is. `layout_hash` covers exactly those fields, so answers that differ
+only in wording, key order, list order or component spelling share one hash
+and one Code memo entry.
+"""
+import hashlib
+import json
+import re
+
+SCHEMA_VERSION = 3
+
+# Canonical component -> other names the Vision Agent uses for it
+COMPONENT_VOCABULARY = {
+    "navbar": ["nav bar", "nav", "navigation", "navigation bar", "navigation menu", "top bar", "menu bar", "menu"],
+    "header": ["page header", "app header", "top header", "title bar", "banner"],
+    "footer": ["page footer", "bottom bar"],
+    "sidebar": ["side bar", "side menu", "side nav", "sidenav", "side navigation", "drawer"],
+    "hero": ["hero section", "hero banner", "jumbotron"],
+    "form": ["input form", "entry form", "add form", "edit form", "form section"],
+    "login": ["login form", "sign in", "signin", "sign in form", "log in", "authentication", "auth"],
+    "signup": ["sign up", "sign up form", "register", "registration", "registration form"],
+    "search": ["search bar", "search box", "searchbar", "search field", "search input"],
+    "filter": ["filters", "filter bar", "filter panel"],
+    "list": ["item list", "list view", "items list", "entry list", "task list", "todo list"],
+    "table": ["data table", "grid", "data grid"],
+    "card": ["cards", "card grid", "card list", "tile"],
+    "chart": ["graph", "charts", "graphs", "bar chart", "line chart", "pie chart", "visualization"],
+    "dashboard": ["dashboard view", "overview"],
+    "modal": ["dialog", "popup", "pop up", "modal dialog", "overlay"],
+    "button": ["buttons", "action button", "submit button", "cta"],
+    "tabs": ["tab", "tab bar", "tab navigation"],
+    "pagination": ["pager", "page navigation"],
+    "calendar": ["date picker", "datepicker", "calendar view"],
+    "map": ["map view"],
+    "profile": ["user profile", "profile page", "account", "avatar"],
+    "settings": ["settings page", "preferences", "configuration"],
+    "notifications": ["notification", "alerts", "toast", "toasts"],
+    "gallery": ["image gallery", "photo gallery", "carousel", "slider"],
+    "comments": ["comment", "comment section", "comments section"],
+    "chat": ["messages", "messaging", "chat window", "inbox"],
+    "cart": ["shopping cart", "basket"],
+    "checkout": ["payment", "payment form"],
+    "player": ["video player", "audio player", "media player"],
+    "progress": ["progress bar", "progress tracker"],
+}
+
+_ALIASES = {}
+for _canonical, _names in COMPONENT_VOCABULARY.items():
+    _ALIASES[_canonical] = _canonical
+    for _name in _names:
+        _ALIASES[_name] = _canonical
+
+# Free text is scanned for canonical names and multi-word aliases only (single
+# words like "menu" or "account" are too ambiguous in prose); longest first
+_MENTION = re.compile(r"\b(" + "|".join(
+    re.escape(name) for name in sorted(_ALIASES, key=len, reverse=True) if " " in name or name == _ALIASES[name]
+) + r")\b")
+
+
+def _clean(text):
+    """Lower case, words separated by single spaces, no punctuation."""
+    text = re.sub(r"([a-z])([A-Z])", r"\1 \2", str(text or ""))  # NavBar -> Nav Bar
+    text = re.sub(r"[_\-/]+", " ", text.lower())
+    text = re.sub(r"[^a-z0-9 ]+", "", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def canonical_component(name):
+    """Vocabulary name for a component (unknown names are cleaned but kept)."""
+    cleaned = _clean(name)
+    if cleaned in _ALIASES:
+        return _ALIASES[cleaned]
+    compact = cleaned.replace(" ", "")
+    if compact in _ALIASES:
+        return _ALIASES[compact]
+    if cleaned.endswith("s") and cleaned[:-1] in _ALIASES:
+        return _ALIASES[cleaned[:-1]]
+    return cleaned
+
+
+def components_in_text(text):
+    """Vocabulary components mentioned in a free-text layout summary."""
+    return {_ALIASES[match] for match in _MENTION.findall(_clean(text))}
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [part for part in re.split(r"[,;\n]", value) if part.strip()]
+    if isinstance(value, dict):
+        return list(value)
+    # Items may be objects such as {"name": "header", "type": "section"}
+    return [item.get("name") or item.get("type") if isinstance(item, dict) else item for item in value]
+
+
+def code_prompt_fields(summary, components, data_elements):
+    """The canonical fields the Code prompt is built from (and that layout_hash covers)."""
+    fields = {"components": list(components or []), "data_elements": list(data_elements or [])}
+    if not fields["data_elements"]:
+        fields["layout"] = re.sub(r"\s+", " ", summary or "").strip()  # unstructured answer: the summary is all there is
+    return fields
+
+
+def layout_hash(summary, components, data_elements):
+    payload = json.dumps(
+        {"schema": SCHEMA_VERSION, **code_prompt_fields(summary, components, data_elements)},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def normalize_layout(raw):
+    """
+    Canonical layout dict from a Vision answer: a dict with layout /
+    components / data_elements (keys in any case), a JSON string of one, or
+    plain text.
+    """
+    if isinstance(raw, str):
+        try:
+            parsed = json.loads(raw)
+            raw = parsed if isinstance(parsed, dict) else {"layout": raw}
+        except json.JSONDecodeError:
+            raw = {"layout": raw}
+    fields = {_clean(key).replace(" ", "_"): value for key, value in dict(raw or {}).items()}
+
+    summary = fields.get("layout")
+    if not isinstance(summary, str):
+        summary = json.dumps(summary, sort_keys=True) if summary is not None else ""
+    summary = re.sub(r"\s+", " ", summary).strip()
+
+    components = {canonical_component(name) for name in _as_list(fields.get("components"))}
+    components |= components_in_text(summary)
+    components = sorted(name for name in components if name)
+    data_elements = sorted({_clean(name) for name in _as_list(fields.get("data_elements"))} - {""})
+
+    return {
+        "layout": summary,
+        "components": components,
+        "data_elements": data_elements,
+        "layout_hash": layout_hash(summary, components, data_elements),
+    }
+
+
+def layout_prompt_text(layout, components, data_elements):
+    """Layout text handed to the Code Agent, from code_prompt_fields only."""
+    fields = code_prompt_fields(layout, components, data_elements)
+    lines = [fields["layout"]] if fields.get("layout") else []
+    if fields["components"]:
+        lines.append(f"Components: {', '.join(fields['components'])}")
+    if fields["data_elements"]:
+        lines.append(f"Data: {', '.join(fields['data_elements'])}")
+    return "\n".join(lines)
@@ -0,0 +1,319 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dotenv import load_dotenv
+
+# ✅ Load API keys / DREAMFORGE_PROVIDERS / DREAMFORGE_CASSETTE from .env
+load_dotenv()
+
+try:
+    from .cassettes import active_cassette, call_key
+    from .providers import ProviderError, ProviderPool, chunk_delta, chunk_usage, load_providers
+    from .tracing import start_span
+except ImportError:
+    from cassettes import active_cassette, call_key
+    from providers import ProviderError, ProviderPool, chunk_delta, chunk_usage, load_providers
+    from tracing import start_span
+
+# ✅ One shared provider pool (pooled connections per provider) for every agent, created on
+# first use: importing the agents or replaying a cassette needs no API key.
+_provider_pool = None
+_provider_pool_lock = threading.Lock()
+
+DEFAULT_MODEL = "llama-3.1-8b-instant"
+
+# Longest a call waits for a rate-limit window to reopen when every provider is at its `rpm`
+RATE_LIMIT_WAIT = float(os.getenv("DREAMFORGE_RATE_LIMIT_WAIT", "30"))
+
+# Active usage scopes for the current request (innermost last)
+_usage_scopes = ContextVar("dreamforge_usage_scopes", default=())
+
+
+def _empty_usage():
+    return {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+
+
+@contextmanager
+def usage_scope(isolated=False):
+    """
+    Collects token usage of every completion made inside the block.
+    Scopes nest: a call is counted in the inner scope and all outer ones.
+    An isolated scope hides the outer ones, for work that is billed later
+    (pass the collected dict to record_usage once it is known to be used).
+    """
+    usage = _empty_usage()
+    token = _usage_scopes.set((usage,) if isolated else _usage_scopes.get() + (usage,))
+    try:
+        yield usage
+    finally:
+        _usage_scopes.reset(token)
+
+
+def record_usage(usage):
+    """
+    Adds a completion usage dict (or None if unknown) to all active scopes.
+    A dict collected by usage_scope carries its own call count.
+    """
+    scopes = _usage_scopes.get()
+    for scope in scopes:
+        scope["calls"] += (usage or {}).get("calls", 1)
+        if usage is None:
+            continue
+        scope["prompt_tokens"] += usage.get("prompt_tokens") or 0
+        scope["completion_tokens"] += usage.get("completion_tokens") or 0
+        scope["total_tokens"] += usage.get("total_tokens") or 0
+
+
+# -------------------------------------------------------------------
+# ---------------------- CANCELLATION -------------------------------
+# -------------------------------------------------------------------
+
+class RequestCancelled(BaseException):
+    """
+    Raised inside agent calls once their request has been cancelled.
+    Derives from BaseException so the agents' `except Exception` fallbacks
+    do not turn a cancelled call into a fake result for the next stage.
+    """
+
+
+class CancelToken:
+    """
+    Thread-safe flag shared between a request and the agent calls it started.
+    A child token (parent=...) is also cancelled when its parent is, so part of
+    a request can be cancelled on its own without losing the request's token.
+    """
+
+    def __init__(self, parent=None):
+        self._event = threading.Event()
+        self._reason = None
+        self.parent = parent
+
+    @property
+    def cancelled(self):
+        return self._event.is_set() or (self.parent is not None and self.parent.cancelled)
+
+    @property
+    def reason(self):
+        if self._event.is_set() or self.parent is None:
+            return self._reason
+        return self.parent.reason
+
+    def cancel(self, reason="client disconnected"):
+        if not self._event.is_set():
+            self._reason = reason
+            self._event.set()
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise RequestCancelled(self.reason)
+
+
+_cancel_token = ContextVar("dreamforge_cancel_token", default=None)
+
+# Work that was not paid for because the requester had gone away
+_cancel_lock = threading.Lock()
+cancel_stats = {
+    "requests_cancelled": 0,  # requests whose client went away mid-run
+    "calls_skipped": 0,  # never sent to the provider
+    "calls_aborted": 0,  # stream closed while the provider was still generating
+    "chunks_before_abort": 0,  # streamed chunks that were paid for and thrown away
+}
+
+
+def count_cancelled(key, amount=1):
+    with _cancel_lock:
+        cancel_stats[key] = cancel_stats.get(key, 0) + amount
+
+
+def current_cancel_token():
+    return _cancel_token.get()
+
+
+@contextmanager
+def cancellation_scope(token):
+    """Makes `token` the cancel token of every agent call started inside the block."""
+    reset = _cancel_token.set(token)
+    try:
+        yield token
+    finally:
+        _cancel_token.reset(reset)
+
+
+# -------------------------------------------------------------------
+# ---------------------- TOKEN DELTAS -------------------------------
+# -------------------------------------------------------------------
+
+_delta_listener = ContextVar("dreamforge_delta_listener", default=None)
+
+
+@contextmanager
+def delta_listener(callback):
+    """
+    Calls `callback(text)` for every streamed delta of agent calls made inside the block.
+    The callback runs on the agent's worker thread and must be thread-safe.
+    """
+    reset = _delta_listener.set(callback)
+    try:
+        yield
+    finally:
+        _delta_listener.reset(reset)
+
+
+# -------------------------------------------------------------------
+# ---------------------- COMPLETIONS --------------------------------
+# -------------------------------------------------------------------
+
+def get_provider_pool():
+    """The shared provider pool (None while a cassette is replaying)."""
+    global _provider_pool
+    cassette = active_cassette()
+    if cassette is not None and cassette.mode == "replay":
+        return None
+    if _provider_pool is None:
+        with _provider_pool_lock:
+            if _provider_pool is None:
+                _provider_pool = ProviderPool(load_providers())
+    return _provider_pool
+
+
+def _provider_chunks(payload, llm_span, token):
+    """
+    Raw completion chunks from the best available provider.
+    Until a chunk with text has been yielded, a failing provider is skipped and
+    the next one takes over; afterwards the error is raised, since another
+    provider would not continue the same text. Providers over their `rpm` are
+    skipped; when all of them are, the call waits for the next window.
+    """
+    provider_pool = get_provider_pool()
+    if provider_pool is None:
+        raise RuntimeError("❌ No LLM providers loaded (cassette replay mode)")
+    deadline = time.monotonic() + RATE_LIMIT_WAIT
+    while True:
+        last_error = None
+        limited = False
+        for provider in provider_pool.ranked():
+            if not provider.try_acquire():
+                limited = True
+                continue
+            if last_error is not None:
+                if token is not None and token.cancelled:
+                    count_cancelled("calls_skipped")
+                    raise RequestCancelled(token.reason)
+                llm_span.add("retries")
+            llm_span.set("provider", provider.name)
+            started = time.perf_counter()
+            first_chunk_latency = None
+            emitted = False
+            response = None
+            try:
+                response = provider.open_stream(payload)
+                for chunk in provider.iter_chunks(response):
+                    if first_chunk_latency is None:
+                        first_chunk_latency = time.perf_counter() - started
+                    emitted = emitted or bool(chunk_delta(chunk))
+                    yield chunk
+                provider.record_success(first_chunk_latency or time.perf_counter() - started)
+                return
+            except ProviderError as e:
+                provider.record_failure()
+                if emitted:
+                    raise
+                last_error = e
+                print(f"🔁 {e} — failing over")
+            finally:
+                # Dropping the connection makes the provider stop generating
+                if response is not None:
+                    response.close()
+        if last_error is not None or not limited:
+            raise last_error
+
+        # Every provider is at its requests-per-minute cap (possibly from other workers)
+        wait = provider_pool.seconds_to_next_window()
+        if time.monotonic() + wait > deadline:
+            raise ProviderError("all providers", "requests-per-minute limit reached")
+        llm_span.add("rate_limit_waits")
+        print(f"⏳ All providers at their rate limit — waiting {wait:.1f}s")
+        resume_at = time.monotonic() + wait
+        while time.monotonic() < resume_at:
+            if token is not None and token.cancelled:
+                count_cancelled("calls_skipped")
+                raise RequestCancelled(token.reason)
+            time.sleep(min(0.1, max(0.0, resume_at - time.monotonic())))
+
+
+def stream_complete(prompt, temperature=None, model=DEFAULT_MODEL):
+    """
+    Streams a single-message chat completion as text deltas.
+    Chunks come from the provider pool, or from the active cassette when one is
+    recording or replaying. Checks the active cancel token before sending and
+    between chunks; closing the stream drops the provider connection.
+    """
+    token = _cancel_token.get()
+    if token is not None and token.cancelled:
+        count_cancelled("calls_skipped")
+        raise RequestCancelled(token.reason)
+
+    # Prompts rendered from a template carry its sampling settings and fingerprint
+    template = getattr(prompt, "template", None)
+    if temperature is None and template is not None:
+        temperature = template.temperature
+
+    payload = {"model": model, "messages": [{"role": "user", "content": str(prompt)}]}
+    if temperature is not None:
+        payload["temperature"] = temperature
+
+    listener = _delta_listener.get()
+    llm_span = start_span(
+        "llm.complete", model=model, temperature=temperature, prompt_chars=len(prompt), retries=0,
+        prompt=template.name if template else None,
+        prompt_fingerprint=template.fingerprint if template else None,
+    )
+
+    cassette = active_cassette()
+    if cassette is not None and cassette.mode == "replay":
+        llm_span.set("provider", "cassette")
+        source = cassette.replay(call_key(model, temperature, prompt), prompt)
+    else:
+        source = _provider_chunks(payload, llm_span, token)
+        if cassette is not None:
+            source = cassette.record(call_key(model, temperature, prompt), prompt, source)
+
+    usage = None
+    chunks = 0
+    error = None
+    try:
+        for chunk in source:
+            if token is not None and token.cancelled:
+                count_cancelled("calls_aborted")
+                count_cancelled("chunks_before_abort", chunks)
+                raise RequestCancelled(token.reason)
+            chunks += 1
+            usage = chunk_usage(chunk) or usage
+            delta = chunk_delta(chunk)
+            if delta:
+                if listener is not None:
+                    listener(delta)
+                yield delta
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        source.close()
+        record_usage(usage)
+        llm_span.set("chunks", chunks)
+        for key in ("prompt_tokens", "completion_tokens", "total_tokens"):
+            llm_span.set(key, (usage or {}).get(key) or 0)
+        # A consumer that stops iterating early closes us with GeneratorExit: not an error
+        llm_span.end(None if isinstance(error, GeneratorExit) else error)
+
+
+def provider_stats():
+    """Health and moving averages per provider, for /api/metrics ({} before the pool is first used)."""
+    return _provider_pool.stats() if _provider_pool is not None else {}
+
+
+def complete(prompt, temperature=None, model=DEFAULT_MODEL):
+    """Runs a single-message chat completion and returns the text content."""
+    return "".join(stream_complete(prompt, temperature=temperature, model=model))
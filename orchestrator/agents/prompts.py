@@ -0,0 +1,184 @@
+"""
+Versioned prompt templates shared by the agents, the API routes and the CLI.
+
+Each template is a static instruction prefix followed by a short dynamic tail
+with the request's values. The prefix never changes between calls, so
+providers with prefix caching can reuse it, and every call path renders the
+exact same text for the same inputs. A template's fingerprint hashes its
+name, version, text and sampling settings; pipeline stages use it in their
+memo keys, so editing one prompt invalidates only that stage's cached outputs.
+"""
+import hashlib
+import json
+import string
+from textwrap import dedent
+
+
+class RenderedPrompt(str):
+    """Prompt text that remembers which template (and sampling settings) produced it."""
+
+    template = None
+
+    @property
+    def temperature(self):
+        return self.template.temperature if self.template else None
+
+
+class PromptTemplate:
+    def __init__(self, name, version, static, dynamic, temperature=None):
+        self.name = name
+        self.version = version
+        self.static = dedent(static).strip() + "\n\n"
+        self.dynamic = dedent(dynamic).strip() + "\n"
+        self.temperature = temperature
+
+        # Compile once: literal segments and field names, no format-string parsing per call
+        self._segments = []
+        self.fields = []
+        for literal, field, format_spec, conversion in string.Formatter().parse(self.dynamic):
+            if format_spec or conversion or (field is not None and not field.isidentifier()):
+                raise ValueError(f"Prompt {name}: only plain {{name}} fields are supported")
+            self._segments.append((literal, field))
+            if field is not None and field not in self.fields:
+                self.fields.append(field)
+
+        self.fingerprint = hashlib.sha256(json.dumps(
+            [name, version, self.static, self.dynamic, temperature], separators=(",", ":")
+        ).encode("utf-8")).hexdigest()[:16]
+
+    def render(self, **values):
+        missing = [field for field in self.fields if field not in values]
+        if missing:
+            raise KeyError(f"Prompt {self.name} is missing values for: {', '.join(missing)}")
+        parts = [self.static]
+        for literal, field in self._segments:
+            parts.append(literal)
+            if field is not None:
+                parts.append(str(values[field]))
+        prompt = RenderedPrompt("".join(parts))
+        prompt.template = self
+        return prompt
+
+
+PROMPTS = {}
+
+
+def register_prompt(template):
+    if template.name in PROMPTS:
+        raise ValueError(f"Prompt {template.name} is already registered")
+    PROMPTS[template.name] = template
+    return template
+
+
+def get_prompt(name):
+    return PROMPTS[name]
+
+
+def render_prompt(name, **values):
+    return PROMPTS[name].render(**values)
+
+
+def prompt_fingerprint(name):
+    """Stable cache-key component for everything derived from prompt `name`."""
+    template = PROMPTS[name]
+    return f"{template.name}@{template.version}:{template.fingerprint}"
+
+
+# -------------------------------------------------------------------
+# ------------------------ TEMPLATES --------------------------------
+# -------------------------------------------------------------------
+
+register_prompt(PromptTemplate(
+    "vision",
+    version="2",
+    temperature=0.5,
+    static="""
+    You are a UI/UX layout designer AI.
+    Convert the description at the end into a structured JSON layout
+    describing key UI components, pages, and data requirements.
+
+    Output format example:
+    {
+      "layout": "dashboard with charts and sidebar",
+      "components": ["header", "chart", "sidebar", "footer"],
+      "data_elements": ["user input", "statistics"]
+    }
+    """,
+    dynamic="""
+    Input type: {input_type}
+    Input:
+    {input_data}
+    """,
+))
+
+register_prompt(PromptTemplate(
+    "code",
+    version="2",
+    temperature=0.7,
+    static="""
+    Generate full frontend + backend code for the layout at the end.
+
+    ⚠️ Important:
+    - Respond ONLY with clean runnable code (no explanations, no markdown, no comments).
+    - Add a small backend (FastAPI, Flask or Express) only if the app needs one.
+    - Do not include ``` in the response.
+    """,
+    dynamic="""
+    Frontend framework: {framework}
+
+    Layout:
+    {layout}
+    """,
+))
+
+register_prompt(PromptTemplate(
+    "evaluate",
+    version="2",
+    temperature=0.3,
+    static="""
+    You are an expert code reviewer.
+    Analyze the code at the end and respond in JSON format with:
+    {
+      "status": "ok" or "fail",
+      "issues": [list of problems if any],
+      "suggestions": [list of improvements],
+      "overall_feedback": "brief summary"
+    }
+    """,
+    dynamic="""
+    Code to evaluate:
+    {generated_code}
+    """,
+))
+
+register_prompt(PromptTemplate(
+    "repair",
+    version="1",
+    temperature=0.2,
+    static="""
+    You are a senior engineer fixing generated code after a code review.
+    Fix ONLY the issues listed at the end. Do not rewrite whole files and do not
+    touch anything unrelated.
+
+    Respond ONLY with patches in exactly this format, one block per change:
+
+    FILE: <file name>
+    <<<<<<< SEARCH
+    <lines copied exactly from the current file>
+    =======
+    <replacement lines>
+    >>>>>>> REPLACE
+
+    Keep every SEARCH block short but unique within its file. Use an empty
+    SEARCH block to append to a file or to add a new one.
+    """,
+    dynamic="""
+    Frontend framework: {framework}
+
+    Issues to fix:
+    {issues}
+
+    Current files:
+    {files}
+    """,
+))
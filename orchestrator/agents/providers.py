@@ -0,0 +1,239 @@
+"""
+OpenAI-compatible chat providers with health tracking and failover.
+
+Every provider keeps its own pooled httpx client, so keep-alive connections to
+each endpoint stay open and switching providers costs no new handshakes. Each
+call updates a moving average of the provider's time to first token and error
+rate; `ProviderPool.ranked()` orders providers by that score and skips those
+cooling down after failures. An optional `rpm` caps requests per minute; the
+window counter lives in shared state, so the cap holds across worker processes.
+
+Providers come from DREAMFORGE_PROVIDERS, a JSON list such as:
+
+    [{"name": "groq", "base_url": "https://api.groq.com/openai/v1", "api_key_env": "GROQ_API_KEY"},
+     {"name": "local", "base_url": "http://127.0.0.1:8100/v1", "model": "stub", "rpm": 30}]
+
+Without it, the single Groq provider from GROQ_API_KEY is used.
+"""
+import json
+import os
+import threading
+import time
+
+import httpx
+
+try:
+    from .shared_state import SharedStateError, get_shared_state
+except ImportError:
+    from shared_state import SharedStateError, get_shared_state
+
+# Weight of the newest call in the moving averages
+EWMA_ALPHA = 0.2
+# Each point of error rate makes a provider look this many times slower
+ERROR_PENALTY = 4.0
+# Cool-down after consecutive failures: base * 2^(failures - 1), capped
+COOLDOWN_BASE = 2.0
+COOLDOWN_MAX = 60.0
+# Length of the requests-per-minute window
+RATE_WINDOW = 60.0
+
+GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+
+
+class ProviderError(Exception):
+    """A provider could not serve a call (transport error, timeout or non-2xx status)."""
+
+    def __init__(self, provider, message):
+        super().__init__(f"{provider}: {message}")
+        self.provider = provider
+
+
+def chunk_delta(chunk):
+    """Text delta of a streamed chat completion chunk (None for role/usage-only chunks)."""
+    choices = chunk.get("choices") or []
+    return (choices[0].get("delta") or {}).get("content") if choices else None
+
+
+def chunk_usage(chunk):
+    """OpenAI-style `usage` or Groq's `x_groq.usage`, sent on the final chunk."""
+    return chunk.get("usage") or (chunk.get("x_groq") or {}).get("usage")
+
+
+class Provider:
+    def __init__(self, name, base_url, api_key=None, model=None, timeout=60.0, max_connections=20, rpm=None, state=None):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.model = model  # overrides the agent's model name when set
+        self.rpm = rpm  # requests per minute across all workers (None = unlimited)
+        self.state = state or (get_shared_state() if rpm else None)
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.client = httpx.Client(
+            base_url=self.base_url,
+            headers=headers,
+            timeout=httpx.Timeout(timeout, connect=5.0),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+
+        self._lock = threading.Lock()
+        self.latency = None  # EWMA seconds to first streamed chunk
+        self.error_rate = 0.0  # EWMA of failed calls (0..1)
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.calls = 0
+        self.failures = 0
+        self.rate_limited = 0
+
+    # ------------------------------------------------------------------
+    # Health
+    # ------------------------------------------------------------------
+
+    @property
+    def healthy(self):
+        return time.monotonic() >= self.cooldown_until
+
+    def score(self):
+        """Lower is better; providers that have not been measured yet are tried first."""
+        return (self.latency or 0.0) * (1 + ERROR_PENALTY * self.error_rate)
+
+    def record_success(self, latency):
+        with self._lock:
+            self.calls += 1
+            self.latency = latency if self.latency is None else self.latency + EWMA_ALPHA * (latency - self.latency)
+            self.error_rate -= EWMA_ALPHA * self.error_rate
+            self.consecutive_failures = 0
+            self.cooldown_until = 0.0
+
+    def record_failure(self):
+        with self._lock:
+            self.calls += 1
+            self.failures += 1
+            self.error_rate += EWMA_ALPHA * (1 - self.error_rate)
+            self.consecutive_failures += 1
+            cooldown = min(COOLDOWN_BASE * 2 ** (self.consecutive_failures - 1), COOLDOWN_MAX)
+            self.cooldown_until = time.monotonic() + cooldown
+
+    def try_acquire(self):
+        """Takes one request from this minute's budget; False when it is used up."""
+        if not self.rpm:
+            return True
+        window = int(time.time() // RATE_WINDOW)
+        try:
+            used = self.state.incr(f"rpm:{self.name}:{window}", ttl=RATE_WINDOW + 5)
+        except SharedStateError as e:
+            print(f"⚠️ Rate limit check for {self.name} failed: {e}")
+            return True  # limits are best effort; never block calls on the state store
+        if used > self.rpm:
+            with self._lock:
+                self.rate_limited += 1
+            return False
+        return True
+
+    def snapshot(self):
+        return {
+            "base_url": self.base_url,
+            "healthy": self.healthy,
+            "latency_seconds": round(self.latency, 3) if self.latency is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "calls": self.calls,
+            "failures": self.failures,
+            "rpm": self.rpm,
+            "rate_limited": self.rate_limited,
+            "cooldown_seconds": round(max(0.0, self.cooldown_until - time.monotonic()), 1),
+        }
+
+    # ------------------------------------------------------------------
+    # Calls
+    # ------------------------------------------------------------------
+
+    def open_stream(self, payload):
+        """
+        Sends a streaming chat completion and returns the open httpx response.
+        Raises ProviderError for transport failures and non-2xx statuses.
+        """
+        payload = dict(payload, stream=True)
+        if self.model:
+            payload["model"] = self.model
+        try:
+            request = self.client.build_request("POST", "/chat/completions", json=payload)
+            response = self.client.send(request, stream=True)
+        except httpx.HTTPError as e:
+            raise ProviderError(self.name, f"{type(e).__name__}: {e}") from e
+        if response.status_code >= 300:
+            try:
+                detail = response.read().decode("utf-8", errors="replace")[:200]
+            finally:
+                response.close()
+            raise ProviderError(self.name, f"HTTP {response.status_code}: {detail}")
+        return response
+
+    def iter_chunks(self, response):
+        """Parsed `data:` events of a server-sent event stream, until [DONE]."""
+        try:
+            for line in response.iter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    return
+                yield json.loads(data)
+        except (httpx.HTTPError, json.JSONDecodeError) as e:
+            raise ProviderError(self.name, f"stream broken: {type(e).__name__}: {e}") from e
+
+    def warm(self):
+        """Opens a pooled connection ahead of the first call (any response will do)."""
+        try:
+            self.client.get("/models")
+        except httpx.HTTPError:
+            pass
+
+    def close(self):
+        self.client.close()
+
+
+class ProviderPool:
+    def __init__(self, providers):
+        if not providers:
+            raise ValueError("❌ No LLM providers configured")
+        self.providers = list(providers)
+
+    def ranked(self):
+        """Healthy providers best-first, then cooling ones (soonest available first) as a last resort."""
+        healthy = [p for p in self.providers if p.healthy]
+        cooling = [p for p in self.providers if not p.healthy]
+        # sorted() is stable, so configuration order breaks ties
+        return sorted(healthy, key=lambda p: p.score()) + sorted(cooling, key=lambda p: p.cooldown_until)
+
+    @staticmethod
+    def seconds_to_next_window():
+        return RATE_WINDOW - time.time() % RATE_WINDOW
+
+    def stats(self):
+        return {provider.name: provider.snapshot() for provider in self.providers}
+
+    def close(self):
+        for provider in self.providers:
+            provider.close()
+
+
+def load_providers():
+    """Providers from DREAMFORGE_PROVIDERS, or the default Groq provider from GROQ_API_KEY."""
+    config = os.getenv("DREAMFORGE_PROVIDERS")
+    if not config:
+        api_key = os.getenv("GROQ_API_KEY")
+        if not api_key:
+            raise ValueError("❌ GROQ_API_KEY is missing! Add it to your .env file in project root.")
+        return [Provider("groq", GROQ_BASE_URL, api_key=api_key)]
+
+    providers = []
+    for entry in json.loads(config):
+        api_key = entry.get("api_key") or os.getenv(entry.get("api_key_env", ""), "")
+        providers.append(Provider(
+            entry["name"],
+            entry["base_url"],
+            api_key=api_key or None,
+            model=entry.get("model"),
+            timeout=float(entry.get("timeout", 60.0)),
+            max_connections=int(entry.get("max_connections", 20)),
+            rpm=int(entry["rpm"]) if entry.get("rpm") else None,
+        ))
+    return providers
@@ -0,0 +1,166 @@
+import os
+import re
+
+# ✅ Shared LLM client (works as `agents.llm` or top-level `llm`)
+try:
+    from .code_agent import DEFAULT_FRAMEWORK, framework_label
+    from .code_files import join_files, split_files
+    from .evaluator_agent import review_code
+    from .llm import complete, usage_scope
+    from .prompts import render_prompt
+except ImportError:
+    from code_agent import DEFAULT_FRAMEWORK, framework_label
+    from code_files import join_files, split_files
+    from evaluator_agent import review_code
+    from llm import complete, usage_scope
+    from prompts import render_prompt
+
+# Patch → re-review rounds before giving up (override with DREAMFORGE_MAX_REPAIRS)
+MAX_REPAIR_ITERATIONS = int(os.getenv("DREAMFORGE_MAX_REPAIRS", "2"))
+
+PATCH_BLOCK = re.compile(
+    r"^FILE:[ \t]*`?(?P<file>[^`\n]+?)`?[ \t]*\n"
+    r"<{5,}[ \t]*SEARCH[ \t]*\n(?P<search>.*?)^={5,}[ \t]*\n(?P<replace>.*?)^>{5,}[ \t]*REPLACE[ \t]*$",
+    re.MULTILINE | re.DOTALL,
+)
+
+
+def parse_patches(text):
+    """[(file, search, replace)] from the Repair prompt's SEARCH/REPLACE blocks."""
+    return [(m.group("file").strip(), m.group("search"), m.group("replace")) for m in PATCH_BLOCK.finditer(text or "")]
+
+
+def _replace_lines(content, search, replace):
+    """Replaces `search` in `content` matching line by line, ignoring indentation and trailing spaces."""
+    lines = content.splitlines(keepends=True)
+    wanted = [line.strip() for line in search.splitlines() if line.strip()]
+    if not wanted:
+        return None
+    stripped = [line.strip() for line in lines]
+    for start in range(len(lines)):
+        index, matched = start, 0
+        while index < len(lines) and matched < len(wanted):
+            if stripped[index] == "" and matched:
+                index += 1
+                continue
+            if stripped[index] != wanted[matched]:
+                break
+            index += 1
+            matched += 1
+        if matched == len(wanted):
+            return "".join(lines[:start]) + replace + "".join(lines[index:])
+    return None
+
+
+def apply_patches(files, patches):
+    """
+    Applies patches to a copy of `files`; returns (files, applied, failed).
+    A SEARCH block must match once exactly, or line by line ignoring whitespace.
+    """
+    files = files.copy()  # keeps the raw header lines
+    applied, failed = [], []
+    for name, search, replace in patches:
+        target = name
+        if target not in files and len(files) == 1 and search.strip():
+            target = next(iter(files))  # single-file app: the model named it differently
+        content = files.get(target)
+
+        if not search.strip():
+            files[target] = (content or "") + replace
+            applied.append(target)
+        elif content is not None and content.count(search) == 1:
+            files[target] = content.replace(search, replace, 1)
+            applied.append(target)
+        elif content is not None and (patched := _replace_lines(content, search, replace)) is not None:
+            files[target] = patched
+            applied.append(target)
+        else:
+            failed.append(name)
+    return files, applied, failed
+
+
+def affected_files(files, issues):
+    """Files named in the review's issues, or every file when none is named."""
+    text = "\n".join(str(issue) for issue in issues)
+    named = [name for name in files if name and (name in text or os.path.basename(name) in text)]
+    return named or [name for name in files if name]
+
+
+def _rank(evaluation):
+    """Higher is better: passing ("ok") first, then fewer issues."""
+    return (evaluation.get("status") == "ok", -len(evaluation.get("issues") or []))
+
+
+def repair_code(generated_code, evaluation, framework=DEFAULT_FRAMEWORK, max_iterations=MAX_REPAIR_ITERATIONS):
+    """
+    Repair Agent: feeds the reviewer's issues back to the LLM, which answers with
+    SEARCH/REPLACE patches for the affected files only. Patches are applied
+    locally and the result is reviewed again, until the review passes, the
+    iteration cap is hit, a round makes no progress or a review errors out.
+    Returns the best code seen with its review, every attempt and the stop reason.
+    """
+    best_code, best_evaluation = generated_code, evaluation
+    attempts = []
+    stop_reason = "passed" if evaluation.get("status") == "ok" else "max_iterations"
+
+    for iteration in range(1, max_iterations + 1):
+        if best_evaluation.get("status") == "ok":
+            stop_reason = "passed"
+            break
+        if best_evaluation.get("status") == "error":
+            stop_reason = "review_error"
+            break
+
+        files = split_files(best_code)
+        targets = affected_files(files, best_evaluation.get("issues") or [])
+        print(f"🩹 Repair Agent: round {iteration}, patching {', '.join(targets)}")
+        prompt = render_prompt(
+            "repair",
+            framework=framework_label(framework),
+            issues="\n".join(f"- {issue}" for issue in best_evaluation.get("issues") or [best_evaluation.get("overall_feedback")]),
+            files="".join(f"**{name}**\n{files[name]}\n" for name in targets),
+        )
+
+        with usage_scope() as usage:
+            patches = parse_patches(complete(prompt))
+            patched, applied, failed = apply_patches(files, patches)
+            attempt = {
+                "iteration": iteration,
+                "files": targets,
+                "patches_applied": len(applied),
+                "patches_failed": len(failed),
+            }
+            if not applied:
+                attempt.update(status=best_evaluation.get("status"), issues=len(best_evaluation.get("issues") or []))
+                attempt["completion_tokens"] = usage["completion_tokens"]
+                attempts.append(attempt)
+                stop_reason = "no_patch"
+                break
+
+            code = join_files(patched)
+            review = review_code(code)
+        attempt.update(status=review["status"], issues=len(review["issues"]), completion_tokens=usage["completion_tokens"])
+        attempts.append(attempt)
+
+        if review["status"] == "error":
+            # The reviewer failed, so this round proves nothing: keep the previous version
+            print(f"🩹 Repair Agent: review failed — {review['overall_feedback']}")
+            stop_reason = "review_error"
+            break
+        if _rank(review) <= _rank(best_evaluation):
+            print("🩹 Repair Agent: no progress — keeping the previous version")
+            stop_reason = "no_progress"
+            break
+        best_code, best_evaluation = code, review
+    else:
+        if best_evaluation.get("status") == "ok":
+            stop_reason = "passed"
+
+    print(f"✅ Repair Agent finished: {stop_reason} after {len(attempts)} round(s)")
+    return {
+        "code": best_code,
+        "evaluation": best_evaluation,
+        "attempts": attempts,
+        "repaired": best_code != generated_code,
+        "stop_reason": stop_reason,
+    }
@@ -0,0 +1,346 @@
+"""
+Key/value state shared by every worker process of a deployment.
+
+Caches, rate-limit windows and in-flight leases only work across uvicorn
+workers (or pods) when they live outside the process. DREAMFORGE_SHARED_STATE
+picks the backend:
+
+    (unset)                             LocalState: this process only
+    sqlite:////var/dreamforge/state.db  SQLiteState: WAL database, every worker on one host
+    redis://[:password@]host:6379/0     RedisState: any Redis-protocol server (see orchestrator/resp_server.py)
+
+All backends store bytes under string keys with an optional TTL and support
+`add` (set only if missing, for leases) and `incr` (counters). Errors surface
+as SharedStateError; callers treat shared state as an optimization and keep
+working without it.
+"""
+import os
+import select
+import socket
+import sqlite3
+import threading
+import time
+from urllib.parse import unquote, urlparse
+
+# Shared-state calls that take longer than this fail instead of stalling a request
+SOCKET_TIMEOUT = float(os.getenv("DREAMFORGE_SHARED_STATE_TIMEOUT", "2.0"))
+
+
+class SharedStateError(Exception):
+    """The shared-state backend could not serve a call."""
+
+
+def _to_bytes(value):
+    if isinstance(value, bytes):
+        return value
+    return str(value).encode("utf-8")
+
+
+class LocalState:
+    """In-process dict with expiry; the default when nothing is shared."""
+
+    name = "local"
+    shared = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items = {}  # key -> (value, expires_at or None)
+
+    def _live(self, key, now):
+        item = self._items.get(key)
+        if item is not None and item[1] is not None and item[1] <= now:
+            del self._items[key]
+            return None
+        return item
+
+    def get(self, key):
+        with self._lock:
+            item = self._live(key, time.time())
+            return item[0] if item else None
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._items[key] = (_to_bytes(value), time.time() + ttl if ttl else None)
+
+    def add(self, key, value, ttl=None):
+        now = time.time()
+        with self._lock:
+            if self._live(key, now) is not None:
+                return False
+            self._items[key] = (_to_bytes(value), now + ttl if ttl else None)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def incr(self, key, amount=1, ttl=None):
+        now = time.time()
+        with self._lock:
+            item = self._live(key, now)
+            value = int(item[0]) + amount if item else amount
+            expires_at = item[1] if item else (now + ttl if ttl else None)
+            self._items[key] = (str(value).encode("ascii"), expires_at)
+            return value
+
+    def close(self):
+        pass
+
+
+class SQLiteState:
+    """
+    One WAL-mode SQLite file shared by every worker on the host.
+    Writers take the database lock briefly (BEGIN IMMEDIATE); readers never block.
+    """
+
+    name = "sqlite"
+    shared = True
+    PURGE_EVERY = 500  # writes between sweeps of expired rows
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS shared_state (
+        key        TEXT PRIMARY KEY,
+        value      BLOB NOT NULL,
+        expires_at REAL
+    );
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, timeout=SOCKET_TIMEOUT, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+
+    def _write(self, action):
+        """Runs action(conn, now) in an immediate transaction."""
+        try:
+            with self._lock:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    now = time.time()
+                    result = action(self._conn, now)
+                    self._writes += 1
+                    if self._writes % self.PURGE_EVERY == 0:
+                        self._conn.execute("DELETE FROM shared_state WHERE expires_at <= ?", (now,))
+                    self._conn.execute("COMMIT")
+                    return result
+                except BaseException:
+                    self._conn.execute("ROLLBACK")
+                    raise
+        except sqlite3.Error as e:
+            raise SharedStateError(f"sqlite: {e}") from e
+
+    def get(self, key):
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT value FROM shared_state WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                    (key, time.time()),
+                ).fetchone()
+        except sqlite3.Error as e:
+            raise SharedStateError(f"sqlite: {e}") from e
+        return bytes(row[0]) if row else None
+
+    def set(self, key, value, ttl=None):
+        def action(conn, now):
+            conn.execute("INSERT OR REPLACE INTO shared_state (key, value, expires_at) VALUES (?, ?, ?)",
+                         (key, _to_bytes(value), now + ttl if ttl else None))
+        self._write(action)
+
+    def add(self, key, value, ttl=None):
+        def action(conn, now):
+            conn.execute("DELETE FROM shared_state WHERE key = ? AND expires_at <= ?", (key, now))
+            cursor = conn.execute("INSERT OR IGNORE INTO shared_state (key, value, expires_at) VALUES (?, ?, ?)",
+                                  (key, _to_bytes(value), now + ttl if ttl else None))
+            return cursor.rowcount == 1
+        return self._write(action)
+
+    def delete(self, key):
+        self._write(lambda conn, now: conn.execute("DELETE FROM shared_state WHERE key = ?", (key,)))
+
+    def incr(self, key, amount=1, ttl=None):
+        def action(conn, now):
+            row = conn.execute(
+                "SELECT value, expires_at FROM shared_state WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, now),
+            ).fetchone()
+            value = int(bytes(row[0])) + amount if row else amount
+            expires_at = row[1] if row else (now + ttl if ttl else None)
+            conn.execute("INSERT OR REPLACE INTO shared_state (key, value, expires_at) VALUES (?, ?, ?)",
+                         (key, str(value).encode("ascii"), expires_at))
+            return value
+        return self._write(action)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class RedisState:
+    """
+    Minimal RESP2 client (GET/SET/DEL/INCRBY/PEXPIRE) with one connection per thread.
+    Works against Redis, Valkey, KeyDB or the stand-in in orchestrator/resp_server.py.
+    """
+
+    name = "redis"
+    shared = True
+
+    def __init__(self, host="127.0.0.1", port=6379, db=0, password=None, prefix="dreamforge:"):
+        self.host, self.port, self.db, self.password = host, port, db, password
+        self.prefix = prefix
+        self._local = threading.local()
+
+    @classmethod
+    def from_url(cls, url):
+        parsed = urlparse(url)
+        db = (parsed.path or "/0").lstrip("/") or "0"
+        return cls(parsed.hostname or "127.0.0.1", parsed.port or 6379, int(db),
+                   unquote(parsed.password) if parsed.password else None)
+
+    # ------------------------------------------------------------------
+    # Protocol
+    # ------------------------------------------------------------------
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=SOCKET_TIMEOUT)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local.sock, self._local.reader = sock, sock.makefile("rb")
+        if self.password:
+            self._roundtrip("AUTH", self.password)
+        if self.db:
+            self._roundtrip("SELECT", self.db)
+
+    def _read_reply(self):
+        reader = self._local.reader
+        line = reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("connection closed")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode("utf-8")
+        if kind == b"-":
+            raise SharedStateError(f"redis: {rest.decode('utf-8', errors='replace')}")
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(rest)
+            return None if length < 0 else [self._read_reply() for _ in range(length)]
+        raise SharedStateError(f"redis: unexpected reply {line[:40]!r}")
+
+    def _send(self, *args):
+        parts = [_to_bytes(arg) for arg in args]
+        request = b"".join([f"*{len(parts)}\r\n".encode("ascii")] +
+                           [f"${len(part)}\r\n".encode("ascii") + part + b"\r\n" for part in parts])
+        self._local.sock.sendall(request)
+
+    def _roundtrip(self, *args):
+        self._send(*args)
+        return self._read_reply()
+
+    def _stale(self):
+        """Whether the idle pooled connection was closed by the server (EOF or reset waiting to be read)."""
+        try:
+            readable, _, _ = select.select([self._local.sock], [], [], 0)
+        except (OSError, ValueError):
+            return True
+        return bool(readable)  # nothing else is ever sent unprompted on a plain RESP connection
+
+    def _command(self, *args, idempotent=True):
+        """
+        Sends one command, reconnecting once if the pooled connection went stale.
+        A non-idempotent command (INCRBY, SET NX) is only retried when it cannot
+        have reached the server: once it is sent, a timeout or a dropped
+        connection may hide a command that was applied, and re-sending it would
+        count twice. Its pooled connection is checked before sending instead.
+        """
+        for attempt in (1, 2):
+            sent = False
+            try:
+                if getattr(self._local, "sock", None) is None:
+                    self._connect()
+                elif not idempotent and self._stale():
+                    self._drop()
+                    self._connect()
+                self._send(*args)
+                sent = True
+                return self._read_reply()
+            except (OSError, ConnectionError) as e:
+                self._drop()
+                if attempt == 2 or (sent and not idempotent):
+                    raise SharedStateError(f"redis {self.host}:{self.port}: {e}") from e
+
+    def _drop(self):
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = self._local.reader = None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    # ------------------------------------------------------------------
+    # State API
+    # ------------------------------------------------------------------
+
+    def get(self, key):
+        return self._command("GET", self.prefix + key)
+
+    def set(self, key, value, ttl=None):
+        args = ["SET", self.prefix + key, value]
+        if ttl:
+            args += ["PX", int(ttl * 1000)]
+        self._command(*args)
+
+    def add(self, key, value, ttl=None):
+        args = ["SET", self.prefix + key, value, "NX"]
+        if ttl:
+            args += ["PX", int(ttl * 1000)]
+        return self._command(*args, idempotent=False) == "OK"
+
+    def delete(self, key):
+        self._command("DEL", self.prefix + key)
+
+    def incr(self, key, amount=1, ttl=None):
+        value = self._command("INCRBY", self.prefix + key, amount, idempotent=False)
+        if ttl and value == amount:
+            self._command("PEXPIRE", self.prefix + key, int(ttl * 1000))  # first increment opens the window
+        return value
+
+    def close(self):
+        self._drop()
+
+
+def open_shared_state(url=None):
+    """Backend for a DREAMFORGE_SHARED_STATE-style URL (LocalState when empty)."""
+    url = (url or "").strip()
+    if not url:
+        return LocalState()
+    if url.startswith("sqlite:///"):
+        return SQLiteState(url[len("sqlite:///"):])  # sqlite:///relative.db, sqlite:////absolute.db
+    if url.startswith(("redis://", "resp://")):
+        return RedisState.from_url(url)
+    raise ValueError(f"❌ Unsupported DREAMFORGE_SHARED_STATE: {url}")
+
+
+_shared_state = None
+_shared_state_lock = threading.Lock()
+
+
+def get_shared_state():
+    global _shared_state
+    with _shared_state_lock:
+        if _shared_state is None:
+            _shared_state = open_shared_state(os.getenv("DREAMFORGE_SHARED_STATE"))
+            print(f"🔗 Shared state: {_shared_state.name}")
+        return _shared_state
@@ -0,0 +1,270 @@
+"""
+Lightweight request tracing for the agent pipeline.
+
+A span is one timed unit of work (an HTTP request, a pipeline stage, an LLM
+call). The current span lives in a ContextVar, so it follows asyncio tasks and
+`asyncio.to_thread` calls: spans opened inside a stage automatically become its
+children and share its trace id. A background thread appends finished spans to
+a rotating local JSONL file; `python orchestrator/trace_report.py` renders the
+slowest traces.
+"""
+import atexit
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# ✅ Where spans are written (override with DREAMFORGE_TRACE_DIR, disable with DREAMFORGE_TRACING=0)
+TRACE_DIR = os.getenv(
+    "DREAMFORGE_TRACE_DIR",
+    os.path.join(
+        os.getenv("DREAMFORGE_DATA_DIR", os.path.abspath(os.path.join(os.path.dirname(__file__), "../../backend/data"))),
+        "traces",
+    ),
+)
+TRACE_FILE = os.path.join(TRACE_DIR, "spans.jsonl")
+TRACING_ENABLED = os.getenv("DREAMFORGE_TRACING", "1") != "0"
+
+_current_span = ContextVar("dreamforge_current_span", default=None)
+
+
+def new_trace_id():
+    return secrets.token_hex(16)
+
+
+def new_span_id():
+    return secrets.token_hex(8)
+
+
+class Span:
+    """One timed operation; attributes are free-form JSON-serializable values."""
+
+    def __init__(self, name, trace_id=None, parent_id=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id or new_trace_id()
+        self.span_id = new_span_id()
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self.duration = None
+        self.status = "ok"
+        self.error = None
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def add(self, key, amount=1):
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def end(self, error=None):
+        """Closes the span (idempotent) and hands it to the exporter."""
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._started
+        if error is not None:
+            # Cancellation is a BaseException on purpose; it is not a failure of the span's work
+            self.status = "error" if isinstance(error, Exception) else "cancelled"
+            self.error = f"{type(error).__name__}: {error}"
+        get_exporter().export(self)
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration": self.duration,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+def current_span():
+    return _current_span.get()
+
+
+def start_span(name, parent=None, trace_id=None, parent_id=None, **attributes):
+    """
+    Starts a span without making it current; call `span.end()` when done.
+    Use it where a `with span(...)` block would have to stay open across yields
+    (async generators), and pass the span as `parent` to the work it covers.
+    """
+    parent = parent if parent is not None else _current_span.get()
+    if parent is not None and trace_id is None:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+    return Span(name, trace_id=trace_id, parent_id=parent_id, attributes=attributes)
+
+
+@contextmanager
+def span(name, parent=None, **attributes):
+    """Times the block as a child of `parent` (default: the current span)."""
+    current = start_span(name, parent=parent, **attributes)
+    reset = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.end(e)
+        raise
+    else:
+        current.end()
+    finally:
+        _current_span.reset(reset)
+
+
+def parse_traceparent(header):
+    """(trace_id, parent_span_id) from a W3C traceparent header, or (None, None)."""
+    parts = (header or "").strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None, None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None, None
+    if set(parts[1]) == {"0"} or set(parts[2]) == {"0"}:
+        return None, None
+    return parts[1], parts[2]
+
+
+# -------------------------------------------------------------------
+# ------------------------ EXPORTER ---------------------------------
+# -------------------------------------------------------------------
+
+class JsonlExporter:
+    """
+    Appends finished spans as JSON lines and rotates the file by size:
+    spans.jsonl → spans.jsonl.1 → ... → spans.jsonl.<backups> (oldest dropped).
+    `export` only queues the line; one background thread does the file I/O, so
+    ending a span never blocks the event loop. Queued spans are written on
+    `flush()`/`close()` (registered with atexit); when the queue is full, new
+    spans are dropped rather than slowing requests down.
+    """
+
+    def __init__(self, path=TRACE_FILE, max_bytes=10 * 1024 * 1024, backups=3, max_queue=10000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._writer = None
+        self._closed = False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def _rotate(self):
+        for index in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def export(self, finished):
+        # Serialized now: the span's attributes may still be mutated by its owner
+        line = json.dumps(finished.to_dict(), default=str, separators=(",", ":")) + "\n"
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(line)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout=5.0):
+        """Blocks until every span queued so far is on disk (or the timeout passes)."""
+        if self._writer is None:
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        """Flushes and stops the writer thread; later spans are dropped."""
+        self.flush(timeout)
+        with self._lock:
+            self._closed = True
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            self._queue.put(None)
+            writer.join(timeout)
+
+    def _ensure_writer(self):
+        if self._writer is not None or self._closed:
+            return
+        with self._lock:
+            if self._writer is None and not self._closed:
+                self._writer = threading.Thread(target=self._write_loop, name="dreamforge-trace-writer", daemon=True)
+                self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            lines = [item for item in batch if isinstance(item, str)]
+            if lines:
+                self._write(lines)
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+            if None in batch:
+                return
+
+    def _write(self, lines):
+        try:
+            size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+            f = open(self.path, "a", encoding="utf-8")
+            try:
+                for line in lines:
+                    if size and size + len(line) > self.max_bytes:
+                        f.close()
+                        self._rotate()
+                        f = open(self.path, "a", encoding="utf-8")
+                        size = 0
+                    f.write(line)
+                    size += len(line)
+            finally:
+                f.close()
+        except OSError as e:
+            # Tracing must never break a request
+            print("⚠️ Could not export spans:", e)
+
+
+class _NullExporter:
+    def export(self, finished):
+        pass
+
+    def flush(self, timeout=5.0):
+        return True
+
+    def close(self, timeout=5.0):
+        pass
+
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def get_exporter():
+    """Process-wide span exporter (a no-op when DREAMFORGE_TRACING=0)."""
+    global _exporter
+    with _exporter_lock:
+        if _exporter is None:
+            _exporter = JsonlExporter(
+                max_bytes=int(os.getenv("DREAMFORGE_TRACE_MAX_BYTES", str(10 * 1024 * 1024))),
+                backups=int(os.getenv("DREAMFORGE_TRACE_BACKUPS", "3")),
+            ) if TRACING_ENABLED else _NullExporter()
+            atexit.register(_exporter.close)
+        return _exporter
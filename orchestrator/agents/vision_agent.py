@@ -1,21 +1,14 @@
-import os
-from dotenv import load_dotenv
-
-# ✅ Import Groq with fallback for old versions
-from groq import Groq
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-
-
-
-# ✅ Load API key from .env
-load_dotenv()
-api_key = os.getenv("GROQ_API_KEY")
-
-if not api_key:
-    raise ValueError("❌ GROQ_API_KEY is missing! Add it to your .env file in project root.")
-
-# ✅ Initialize Groq client
-client = Groq(api_key=api_key)
+# ✅ Shared LLM client (works as `agents.llm` or top-level `llm`)
+try:
+    from .llm import complete
+    from .prompts import render_prompt
+except ImportError:
+    from llm import complete
+    from prompts import render_prompt
+
+# Layout returned when the LLM call fails; the result also carries "error" so callers
+# that cache stage outputs can tell it apart from a real answer
+FALLBACK_LAYOUT = "fallback layout (error during LLM processing)"
 
 def process_input(input_type, input_data):
     """
@@ -24,30 +17,10 @@ def process_input(input_type, input_data):
     print("🎤 Vision Agent: Processing", input_type)
     print("🧠 Understanding input via Groq LLM...")
 
-    prompt = f"""
-    You are a UI/UX layout designer AI.
-    Convert this {input_type} description into a structured JSON layout
-    describing key UI components, pages, and data requirements.
-
-    Input:
-    {input_data}
-
-    Output format example:
-    {{
-      "layout": "dashboard with charts and sidebar",
-      "components": ["header", "chart", "sidebar", "footer"],
-      "data_elements": ["user input", "statistics"]
-    }}
-    """
+    prompt = render_prompt("vision", input_type=input_type, input_data=input_data)
 
     try:
-        completion = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.5,
-        )
-
-        response = completion.choices[0].message.content.strip()
+        response = complete(prompt).strip()
         print("✅ Vision Agent completed successfully!")
         print(response)
 
@@ -56,4 +29,4 @@ def process_input(input_type, input_data):
 
     except Exception as e:
         print("❌ Vision Agent failed:", e)
-        return {"layout": "fallback layout (error during LLM processing)"}
+        return {"layout": FALLBACK_LAYOUT, "error": str(e)}
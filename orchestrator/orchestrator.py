@@ -1,37 +1,334 @@
 # orchestrator.py
-from agents.code_agent import generate_code
-from vision.layout_extractor import extract_layout
+"""
+Runs the multi-agent pipeline from the command line.
+
+    python orchestrator.py                                   # the built-in demo prompt
+    python orchestrator.py --bulk prompts.jsonl --out runs --concurrency 4
+
+Bulk mode reads one JSON object per line, e.g.
+    {"id": "todo", "input_type": "voice", "input_data": "A todo app", "framework": "vue"}
+("id", "input_type" and "framework" are optional) and writes every item to its own
+folder under --out. Finished stages and items are checkpointed there, so re-running
+the same command after a crash or Ctrl-C resumes without repeating LLM calls.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
 import os
+import re
+import sys
+import time
 
-def run_orchestrator(input_type, input_data):
-    print("🚀 Orchestrator: Multi-Agent System Running")
+from agents.vision_agent import process_input
+from agents.code_agent import DEFAULT_FRAMEWORK, generate_code
+from agents.code_files import python_entrypoint
+from agents.evaluator_agent import parse_review, validate_code
+from agents.llm import CancelToken, cancellation_scope, usage_scope
+from agents.prompts import prompt_fingerprint
+from agents.tracing import span
+from pipeline import JsonFileMemo, Node, Pipeline
+from sandbox import SandboxUnavailable, get_sandbox_pool
 
-    # Vision Agent
-    print("🎤 Vision Agent: Processing", input_type)
-    layout = extract_layout(input_type, input_data)
-    print(f"✅ Vision Agent completed. Layout: {layout}")
 
-    # Code Agent
-    print("⚙️ Code Agent: Generating code...")
-    code = generate_code(layout)
+def extract_layout(input_type, input_data):
+    """Vision stage: layout text for the Code Agent. Fails on the fallback layout, so it is never checkpointed."""
+    result = process_input(input_type, input_data)
+    if isinstance(result, dict) and result.get("error"):
+        raise RuntimeError(f"Vision Agent failed: {result['error']}")
+    return result.get("layout") if isinstance(result, dict) else result
 
-    # Save generated code to a file
+
+def save_code(code):
+    """Save generated code to a file"""
+    if not code:
+        raise RuntimeError("Code Agent returned no code")
     output_path = os.path.join(os.getcwd(), "generated_app.py")
     with open(output_path, "w", encoding="utf-8") as f:
         f.write(code)
 
     print(f"💾 Code saved to {output_path}")
+    return output_path
+
 
-    # Optional: Auto-run the generated app (if it’s executable)
+def run_app(code):
+    """Optional: Smoke-run the generated app in a pre-warmed sandbox worker"""
+    source = python_entrypoint(code)
+    if source is None:
+        print("⏭️ No Python file to run (frontend-only output)")
+        return None
     try:
-        print("▶️ Running generated app...\n")
-        os.system(f"python {output_path}")
+        print("▶️ Running generated app in sandbox...\n")
+        result = get_sandbox_pool().run(source)
+        if result.stdout:
+            print(result.stdout)
+        if result.stderr:
+            print(result.stderr)
+        if result.timed_out:
+            print(f"⏱️ App still running after {result.duration:.1f}s — stopped (servers never exit on their own)")
+        else:
+            print(f"🏁 App exited with status {result.exit_code} in {result.duration * 1000:.0f} ms")
+        return result.to_dict()
+    except SandboxUnavailable as e:
+        print(f"🛑 Not running generated app: {e}")
     except Exception as e:
         print(f"⚠️ Could not run app automatically: {e}")
 
-    print("🎉 Orchestrator finished successfully!")
+
+def build_pipeline():
+    return Pipeline([
+        Node("layout", extract_layout, inputs=("input_type", "input_data"), version=prompt_fingerprint("vision")),
+        # The "saved" node writes generated_app.py; the Code Agent must not write it too
+        Node("code", generate_code, inputs=("layout",), params={"save": False}, version=prompt_fingerprint("code")),
+        Node("saved", save_code, inputs=("code",), memoize=False),
+        Node("run", run_app, inputs=("code",), memoize=False),
+    ])
+
+
+def print_progress(event, name, value):
+    if event == "started":
+        print(f"⏳ {name}...")
+    elif event == "completed" and name == "layout":
+        print(f"✅ Vision Agent completed. Layout: {value}")
+    elif event == "failed":
+        print(f"❌ {name} failed: {value}")
+
+
+def run_orchestrator(input_type, input_data):
+    print("🚀 Orchestrator: Multi-Agent System Running")
+
+    with span("cli.orchestrate", input_type=input_type):
+        run = asyncio.run(build_pipeline().run(
+            {"input_type": input_type, "input_data": input_data},
+            node_scope=lambda name: span(f"stage.{name}", cache_hit=False),
+            on_event=print_progress,
+        ))
+
+    if run.ok:
+        print("🎉 Orchestrator finished successfully!")
+    return run.results.get("code")
+
+
+# -------------------------------------------------------------------
+# ------------------------- BULK MODE -------------------------------
+# -------------------------------------------------------------------
+
+CHECKPOINT_FILE = "checkpoint.jsonl"
+LOG_FILE = "bulk.log"
+
+
+def load_bulk_items(path, default_framework=DEFAULT_FRAMEWORK):
+    """Prompts from a JSONL file, with defaults filled in and unique ids."""
+    items = []
+    seen = set()
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if not entry.get("input_data"):
+                raise ValueError(f"{path}:{line_number}: missing input_data")
+            item = {
+                "id": str(entry.get("id") or f"item-{line_number:04d}"),
+                "input_type": entry.get("input_type", "text"),
+                "input_data": entry["input_data"],
+                "framework": entry.get("framework") or default_framework,
+            }
+            if item["id"] in seen:
+                raise ValueError(f"{path}:{line_number}: duplicate id {item['id']!r}")
+            seen.add(item["id"])
+            items.append(item)
+    return items
+
+
+def item_dir(out_dir, item_id):
+    return os.path.join(out_dir, re.sub(r"[^A-Za-z0-9._-]+", "_", item_id))
+
+
+def load_checkpoint(out_dir):
+    """Ids of items that already finished in an earlier run."""
+    done = set()
+    path = os.path.join(out_dir, CHECKPOINT_FILE)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    done.add(json.loads(line)["id"])
+                except (json.JSONDecodeError, KeyError):
+                    pass  # torn last line after a hard crash
+    return done
+
+
+def append_checkpoint(out_dir, record):
+    with open(os.path.join(out_dir, CHECKPOINT_FILE), "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def bulk_code(layout, framework):
+    """
+    Code stage that fails instead of returning None, so a failure is never checkpointed.
+    Items run concurrently: each one's code is written to its own folder only (write_item_outputs).
+    """
+    code = generate_code(layout, framework, save=False)
+    if not code:
+        raise RuntimeError("Code Agent returned no code")
     return code
 
 
+def bulk_evaluate(code):
+    result = parse_review(validate_code(code))
+    if result["status"] == "error":
+        raise RuntimeError(f"Evaluator Agent failed: {result['overall_feedback']}")
+    return result
+
+
+def build_bulk_pipeline(directory, evaluate=True):
+    """Vision → Code (→ Evaluation) with stage outputs memoized on disk under `directory`."""
+    nodes = [
+        Node("layout", extract_layout, inputs=("input_type", "input_data"), version=prompt_fingerprint("vision")),
+        Node("code", bulk_code, inputs=("layout", "framework"), version=prompt_fingerprint("code")),
+    ]
+    if evaluate:
+        nodes.append(Node("evaluation", bulk_evaluate, inputs=("code",), version=prompt_fingerprint("evaluate")))
+    return Pipeline(nodes, memo=JsonFileMemo(os.path.join(directory, "stages")))
+
+
+def write_item_outputs(directory, item, run, seconds, usage):
+    """layout.txt, generated_app.py, evaluation.json and result.json for one item."""
+    outputs = {"layout": "layout.txt", "code": "generated_app.py"}
+    for name, filename in outputs.items():
+        if name in run.results:
+            with open(os.path.join(directory, filename), "w", encoding="utf-8") as f:
+                f.write(str(run.results[name]))
+    if "evaluation" in run.results:
+        with open(os.path.join(directory, "evaluation.json"), "w", encoding="utf-8") as f:
+            json.dump(run.results["evaluation"], f, indent=2, ensure_ascii=False)
+
+    result = {
+        **item,
+        "status": "ok" if run.ok else "failed",
+        "errors": {name: str(error) for name, error in run.errors.items()},
+        "seconds": round(seconds, 2),
+        "stage_seconds": {name: round(value, 2) for name, value in run.timings.items()},
+        "resumed_stages": sorted(run.memo_hits),
+        "usage": usage,
+    }
+    with open(os.path.join(directory, "result.json"), "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    return result
+
+
+class BulkProgress:
+    """Per-item progress lines with throughput and ETA for this session."""
+
+    def __init__(self, total, already_done, stream):
+        self.total = total
+        self.done = already_done
+        self.failed = 0
+        self.running = 0
+        self.finished_now = 0
+        self.tokens = 0
+        self.started = time.perf_counter()
+        self.stream = stream
+
+    def report(self, item_id, status, seconds, tokens):
+        self.running -= 1
+        self.finished_now += 1
+        self.tokens += tokens
+        if status == "ok":
+            self.done += 1
+        else:
+            self.failed += 1
+
+        elapsed = time.perf_counter() - self.started
+        rate = self.finished_now / elapsed if elapsed else 0.0
+        remaining = self.total - self.done - self.failed
+        eta = f"{remaining / rate:.0f}s" if rate and remaining else "-"
+        icon = "✅" if status == "ok" else "❌"
+        print(
+            f"[{self.done + self.failed:>{len(str(self.total))}}/{self.total}] {icon} {item_id} in {seconds:.1f}s"
+            f" · {rate * 60:.1f} items/min · {self.tokens / elapsed:.0f} tokens/s"
+            f" · {self.running} running · {self.failed} failed · ETA {eta}",
+            file=self.stream, flush=True,
+        )
+
+
+async def run_bulk_item(item, out_dir, evaluate, semaphore, progress):
+    async with semaphore:
+        directory = item_dir(out_dir, item["id"])
+        os.makedirs(directory, exist_ok=True)
+        progress.running += 1
+        started = time.perf_counter()
+        with span("cli.bulk_item", item_id=item["id"]), usage_scope() as usage:
+            run = await build_bulk_pipeline(directory, evaluate).run(
+                {key: item[key] for key in ("input_type", "input_data", "framework")},
+                node_scope=lambda name: span(f"stage.{name}", cache_hit=False),
+            )
+        seconds = time.perf_counter() - started
+        result = write_item_outputs(directory, item, run, seconds, usage)
+        if run.ok:
+            append_checkpoint(out_dir, {"id": item["id"], "seconds": result["seconds"], "usage": usage})
+        progress.report(item["id"], result["status"], seconds, usage["total_tokens"])
+        return result
+
+
+async def run_bulk(path, out_dir, concurrency=4, framework=DEFAULT_FRAMEWORK, evaluate=True):
+    """Runs every not-yet-checkpointed item of `path`, at most `concurrency` at a time."""
+    items = load_bulk_items(path, framework)
+    os.makedirs(out_dir, exist_ok=True)
+    done = load_checkpoint(out_dir)
+    pending = [item for item in items if item["id"] not in done]
+
+    stream = sys.stdout
+    print(f"🚀 Bulk run: {len(items)} items, {len(items) - len(pending)} already done, "
+          f"{len(pending)} to go (concurrency {concurrency})", file=stream)
+    print(f"📝 Agent output goes to {os.path.join(out_dir, LOG_FILE)}", file=stream)
+
+    progress = BulkProgress(len(items), len(items) - len(pending), stream)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    token = CancelToken()
+    with open(os.path.join(out_dir, LOG_FILE), "a", encoding="utf-8") as log, \
+            contextlib.redirect_stdout(log), cancellation_scope(token):
+        try:
+            results = await asyncio.gather(
+                *(run_bulk_item(item, out_dir, evaluate, semaphore, progress) for item in pending)
+            )
+        except BaseException as e:
+            # Stop the LLM calls still streaming; finished items and stages are already on disk
+            token.cancel("bulk run interrupted")
+            if isinstance(e, (asyncio.CancelledError, KeyboardInterrupt)):
+                print(f"⏸️ Interrupted — {progress.done}/{len(items)} items done. "
+                      f"Run the same command again to resume.", file=stream)
+            raise
+
+    elapsed = time.perf_counter() - progress.started
+    failed = [result["id"] for result in results if result["status"] != "ok"]
+    print(f"🎉 Bulk run finished: {progress.done}/{len(items)} done in {elapsed:.1f}s "
+          f"({progress.tokens} tokens)", file=stream)
+    if failed:
+        print(f"❌ Failed: {', '.join(failed)} — re-run to retry them (finished stages are reused)", file=stream)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DreamForge multi-agent orchestrator")
+    parser.add_argument("--bulk", metavar="JSONL", help="run every prompt in a JSONL file")
+    parser.add_argument("--out", default="bulk_output", help="bulk output folder (also holds the checkpoint)")
+    parser.add_argument("--concurrency", type=int, default=4, help="items processed at the same time")
+    parser.add_argument("--framework", default=DEFAULT_FRAMEWORK, help="framework for items that do not set one")
+    parser.add_argument("--no-evaluate", action="store_true", help="skip the Evaluator Agent")
+    args = parser.parse_args()
+
+    if not args.bulk:
+        run_orchestrator("voice", "Create a mood tracker with emojis and notes.")
+        return
+    try:
+        asyncio.run(run_bulk(args.bulk, args.out, args.concurrency, args.framework, not args.no_evaluate))
+    except KeyboardInterrupt:
+        sys.exit(130)
+
+
 if __name__ == "__main__":
-    run_orchestrator("voice", "Create a mood tracker with emojis and notes.")
+    main()
@@ -0,0 +1,342 @@
+"""
+Small DAG executor shared by the API routes and the CLI orchestrator.
+
+Stages are `Node`s with declared inputs. A node starts as soon as all of its
+inputs are available, so independent nodes run concurrently, and each node's
+output is memoized by a hash of its inputs so unchanged stages are skipped
+when a pipeline is re-run. With a SharedMemo the outputs are shared between
+worker processes, and a stage already running elsewhere is awaited instead of
+computed twice.
+"""
+import asyncio
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+
+
+def stable_hash(value):
+    """sha256 of a canonical JSON rendering (Pydantic models are dumped first)."""
+    def default(obj):
+        if hasattr(obj, "model_dump"):
+            return obj.model_dump()
+        if isinstance(obj, (set, frozenset)):
+            return sorted(obj)
+        return repr(obj)
+
+    payload = json.dumps(value, sort_keys=True, separators=(",", ":"), default=default)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class Node:
+    """
+    One pipeline stage.
+    `inputs` name other nodes or run inputs, either as a list of names or as an
+    {argument: source} mapping; they become keyword arguments of `func` together
+    with the static `params`. Bump `version` when the stage logic changes.
+    `key` optionally maps the arguments to what the memo key is built from
+    (e.g. a canonical hash), for stages that only depend on part of an input.
+    """
+
+    def __init__(self, name, func, inputs=(), params=None, memoize=True, version="1", key=None):
+        self.name = name
+        self.func = func
+        self.inputs = dict(inputs) if isinstance(inputs, dict) else {source: source for source in inputs}
+        self.params = dict(params or {})
+        self.memoize = memoize
+        self.version = version
+        self.key = key
+
+    def cache_key(self, args):
+        # Keyed by the stage function rather than the node name, so the same stage
+        # with the same inputs is shared across differently shaped pipelines
+        stage = f"{getattr(self.func, '__module__', '')}.{getattr(self.func, '__qualname__', self.name)}"
+        keyed = self.key(args) if self.key is not None else args
+        return stable_hash({"stage": stage, "version": self.version, "params": self.params, "args": keyed})
+
+    async def call(self, args):
+        kwargs = {**args, **self.params}
+        if inspect.iscoroutinefunction(self.func):
+            return await self.func(**kwargs)
+        return await asyncio.to_thread(self.func, **kwargs)
+
+
+class MemoCache:
+    """Thread-safe LRU of node outputs keyed by Node.cache_key."""
+
+    # Whether get/put may wait on I/O (Pipeline.run then calls them off the event loop)
+    blocking = False
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return False, None
+            self._entries.move_to_end(key)
+            return True, self._entries[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class SharedMemo(MemoCache):
+    """
+    MemoCache backed by a shared_state backend, so every worker process reuses
+    the stage outputs of the others. A local LRU answers repeat hits without a
+    round trip. `claim`/`release` hand out per-key leases that Pipeline.run uses
+    to compute a stage once while concurrent runs wait for its output.
+    Values are pickled: only point it at a store this deployment owns.
+    Shared-state errors degrade to a local-only memo instead of failing stages.
+    """
+
+    def __init__(self, state, max_entries=256, ttl=24 * 3600, lease_seconds=120.0, namespace="memo:"):
+        super().__init__(max_entries=max_entries)
+        self.state = state
+        self.ttl = ttl
+        self.lease_seconds = lease_seconds
+        self.namespace = namespace
+        self.owner = f"{os.getpid()}:{id(self)}".encode("ascii")
+        self.stats = {"local_hits": 0, "shared_hits": 0, "misses": 0, "dedup_waits": 0, "errors": 0}
+
+    @property
+    def blocking(self):
+        return self.state.shared
+
+    def _failed(self, action, error):
+        self.stats["errors"] += 1
+        print(f"⚠️ Shared memo {action} failed: {error}")
+
+    def get(self, key):
+        hit, value = super().get(key)
+        if hit:
+            self.stats["local_hits"] += 1
+            return True, value
+        if self.state.shared:
+            try:
+                data = self.state.get(self.namespace + key)
+                if data is not None:
+                    value = pickle.loads(data)
+                    super().put(key, value)
+                    self.stats["shared_hits"] += 1
+                    return True, value
+            except Exception as e:
+                self._failed("read", e)
+        self.stats["misses"] += 1
+        return False, None
+
+    def put(self, key, value):
+        super().put(key, value)
+        if self.state.shared:
+            try:
+                self.state.set(self.namespace + key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), ttl=self.ttl)
+            except Exception as e:
+                self._failed("write", e)
+
+    def claim(self, key):
+        """True when this caller should compute `key` (it holds the lease until release)."""
+        try:
+            return self.state.add(f"{self.namespace}lease:{key}", self.owner, ttl=self.lease_seconds)
+        except Exception as e:
+            self._failed("lease", e)
+            return True
+
+    def release(self, key):
+        try:
+            self.state.delete(f"{self.namespace}lease:{key}")
+        except Exception as e:
+            self._failed("release", e)
+
+
+class JsonFileMemo:
+    """
+    MemoCache-compatible store that keeps each output in its own JSON file, so
+    memoized stages survive a crash or restart. Outputs must be JSON-serializable.
+    """
+
+    blocking = True
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                return True, json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return False, None
+
+    def put(self, key, value):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(value, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+class PipelineRun:
+    """Outcome of one Pipeline.run: per-node results, errors, timings and scopes."""
+
+    def __init__(self):
+        self.results = {}
+        self.errors = {}
+        self.timings = {}
+        self.memo_hits = set()
+        self.scopes = {}
+
+    @property
+    def ok(self):
+        return not self.errors
+
+
+class Pipeline:
+    def __init__(self, nodes, memo=None):
+        self.nodes = {}
+        for node in nodes:
+            if node.name in self.nodes:
+                raise ValueError(f"Duplicate pipeline node: {node.name}")
+            self.nodes[node.name] = node
+        self.memo = memo if memo is not None else MemoCache()
+        self.order = self._topological_order()
+
+    async def _memo(self, method, *args):
+        """Calls a memo method, off the event loop when it may block on a shared store or disk."""
+        func = getattr(self.memo, method)
+        if getattr(self.memo, "blocking", True):
+            return await asyncio.to_thread(func, *args)
+        return func(*args)
+
+    def _topological_order(self):
+        remaining = {
+            name: {dep for dep in node.inputs.values() if dep in self.nodes}
+            for name, node in self.nodes.items()
+        }
+        order = []
+        while remaining:
+            ready = [name for name, deps in remaining.items() if not deps]
+            if not ready:
+                raise ValueError(f"Pipeline has a cycle between: {', '.join(sorted(remaining))}")
+            for name in ready:
+                order.append(name)
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+        return order
+
+    async def _claim_or_wait(self, key):
+        """
+        In-flight de-duplication: takes the key's lease and returns (False, None),
+        or waits while another run holds it and returns (True, value) once that
+        run has stored its output. A holder that fails or dies frees the lease
+        (or lets it expire) and a waiter computes the stage itself.
+        """
+        delay = 0.02
+        while not await self._memo("claim", key):
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.5)
+            hit, value = await self._memo("get", key)
+            if hit:
+                self.memo.stats["dedup_waits"] += 1
+                return True, value
+        # A holder may have stored its output and released just before our claim
+        hit, value = await self._memo("get", key)
+        if hit:
+            await self._memo("release", key)
+        return hit, value
+
+    async def run(self, inputs, refresh=(), node_scope=None, on_event=None):
+        """
+        Executes every node once its inputs are ready.
+
+        refresh     node names that must be recomputed even if memoized
+        node_scope  optional `name -> context manager` entered around each node;
+                    whatever it yields is kept in run.scopes[name]
+        on_event    optional `(event, name, value)` callback with event in
+                    started | completed | reused | failed | skipped
+        A failing node fails only its dependents; BaseExceptions (cancellation)
+        abort the whole run.
+        """
+        missing = {dep for node in self.nodes.values() for dep in node.inputs.values()
+                   if dep not in self.nodes and dep not in inputs}
+        if missing:
+            raise ValueError(f"Missing pipeline inputs: {', '.join(sorted(missing))}")
+
+        run = PipelineRun()
+        refresh = set(refresh)
+        emit = on_event or (lambda event, name, value: None)
+        tasks = {}
+
+        async def execute(node):
+            args = {}
+            for arg, dep in node.inputs.items():
+                if dep in tasks:
+                    await tasks[dep]
+                    if dep in run.errors:
+                        run.errors[node.name] = run.errors[dep]
+                        emit("skipped", node.name, run.errors[dep])
+                        return
+                    args[arg] = run.results[dep]
+                else:
+                    args[arg] = inputs[dep]
+
+            key = node.cache_key(args) if node.memoize else None
+            leased = False
+            if key is not None and node.name not in refresh:
+                hit, value = await self._memo("get", key)
+                if not hit and hasattr(self.memo, "claim"):
+                    hit, value = await self._claim_or_wait(key)
+                    leased = not hit
+                if hit:
+                    run.results[node.name] = value
+                    run.timings[node.name] = 0.0
+                    run.memo_hits.add(node.name)
+                    emit("reused", node.name, value)
+                    return
+
+            emit("started", node.name, None)
+            started = time.perf_counter()
+            try:
+                try:
+                    with (node_scope(node.name) if node_scope else nullcontext()) as scope:
+                        value = await node.call(args)
+                    run.scopes[node.name] = scope
+                except Exception as e:
+                    run.timings[node.name] = time.perf_counter() - started
+                    run.errors[node.name] = e
+                    emit("failed", node.name, e)
+                    return
+                run.timings[node.name] = time.perf_counter() - started
+                run.results[node.name] = value
+                if key is not None:
+                    await self._memo("put", key, value)
+            finally:
+                # Only after the put: a waiter that claims the freed lease must find the output
+                if leased:
+                    await self._memo("release", key)
+            emit("completed", node.name, value)
+
+        for name in self.order:
+            tasks[name] = asyncio.ensure_future(execute(self.nodes[name]))
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            raise
+        return run
@@ -0,0 +1,203 @@
+# resp_server.py
+"""
+Local stand-in for a Redis server, for tests and single-host deployments.
+
+    python orchestrator/resp_server.py --port 6399
+    DREAMFORGE_SHARED_STATE=redis://127.0.0.1:6399/0 uvicorn app.main:app --workers 4
+
+It speaks RESP2 and implements the commands RedisState uses (PING, GET, SET
+with EX/PX/NX/XX, DEL, INCR/INCRBY/DECRBY, EXPIRE/PEXPIRE, PTTL, SELECT, AUTH,
+DBSIZE, FLUSHDB/FLUSHALL). Data lives in memory and is lost on exit; use a real
+Redis when state must outlive the process.
+"""
+import argparse
+import socketserver
+import sys
+import threading
+import time
+
+
+class RespError(Exception):
+    pass
+
+
+class Store:
+    """Numbered databases of key -> (bytes, expires_at or None)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.databases = {}
+
+    def db(self, index):
+        return self.databases.setdefault(index, {})
+
+    @staticmethod
+    def live(db, key):
+        item = db.get(key)
+        if item is not None and item[1] is not None and item[1] <= time.time():
+            del db[key]
+            return None
+        return item
+
+
+def _int(value):
+    try:
+        return int(value)
+    except ValueError:
+        raise RespError("ERR value is not an integer or out of range")
+
+
+def execute(store, session, args):
+    """Runs one command for a connection; returns a reply value (RespError for -ERR)."""
+    command = args[0].decode("utf-8", errors="replace").upper()
+    args = args[1:]
+    with store.lock:
+        db = store.db(session["db"])
+        if command == "PING":
+            return ("simple", args[0].decode() if args else "PONG")
+        if command in ("AUTH", "CLIENT"):
+            return ("simple", "OK")
+        if command == "SELECT":
+            session["db"] = _int(args[0])
+            return ("simple", "OK")
+        if command == "GET":
+            item = Store.live(db, args[0])
+            return item[0] if item else None
+        if command == "SET":
+            key, value, options = args[0], args[1], [arg.decode().upper() for arg in args[2:]]
+            expires_at, index = None, 0
+            while index < len(options):
+                if options[index] in ("EX", "PX"):
+                    amount = _int(options[index + 1])
+                    expires_at = time.time() + (amount if options[index] == "EX" else amount / 1000)
+                    index += 2
+                    continue
+                if options[index] not in ("NX", "XX"):
+                    raise RespError("ERR syntax error")
+                index += 1
+            exists = Store.live(db, key) is not None
+            if ("NX" in options and exists) or ("XX" in options and not exists):
+                return None
+            db[key] = (value, expires_at)
+            return ("simple", "OK")
+        if command == "DEL":
+            return sum(1 for key in args if Store.live(db, key) is not None and db.pop(key, None) is not None)
+        if command in ("INCR", "INCRBY", "DECR", "DECRBY"):
+            amount = 1 if command in ("INCR", "DECR") else _int(args[1])
+            if command.startswith("DECR"):
+                amount = -amount
+            item = Store.live(db, args[0])
+            value = (_int(item[0]) if item else 0) + amount
+            db[args[0]] = (str(value).encode("ascii"), item[1] if item else None)
+            return value
+        if command in ("EXPIRE", "PEXPIRE"):
+            item = Store.live(db, args[0])
+            if item is None:
+                return 0
+            amount = _int(args[1])
+            db[args[0]] = (item[0], time.time() + (amount if command == "EXPIRE" else amount / 1000))
+            return 1
+        if command == "PTTL":
+            item = Store.live(db, args[0])
+            if item is None:
+                return -2
+            return -1 if item[1] is None else int((item[1] - time.time()) * 1000)
+        if command == "DBSIZE":
+            return sum(1 for key in list(db) if Store.live(db, key) is not None)
+        if command == "FLUSHDB":
+            db.clear()
+            return ("simple", "OK")
+        if command == "FLUSHALL":
+            store.databases.clear()
+            return ("simple", "OK")
+    raise RespError(f"ERR unknown command '{command}'")
+
+
+def encode(reply):
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, RespError):
+        return f"-{reply}\r\n".encode("utf-8")
+    if isinstance(reply, tuple):
+        return f"+{reply[1]}\r\n".encode("utf-8")
+    if isinstance(reply, int):
+        return f":{reply}\r\n".encode("ascii")
+    return f"${len(reply)}\r\n".encode("ascii") + reply + b"\r\n"
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    store = None
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            return line.split()  # inline command (e.g. typed into telnet)
+        args = []
+        for _ in range(int(line[1:])):
+            header = self.rfile.readline()
+            length = int(header[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def handle(self):
+        session = {"db": 0}
+        while True:
+            try:
+                args = self.read_command()
+            except (ConnectionError, ValueError):
+                return
+            if args is None:
+                return
+            if not args:
+                continue
+            if args[0].upper() == b"QUIT":
+                self.wfile.write(b"+OK\r\n")
+                return
+            try:
+                reply = execute(self.store, session, args)
+            except RespError as e:
+                reply = e
+            except IndexError:
+                reply = RespError("ERR wrong number of arguments")
+            try:
+                self.wfile.write(encode(reply))
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                return
+
+
+class RespServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+
+def start_resp_server(host="127.0.0.1", port=0):
+    """Starts the stand-in on a daemon thread; returns (server, url). Stop with server.shutdown()."""
+    handler = type("ConfiguredRespHandler", (RespHandler,), {"store": Store()})
+    server = RespServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"redis://{host}:{server.server_address[1]}/0"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Redis-protocol stand-in for DREAMFORGE_SHARED_STATE")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6399)
+    args = parser.parse_args()
+
+    server, url = start_resp_server(args.host, args.port)
+    print(f"🔗 RESP stand-in listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+"""
+Pre-warmed sandbox pool for smoke-running generated Python code.
+
+Each worker is a Python interpreter started ahead of time that blocks on stdin.
+A job is dispatched by writing the code to an idle worker, so running generated
+code costs a pipe write instead of a cold interpreter start. Workers are
+single-use: once a job finishes the worker is discarded and a replacement is
+started in the background.
+
+Inside a worker the code runs with rlimits (CPU, memory, file size, open files),
+in a throw-away temp directory and under a wall-clock timeout. Before the
+worker reads any job it locks itself down at the OS level (Linux only):
+
+- a private user + network namespace (no interfaces but loopback);
+- Landlock: no writes outside the temp directory, no TCP (ABI 4+), no signals
+  to processes outside the sandbox (ABI 6+);
+- seccomp: no exec, fork, sockets, ptrace, mount, namespace or kernel module
+  calls, and kill only for itself.
+
+If any of these fails the worker exits with ISOLATION_EXIT and `run` raises
+SandboxUnavailable instead of running the code unprotected. ctypes is blocked
+after setup, and an audit hook still turns the usual escapes into clear
+PermissionErrors.
+"""
+import atexit
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass
+
+# Exit status of a worker that could not isolate itself
+ISOLATION_EXIT = 121
+
+# Runs inside the worker interpreter; everything above the stdin read is warm-up
+WORKER_SOURCE = r'''
+import json, os, sys
+
+def _isolate():
+    """Namespaces, Landlock and seccomp; raises OSError when any of them is unavailable."""
+    import ctypes, ctypes.util
+
+    libc = ctypes.CDLL(None, use_errno=True)
+
+    def check(result, what):
+        if result < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"{what}: {os.strerror(errno)}")
+        return result
+
+    # Private user + network namespace: the code sees no network interfaces
+    check(libc.unshare(0x10000000 | 0x40000000), "unshare(CLONE_NEWUSER | CLONE_NEWNET)")
+    check(libc.prctl(38, 1, 0, 0, 0), "prctl(PR_SET_NO_NEW_PRIVS)")
+
+    # Landlock: writes only beneath the work dir; no TCP and no outside signals where supported
+    libc.syscall.restype = ctypes.c_long
+    abi = check(libc.syscall(444, None, 0, 1), "landlock_create_ruleset(VERSION)")
+    # WRITE_FILE, then REMOVE_DIR .. MAKE_SYM (bits 2-3 are READ_FILE / READ_DIR: reads stay allowed)
+    write_access = 1 << 1 | sum(1 << bit for bit in range(4, 13))
+    if abi >= 2:
+        write_access |= 1 << 13  # REFER
+    if abi >= 3:
+        write_access |= 1 << 14  # TRUNCATE
+    fields = [write_access]
+    if abi >= 4:
+        fields.append(0b11)  # BIND_TCP | CONNECT_TCP, with no rule allowing either
+    if abi >= 6:
+        fields.append(0b11)  # scope: abstract unix sockets and signals
+    attr = (ctypes.c_uint64 * len(fields))(*fields)
+    ruleset = check(libc.syscall(444, ctypes.byref(attr), ctypes.sizeof(attr), 0), "landlock_create_ruleset")
+    workdir_fd = os.open(".", os.O_PATH | os.O_DIRECTORY)
+    beneath = ctypes.create_string_buffer(
+        write_access.to_bytes(8, sys.byteorder) + workdir_fd.to_bytes(4, sys.byteorder, signed=True), 12
+    )  # struct landlock_path_beneath_attr (packed)
+    check(libc.syscall(445, ruleset, 1, beneath, 0), "landlock_add_rule")
+    check(libc.syscall(446, ruleset, 0), "landlock_restrict_self")
+    os.close(workdir_fd)
+    os.close(ruleset)
+
+    # seccomp (via libseccomp): deny process, network and kernel-level escapes
+    path = ctypes.util.find_library("seccomp") or "libseccomp.so.2"
+    seccomp = ctypes.CDLL(path, use_errno=True)
+    seccomp.seccomp_init.restype = ctypes.c_void_p
+    seccomp.seccomp_init.argtypes = [ctypes.c_uint32]
+    seccomp.seccomp_rule_add_array.argtypes = [
+        ctypes.c_void_p, ctypes.c_uint32, ctypes.c_int, ctypes.c_uint, ctypes.c_void_p
+    ]
+    seccomp.seccomp_load.argtypes = [ctypes.c_void_p]
+
+    class ArgCmp(ctypes.Structure):
+        _fields_ = [("arg", ctypes.c_uint), ("op", ctypes.c_int),
+                    ("datum_a", ctypes.c_uint64), ("datum_b", ctypes.c_uint64)]
+
+    ctx = seccomp.seccomp_init(0x7FFF0000)  # SCMP_ACT_ALLOW
+    if not ctx:
+        raise OSError("seccomp_init failed")
+
+    def deny(name, errno=1, *conditions):
+        number = seccomp.seccomp_syscall_resolve_name(name.encode())
+        if number < 0:
+            return  # not on this architecture
+        array = (ArgCmp * len(conditions))(*[ArgCmp(*c) for c in conditions]) if conditions else None
+        check(seccomp.seccomp_rule_add_array(ctx, 0x00050000 | errno, number, len(conditions), array), f"seccomp {name}")
+
+    for name in ("execve", "execveat", "fork", "vfork", "ptrace", "process_vm_readv", "process_vm_writev",
+                 "socket", "socketpair", "mount", "umount2", "pivot_root", "chroot", "unshare", "setns",
+                 "bpf", "perf_event_open", "keyctl", "add_key", "request_key", "kexec_load",
+                 "kexec_file_load", "init_module", "finit_module", "delete_module", "reboot", "swapon",
+                 "swapoff", "userfaultfd", "io_uring_setup", "open_by_handle_at", "name_to_handle_at",
+                 "tkill", "pidfd_open", "pidfd_send_signal"):
+        deny(name)
+    deny("clone", 1, (0, 7, 0x00010000, 0))  # only threads: (flags & CLONE_THREAD) == 0 -> EPERM
+    deny("clone3", 38)  # ENOSYS: libc falls back to clone, which is checked above
+    deny("kill", 1, (0, 1, os.getpid(), 0))  # SCMP_CMP_NE: only signals to itself
+    deny("tgkill", 1, (0, 1, os.getpid(), 0))
+    check(seccomp.seccomp_load(ctx), "seccomp_load")
+    seccomp.seccomp_release.argtypes = [ctypes.c_void_p]
+    seccomp.seccomp_release(ctx)
+
+try:
+    _isolate()
+except Exception as e:
+    sys.stderr.write(f"sandbox: isolation unavailable ({e}); refusing to run code\n")
+    sys.stderr.flush()
+    os._exit(121)  # ISOLATION_EXIT
+for _name in [name for name in sys.modules if name == "ctypes" or name.startswith(("ctypes.", "_ctypes"))]:
+    del sys.modules[_name]
+del _isolate
+
+job = json.loads(sys.stdin.buffer.read() or b"{}")
+limits = job.get("limits", {})
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits, timeout still applies
+    resource = None
+
+if resource is not None:
+    for name, value in (
+        ("RLIMIT_CPU", limits.get("cpu_seconds")),
+        ("RLIMIT_AS", limits.get("memory_bytes")),
+        ("RLIMIT_FSIZE", limits.get("file_bytes")),
+        ("RLIMIT_NOFILE", limits.get("open_files")),
+    ):
+        if value and hasattr(resource, name):
+            try:
+                resource.setrlimit(getattr(resource, name), (value, value))
+            except (ValueError, OSError):
+                pass
+
+BLOCKED = ("socket.", "subprocess.", "os.system", "os.exec", "os.fork", "os.posix_spawn", "os.spawn", "pty.")
+FS_EVENTS = ("os.remove", "os.rename", "os.rmdir", "os.mkdir", "os.chmod", "os.truncate",
+             "os.symlink", "os.link", "shutil.rmtree", "shutil.move", "shutil.copyfile")
+WRITE_FLAGS = os.O_WRONLY | os.O_RDWR | os.O_CREAT | os.O_TRUNC | os.O_APPEND
+WORKDIR = os.path.realpath(os.getcwd())
+
+def _inside_workdir(path):
+    if isinstance(path, bytes):
+        path = os.fsdecode(path)
+    return os.path.realpath(os.path.join(WORKDIR, path)).startswith(WORKDIR + os.sep)
+
+def _guard(event, args):
+    if event.startswith(BLOCKED) or event.startswith("ctypes."):
+        raise PermissionError(f"sandbox: {event} is not allowed")
+    if event == "import" and (args[0] in ("ctypes", "_ctypes") or args[0].startswith("ctypes.")):
+        raise PermissionError(f"sandbox: importing {args[0]} is not allowed")
+    if event == "open":
+        path, mode, flags = args
+        writing = (mode and any(c in mode for c in "wax+")) or (flags and flags & WRITE_FLAGS)
+        if writing and isinstance(path, (str, bytes)) and not _inside_workdir(path):
+            raise PermissionError(f"sandbox: writing {path!r} outside the sandbox is not allowed")
+    elif event in FS_EVENTS:
+        for path in args:
+            if isinstance(path, (str, bytes)) and not _inside_workdir(path):
+                raise PermissionError(f"sandbox: {event} outside the sandbox is not allowed")
+
+sys.addaudithook(_guard)
+
+try:
+    compiled = compile(job.get("code", ""), "generated_app.py", "exec")
+except SyntaxError as e:
+    sys.stderr.write(f"SyntaxError: {e}\n")
+    sys.exit(2)
+
+sys.argv = ["generated_app.py"]
+exec(compiled, {"__name__": "__main__", "__file__": "generated_app.py"})
+'''
+
+
+class SandboxUnavailable(RuntimeError):
+    """The worker could not isolate itself (namespaces, Landlock or seccomp), so nothing was run."""
+
+
+@dataclass
+class SandboxResult:
+    exit_code: int
+    stdout: str
+    stderr: str
+    duration: float  # seconds from dispatch to exit
+    timed_out: bool = False
+    warm: bool = True  # False if no pre-started worker was idle
+
+    def to_dict(self):
+        return asdict(self)
+
+
+class _Worker:
+    def __init__(self, proc, workdir):
+        self.proc = proc
+        self.workdir = workdir
+
+
+class SandboxPool:
+    def __init__(self, size=2, timeout=5.0, memory_mb=256, cpu_seconds=5,
+                 max_output_bytes=64 * 1024, max_file_bytes=4 * 1024 * 1024):
+        self.size = size
+        self.timeout = timeout
+        self.max_output_bytes = max_output_bytes
+        self.limits = {
+            "cpu_seconds": cpu_seconds,
+            "memory_bytes": memory_mb * 1024 * 1024,
+            "file_bytes": max_file_bytes,
+            "open_files": 64,
+        }
+        self._idle = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self._replenish()
+
+    # ------------------------------------------------------------------
+    # Worker lifecycle
+    # ------------------------------------------------------------------
+
+    def _spawn(self):
+        workdir = tempfile.mkdtemp(prefix="dreamforge-sandbox-")
+        # Output goes to files so RLIMIT_FSIZE bounds it, unlike an unbounded pipe
+        with open(os.path.join(workdir, ".stdout"), "wb") as stdout, \
+                open(os.path.join(workdir, ".stderr"), "wb") as stderr:
+            proc = subprocess.Popen(
+                [sys.executable, "-I", "-B", "-c", WORKER_SOURCE],
+                stdin=subprocess.PIPE,
+                stdout=stdout,
+                stderr=stderr,
+                cwd=workdir,
+                env={"PATH": os.defpath, "HOME": workdir, "TMPDIR": workdir},
+                start_new_session=os.name == "posix",
+            )
+        return _Worker(proc, workdir)
+
+    def _replenish(self):
+        with self._lock:
+            while not self._closed and len(self._idle) < self.size:
+                self._idle.append(self._spawn())
+
+    def _take(self):
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop(0)
+                if worker.proc.poll() is None:
+                    return worker, True
+                self._discard(worker)
+        return self._spawn(), False
+
+    @staticmethod
+    def _kill(worker):
+        if worker.proc.poll() is None:
+            try:
+                if os.name == "posix":
+                    os.killpg(worker.proc.pid, signal.SIGKILL)
+                else:
+                    worker.proc.kill()
+            except (ProcessLookupError, PermissionError):
+                pass
+            worker.proc.wait()
+
+    def _discard(self, worker):
+        self._kill(worker)
+        shutil.rmtree(worker.workdir, ignore_errors=True)
+
+    def _read_output(self, worker, name):
+        with open(os.path.join(worker.workdir, name), "rb") as f:
+            data = f.read(self.max_output_bytes + 1)
+        text = data[: self.max_output_bytes].decode("utf-8", errors="replace")
+        if len(data) > self.max_output_bytes:
+            text += "\n... [output truncated]"
+        return text
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def run(self, code):
+        """
+        Smoke-runs `code` in an idle worker and returns a SandboxResult (blocking).
+        Raises SandboxUnavailable when the worker could not isolate itself.
+        """
+        if self._closed:
+            raise RuntimeError("Sandbox pool is closed")
+        worker, warm = self._take()
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            try:
+                worker.proc.stdin.write(json.dumps({"code": code, "limits": self.limits}).encode("utf-8"))
+                worker.proc.stdin.close()
+            except BrokenPipeError:
+                pass
+            # Start the next worker while this one runs, off the dispatch path
+            threading.Thread(target=self._replenish, daemon=True).start()
+
+            try:
+                worker.proc.wait(timeout=self.timeout)
+            except subprocess.TimeoutExpired:
+                timed_out = True
+                self._kill(worker)
+            duration = time.perf_counter() - started
+            if worker.proc.returncode == ISOLATION_EXIT:
+                raise SandboxUnavailable(self._read_output(worker, ".stderr").strip())
+
+            return SandboxResult(
+                exit_code=worker.proc.returncode,
+                stdout=self._read_output(worker, ".stdout"),
+                stderr=self._read_output(worker, ".stderr"),
+                duration=duration,
+                timed_out=timed_out,
+                warm=warm,
+            )
+        finally:
+            self._discard(worker)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            self._discard(worker)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_sandbox_pool():
+    """Process-wide pool sized from DREAMFORGE_SANDBOX_* environment variables."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SandboxPool(
+                size=int(os.getenv("DREAMFORGE_SANDBOX_WORKERS", "2")),
+                timeout=float(os.getenv("DREAMFORGE_SANDBOX_TIMEOUT", "5")),
+                memory_mb=int(os.getenv("DREAMFORGE_SANDBOX_MEMORY_MB", "256")),
+            )
+            atexit.register(_pool.close)
+        return _pool
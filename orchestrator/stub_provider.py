@@ -0,0 +1,181 @@
+# stub_provider.py
+"""
+Local stand-in for an OpenAI-compatible chat provider, for tests and benchmarks.
+
+    python orchestrator/stub_provider.py --port 8100 --delay 0.02 --fail-rate 0.1
+    DREAMFORGE_PROVIDERS='[{"name": "local", "base_url": "http://127.0.0.1:8100/v1"}]' uvicorn app.main:app
+
+It answers /v1/chat/completions (streamed or not) with canned Vision, Code,
+Evaluator and Repair outputs picked from the prompt, and can inject latency and failures.
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHUNK_CHARS = 12
+
+CANNED_VISION = json.dumps({
+    "layout": "single page app with a header, an entry form and a list",
+    "components": ["header", "form", "list", "footer"],
+    "data_elements": ["entries", "timestamps"],
+})
+CANNED_CODE = """**app.py**
+from fastapi import FastAPI
+
+app = FastAPI()
+entries = []
+
+
+@app.get("/entries")
+def list_entries():
+    return entries
+
+**App.jsx**
+export default function App() {
+  return <main><h1>Entries</h1></main>;
+}
+"""
+CANNED_EVALUATION = json.dumps({
+    "status": "ok",
+    "issues": [],
+    "suggestions": ["Persist entries in a database"],
+    "overall_feedback": "Small but runnable app.",
+})
+
+CANNED_REPAIR = """FILE: app.py
+<<<<<<< SEARCH
+entries = []
+=======
+entries = []  # replace with a database table
+>>>>>>> REPLACE
+"""
+
+
+def canned_answer(prompt):
+    lowered = prompt.lower()
+    if "layout designer" in lowered:
+        return CANNED_VISION
+    if "code reviewer" in lowered:
+        return CANNED_EVALUATION
+    if "fixing generated code" in lowered:
+        return CANNED_REPAIR
+    return CANNED_CODE
+
+
+class StubProviderHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like a real provider
+    delay = 0.0
+    fail_rate = 0.0
+    model = "stub"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": self.model, "object": "model"}]})
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", "0"))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        if random.random() < self.fail_rate:
+            self._send_json(503, {"error": {"message": "stub provider: injected failure"}})
+            return
+
+        prompt = (request.get("messages") or [{}])[-1].get("content", "")
+        text = canned_answer(prompt)
+        usage = {
+            "prompt_tokens": max(1, len(prompt) // 4),
+            "completion_tokens": max(1, len(text) // 4),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        model = request.get("model", self.model)
+
+        if not request.get("stream"):
+            time.sleep(self.delay)
+            self._send_json(200, {
+                "id": "stub", "object": "chat.completion", "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        parts = [text[i:i + CHUNK_CHARS] for i in range(0, len(text), CHUNK_CHARS)]
+        try:
+            for index, part in enumerate(parts):
+                time.sleep(self.delay)
+                chunk = {
+                    "id": "stub", "object": "chat.completion.chunk", "model": model,
+                    "choices": [{"index": 0, "delta": {"content": part}, "finish_reason": None}],
+                }
+                if index == len(parts) - 1:
+                    chunk["choices"][0]["finish_reason"] = "stop"
+                    chunk["usage"] = usage
+                self._write_event(json.dumps(chunk))
+            self._write_event("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client closed the stream (cancellation)
+
+    def _write_event(self, data):
+        payload = f"data: {data}\n\n".encode("utf-8")
+        self.wfile.write(f"{len(payload):x}\r\n".encode("ascii") + payload + b"\r\n")
+        self.wfile.flush()
+
+
+class StubProviderServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients drop streams on purpose (cancellation, failover); that is not an error here
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+
+def start_stub_provider(host="127.0.0.1", port=0, delay=0.0, fail_rate=0.0):
+    """Starts the stand-in on a daemon thread; returns (server, base_url). Stop with server.shutdown()."""
+    handler = type("ConfiguredStubHandler", (StubProviderHandler,), {"delay": delay, "fail_rate": fail_rate})
+    server = StubProviderServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stand-in provider")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--delay", type=float, default=0.02, help="seconds between streamed chunks")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of calls answered with 503")
+    args = parser.parse_args()
+
+    server, base_url = start_stub_provider(args.host, args.port, args.delay, args.fail_rate)
+    print(f"🧪 Stub provider listening on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# trace_report.py
+"""
+Renders the spans written by agents/tracing.py.
+
+    python orchestrator/trace_report.py                 # waterfalls of the 5 slowest traces
+    python orchestrator/trace_report.py --top 10
+    python orchestrator/trace_report.py --trace <id>    # one trace (X-Trace-Id response header)
+    python orchestrator/trace_report.py --flame > out.folded
+        # folded stacks (self time in ms) for flamegraph.pl or speedscope
+"""
+import argparse
+import json
+import os
+from collections import defaultdict
+
+from agents.tracing import TRACE_FILE
+
+
+def span_files(path):
+    """The live span file plus its rotated backups, oldest first."""
+    directory, base = os.path.split(path)
+    if not os.path.isdir(directory):
+        return []
+    rotated = sorted(
+        (name for name in os.listdir(directory) if name.startswith(base + ".") and name[len(base) + 1:].isdigit()),
+        key=lambda name: -int(name[len(base) + 1:]),
+    )
+    files = [os.path.join(directory, name) for name in rotated]
+    return files + ([path] if os.path.exists(path) else [])
+
+
+def load_traces(path):
+    """{trace_id: [span dicts]} from every span file."""
+    traces = defaultdict(list)
+    for file_path in span_files(path):
+        with open(file_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn line from a crash mid-write
+                traces[record["trace_id"]].append(record)
+    return traces
+
+
+def trace_bounds(spans):
+    start = min(s["start"] for s in spans)
+    end = max(s["start"] + (s["duration"] or 0) for s in spans)
+    return start, end
+
+
+def build_tree(spans):
+    """(roots, children) where roots are spans whose parent is not in this trace."""
+    ids = {s["span_id"] for s in spans}
+    children = defaultdict(list)
+    roots = []
+    for s in sorted(spans, key=lambda s: s["start"]):
+        if s["parent_id"] in ids:
+            children[s["parent_id"]].append(s)
+        else:
+            roots.append(s)
+    return roots, children
+
+
+def describe(s):
+    attributes = s.get("attributes") or {}
+    notes = []
+    if attributes.get("model"):
+        notes.append(attributes["model"])
+    if attributes.get("total_tokens"):
+        notes.append(f"{attributes['total_tokens']} tok")
+    if attributes.get("cache_hit"):
+        notes.append("cache hit")
+    if attributes.get("retries"):
+        notes.append(f"{attributes['retries']} retries")
+    if "http.status_code" in attributes:
+        notes.append(str(attributes["http.status_code"]))
+    if s.get("status") != "ok":
+        notes.append(f"{s['status'].upper()} {s.get('error') or ''}".strip())
+    return "  ".join(notes)
+
+
+def print_waterfall(trace_id, spans, width=40):
+    start, end = trace_bounds(spans)
+    total = max(end - start, 1e-9)
+    roots, children = build_tree(spans)
+    print(f"\n🧵 trace {trace_id}  {total * 1000:.0f} ms  ({len(spans)} spans)")
+
+    def walk(s, depth):
+        offset = int((s["start"] - start) / total * width)
+        length = max(1, int((s["duration"] or 0) / total * width))
+        bar = " " * offset + "█" * min(length, width - offset)
+        label = ("  " * depth + s["name"])[:36]
+        print(f"  {label:<36} |{bar:<{width}}| {(s['duration'] or 0) * 1000:>8.1f} ms  {describe(s)}")
+        for child in children[s["span_id"]]:
+            walk(child, depth + 1)
+
+    for root in roots:
+        walk(root, 0)
+
+
+def folded_stacks(traces):
+    """Aggregated self time per span-name stack, in whole milliseconds."""
+    totals = defaultdict(float)
+    for spans in traces.values():
+        roots, children = build_tree(spans)
+
+        def walk(s, stack):
+            stack = stack + [s["name"].replace(";", ":").replace(" ", "_")]
+            kids = children[s["span_id"]]
+            self_time = (s["duration"] or 0) - sum(k["duration"] or 0 for k in kids)
+            totals[";".join(stack)] += max(self_time, 0.0)
+            for child in kids:
+                walk(child, stack)
+
+        for root in roots:
+            walk(root, [])
+    return {stack: round(seconds * 1000) for stack, seconds in totals.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize DreamForge request traces")
+    parser.add_argument("--file", default=TRACE_FILE, help=f"span file (default: {TRACE_FILE})")
+    parser.add_argument("--top", type=int, default=5, help="number of slowest traces to show")
+    parser.add_argument("--trace", help="show a single trace id")
+    parser.add_argument("--flame", action="store_true", help="print folded stacks instead of waterfalls")
+    parser.add_argument("--width", type=int, default=40, help="waterfall bar width")
+    args = parser.parse_args()
+
+    traces = load_traces(args.file)
+    if not traces:
+        print(f"⚠️ No spans found in {args.file}")
+        return
+
+    if args.flame:
+        for stack, ms in sorted(folded_stacks(traces).items()):
+            if ms > 0:
+                print(f"{stack} {ms}")
+        return
+
+    if args.trace:
+        if args.trace not in traces:
+            print(f"❌ Trace {args.trace} not found")
+            return
+        print_waterfall(args.trace, traces[args.trace], args.width)
+        return
+
+    def trace_duration(item):
+        start, end = trace_bounds(item[1])
+        return end - start
+
+    slowest = sorted(traces.items(), key=trace_duration, reverse=True)[: args.top]
+    print(f"📊 {len(traces)} traces; showing the {len(slowest)} slowest")
+    for trace_id, spans in slowest:
+        print_waterfall(trace_id, spans, args.width)
+
+
+if __name__ == "__main__":
+    main()